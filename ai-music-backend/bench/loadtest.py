@@ -0,0 +1,379 @@
+"""외부 서비스 없이 백엔드 전체 경로에 부하를 거는 오프라인 부하 테스트
+
+    python bench/loadtest.py --scenario mixed --jobs 40 --concurrency 8 --out run.json
+    python bench/loadtest.py --scenario score --jobs 20 --omr-delay 3 --synth-delay 1
+
+임시 폴더에 백엔드 모듈을 복사해 띄우므로 (.env, uploads/, outputs/ 등) 작업 트리를 건드리지 않는다.
+Replicate 는 replicate_stub.py, Papago 는 bench/stubs.py papago 로 대신하고,
+Audiveris(java) 와 fluidsynth 는 bench/stubs.py 를 부르는 래퍼 스크립트로 바꿔 끼운다 (POSIX 셸 필요).
+
+작업 하나는 생성/악보 요청 -> /api/music/task/status 폴링 -> /api/audio/<파일> 다운로드이며,
+엔드포인트별 p50/p95/p99 지연, 작업 처리량, 서버 프로세스의 최대 RSS 와 스레드 수를 JSON 으로 남긴다.
+
+    # gevent 워커(gunicorn.conf.py)로 띄우고 작업마다 SSE 구독자 50개를 붙여 스레드 수를 비교
+    python bench/loadtest.py --server gevent --watchers 50
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUBS = os.path.join(BACKEND_DIR, "bench", "stubs.py")
+TERMINAL = ("succeeded", "failed", "canceled")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_http(url: str, timeout: float = 30, ok=(200,)):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code in ok:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} 응답 없음")
+
+
+def _write_wrapper(path: str, command: str):
+    with open(path, "w") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{STUBS}" {command} "$@"\n')
+    os.chmod(path, 0o755)
+
+
+def _percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+    return {"count": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+            "mean": round(statistics.mean(ordered) * 1000, 1), "max": round(ordered[-1] * 1000, 1)}
+
+
+class ProcessSampler:
+    """서버 프로세스의 RSS 와 스레드 수를 주기적으로 기록 (psutil 이 없으면 /proc 사용)"""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _read(self):
+        try:
+            import psutil
+            proc = psutil.Process(self.pid)
+            return proc.memory_info().rss, proc.num_threads()
+        except ImportError:
+            fields = {}
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    fields[key] = value.split()
+            return int(fields["VmHWM"][0]) * 1024, int(fields["Threads"][0])
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                rss, threads = self._read()
+            except Exception:
+                return
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_threads = max(self.peak_threads, threads)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class Harness:
+    def __init__(self, args):
+        self.args = args
+        self.work = tempfile.mkdtemp(prefix="mai-load-")
+        self.procs = []
+        self.base = None
+        self.server = None
+        self.latencies = {name: [] for name in ("generate", "process-score", "status", "audio", "job")}
+        self.counts = {"completed": 0, "failed": 0, "rejected": 0, "errors": 0,
+                       "sseStreams": 0, "sseFailed": 0}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # ── 스텁과 서버 기동 ──
+    def _spawn(self, cmd, env=None, log_name=None, cwd=None):
+        log = open(os.path.join(self.work, log_name), "w") if log_name else subprocess.DEVNULL
+        proc = subprocess.Popen(cmd, env=env, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+        self.procs.append(proc)
+        return proc
+
+    def start(self):
+        a = self.args
+        app_dir = os.path.join(self.work, "app")
+        os.makedirs(app_dir)
+        for name in os.listdir(BACKEND_DIR):
+            if name.endswith(".py"):
+                shutil.copy(os.path.join(BACKEND_DIR, name), app_dir)
+        bin_dir = os.path.join(self.work, "bin")
+        os.makedirs(bin_dir)
+        _write_wrapper(os.path.join(bin_dir, "java"), "audiveris")
+        _write_wrapper(os.path.join(bin_dir, "fluidsynth"), "fluidsynth")
+        os.makedirs(os.path.join(self.work, "audiveris"))
+        sound_font = os.path.join(self.work, "stub.sf2")
+        open(sound_font, "wb").close()
+
+        replicate_port, papago_port, server_port = _free_port(), _free_port(), _free_port()
+        self._spawn([sys.executable, os.path.join(app_dir, "replicate_stub.py"), "--port", str(replicate_port),
+                     "--latency", str(a.gen_latency), "--jitter", str(a.gen_jitter),
+                     "--error-rate", str(a.gen_error_rate)], log_name="replicate_stub.log")
+        self._spawn([sys.executable, STUBS, "papago", "--port", str(papago_port),
+                     "--latency", str(a.papago_latency)], log_name="papago_stub.log")
+        _wait_http(f"http://127.0.0.1:{replicate_port}/stats")
+        _wait_http(f"http://127.0.0.1:{papago_port}/stats")
+
+        self.base = f"http://127.0.0.1:{server_port}"
+        env = {
+            **os.environ,
+            "REPLICATE_API_TOKEN": "stub",
+            "REPLICATE_BASE_URL": f"http://127.0.0.1:{replicate_port}",
+            "PAPAGO_CLIENT_ID": "stub",
+            "PAPAGO_CLIENT_SECRET": "stub",
+            "PAPAGO_URL": f"http://127.0.0.1:{papago_port}/nmt/v1/translation",
+            "AUDIVERIS_JAVA": os.path.join(bin_dir, "java"),
+            "AUDIVERIS_JAR_PATH": os.path.join(self.work, "audiveris"),
+            "OMR_JVM_CDS": "0",
+            "SOUND_FONT_PATH": sound_font,
+            "SYNTH_ENGINE": "cli",
+            "PATH": bin_dir + os.pathsep + os.environ.get("PATH", ""),
+            "PUBLIC_BASE_URL": self.base,
+            "PYTHONUNBUFFERED": "1",
+            "STUB_OMR_DELAY": str(a.omr_delay),
+            "STUB_SYNTH_DELAY": str(a.synth_delay),
+            "STUB_SCORE_MEASURES": str(a.score_measures),
+        }
+        if a.server == "gevent":
+            cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                   "-b", f"127.0.0.1:{server_port}", "server:create_app()"]
+        else:
+            cmd = [sys.executable, "-c", f"import server; server.create_app().run(host='127.0.0.1', "
+                                         f"port={server_port}, threaded=True, debug=False)"]
+        self.server = self._spawn(cmd, env=env, log_name="server.log", cwd=app_dir)
+        _wait_http(f"{self.base}/readyz", timeout=60)
+
+    def stop(self):
+        for proc in reversed(self.procs):
+            proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if not self.args.keep:
+            shutil.rmtree(self.work, ignore_errors=True)
+
+    # ── 요청 ──
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _timed(self, name, method, url, **kwargs):
+        started = time.perf_counter()
+        resp = self._session().request(method, url, timeout=60, **kwargs)
+        if name == "audio":
+            for _ in resp.iter_content(64 * 1024):
+                pass
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            if resp.status_code >= 500 and resp.status_code != 503:
+                self.counts["errors"] += 1
+        return resp
+
+    def _submit(self, kind: str, index: int):
+        if kind == "generate":
+            body = {"description": f"부하 테스트 음악 {index} {random.random():.6f}",
+                    "genres": ["Ambient"], "moods": ["Calm"], "duration": 8}
+            return self._timed("generate", "POST", f"{self.base}/api/music/generate", json=body)
+        pdf = (b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+               b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+               b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>endobj\n"
+               + f"% load {index} {random.random()}\n".encode() + b"trailer<</Root 1 0 R>>\n%%EOF\n")
+        return self._timed("process-score", "POST", f"{self.base}/api/process-score",
+                           files={"score": (f"load_{index}.pdf", pdf, "application/pdf")},
+                           data={"format": "wav"})
+
+    def _poll(self, task_id: str, deadline: float, until_local: bool = False):
+        while time.monotonic() < deadline:
+            task = self._timed("status", "GET", f"{self.base}/api/music/task/status",
+                               params={"taskId": task_id}).json()
+            if task.get("status") in TERMINAL:
+                local = (task.get("audioUrl") or "").startswith(self.base)
+                if task["status"] != "succeeded" or local or not until_local:
+                    return task
+            time.sleep(self.args.poll_interval)
+        return None
+
+    def _watch(self, task_id: str):
+        """SSE 구독자 하나: 끝난 상태 이벤트를 받을 때까지 스트림을 읽는다"""
+        ok = False
+        try:
+            with requests.get(f"{self.base}/api/music/task/{task_id}/events", stream=True,
+                              timeout=self.args.job_timeout) as resp:
+                for line in resp.iter_lines(decode_unicode=True):
+                    if line and line.startswith("data:") and json.loads(line[5:]).get("status") in TERMINAL:
+                        ok = True
+                        break
+        except Exception:
+            pass
+        with self._lock:
+            self.counts["sseStreams" if ok else "sseFailed"] += 1
+
+    def run_job(self, kind: str, index: int):
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.args.job_timeout
+        try:
+            resp = self._submit(kind, index)
+            if resp.status_code == 503:
+                with self._lock:
+                    self.counts["rejected"] += 1
+                return
+            task_id = resp.json()["taskId"]
+            watchers = [threading.Thread(target=self._watch, args=(task_id,), daemon=True)
+                        for _ in range(self.args.watchers)]
+            for w in watchers:
+                w.start()
+            # 생성 결과는 미러링이 끝나 audioUrl 이 로컬 /api/audio 로 바뀐 뒤 받는다
+            task = self._poll(task_id, deadline, until_local=kind == "generate")
+            for w in watchers:
+                w.join(max(0.0, deadline - time.monotonic()))
+            if not task or task.get("status") != "succeeded":
+                with self._lock:
+                    self.counts["failed"] += 1
+                return
+            audio = self._timed("audio", "GET", task["audioUrl"])
+            with self._lock:
+                if audio.status_code == 200:
+                    self.counts["completed"] += 1
+                    self.latencies["job"].append(time.perf_counter() - started)
+                else:
+                    self.counts["failed"] += 1
+        except Exception as e:
+            print(f"[loadtest] {kind} #{index} 오류: {e!r}", file=sys.stderr)
+            with self._lock:
+                self.counts["errors"] += 1
+
+    def run(self):
+        a = self.args
+        kinds = {"generate": ["generate"], "score": ["score"], "mixed": ["generate", "score"]}[a.scenario]
+        sampler = ProcessSampler(_worker_pid(self.server.pid) if a.server == "gevent" else self.server.pid)
+        sampler.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=a.concurrency) as pool:
+            for i in range(a.jobs):
+                pool.submit(self.run_job, kinds[i % len(kinds)], i)
+        wall = time.perf_counter() - started
+        sampler.stop()
+        stages = _stage_summary(requests.get(f"{self.base}/metrics", timeout=10).text)
+        return {
+            "config": {k: v for k, v in vars(a).items() if k not in ("out", "keep")},
+            "commit": _git_commit(),
+            "wallSeconds": round(wall, 2),
+            "throughputJobsPerSec": round(self.counts["completed"] / wall, 3) if wall else None,
+            "jobs": self.counts,
+            "latencyMs": {name: _percentiles(samples) for name, samples in self.latencies.items()},
+            "server": {"peakRssMB": round(sampler.peak_rss / 2**20, 1), "peakThreads": sampler.peak_threads},
+            "stagesMs": stages,
+        }
+
+
+def _worker_pid(master_pid: int) -> int:
+    """gunicorn 마스터의 첫 번째 자식(워커) pid"""
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        children = f.read().split()
+    return int(children[0]) if children else master_pid
+
+
+def _stage_summary(text: str):
+    """/metrics 의 mai_stage_seconds 히스토그램에서 단계별 횟수와 평균(ms)만 뽑는다"""
+    sums, counts = {}, {}
+    for line in text.splitlines():
+        for prefix, target in (("mai_stage_seconds_sum{", sums), ("mai_stage_seconds_count{", counts)):
+            if line.startswith(prefix):
+                labels, value = line[len(prefix):].rsplit("} ", 1)
+                target[labels.split('"')[1]] = float(value)
+    return {stage: {"count": int(counts[stage]), "mean": round(sums[stage] / counts[stage] * 1000, 1)}
+            for stage in sorted(counts) if counts[stage]}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=("generate", "score", "mixed"), default="mixed")
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--job-timeout", type=float, default=300)
+    parser.add_argument("--gen-latency", type=float, default=3.0, help="가짜 Replicate 예측 시간(초)")
+    parser.add_argument("--gen-jitter", type=float, default=1.0)
+    parser.add_argument("--gen-error-rate", type=float, default=0.0)
+    parser.add_argument("--papago-latency", type=float, default=0.2)
+    parser.add_argument("--omr-delay", type=float, default=2.0, help="가짜 Audiveris 실행 시간(초)")
+    parser.add_argument("--synth-delay", type=float, default=1.0, help="가짜 fluidsynth 실행 시간(초)")
+    parser.add_argument("--score-measures", type=int, default=32)
+    parser.add_argument("--server", choices=("werkzeug", "gevent"), default="werkzeug",
+                        help="werkzeug 개발 서버(스레드) 또는 gunicorn gevent 워커")
+    parser.add_argument("--watchers", type=int, default=0, help="작업마다 붙일 SSE 구독자 수")
+    parser.add_argument("--out", help="결과 JSON 파일 경로")
+    parser.add_argument("--keep", action="store_true", help="임시 폴더(로그 포함)를 지우지 않음")
+    args = parser.parse_args()
+
+    harness = Harness(args)
+    try:
+        harness.start()
+        report = harness.run()
+    finally:
+        harness.stop()
+    if args.keep:
+        report["workDir"] = harness.work
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""빠른 MusicXML -> MIDI 변환기와 music21 경로의 결과 일치 여부 및 속도/메모리 비교
+
+    python bench/musicxml_midi.py scores/*.mxl --repeat 3
+    python bench/musicxml_midi.py --corpus bach --limit 50 --out report.json
+
+각 악보를 musicxml_midi.convert 와 server._write_score_midi(music21) 로 각각 MIDI 로 만든 뒤
+두 MIDI 의 음 목록 (음높이별 시작/끝 시각(초)) 을 비교한다. 여러 파트가 같은 음을 겹쳐
+연주하는 곳의 차이는 music21 의 채널 공유 때문이므로 "unison" 으로 따로 집계한다.
+빠른 변환기가 Unsupported 로 넘긴 악보는 "fallback" 으로 집계한다. 시간은 repeat 번 중
+최소값, 메모리는 tracemalloc 최대 사용량이다. 하나라도 불일치하면 종료 코드 1.
+
+알려진 차이: music21 은 화음 안의 붙임줄이나 반복 경계에 걸친 붙임줄을 나눠 쓰거나 잘못 잇는
+경우가 있어, 이런 곳은 "mismatch" 로 남는다 (빠른 변환기는 MusicXML 의 tie 를 그대로 따름).
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TOLERANCE = 0.005   # 초
+
+
+def _notes(midi_path):
+    """(음높이, 시작, 끝, 트랙) 목록과 전체 길이(초)"""
+    import mido
+
+    mid = mido.MidiFile(midi_path)
+    events = []
+    for index, track in enumerate(mid.tracks):
+        tick = 0
+        for msg in track:
+            tick += msg.time
+            events.append((tick, index, msg))
+    events.sort(key=lambda e: e[0])
+
+    tempo, now, last_tick = 500000, 0.0, 0
+    held = {}
+    notes = []
+    for tick, index, msg in events:
+        now += mido.tick2second(tick - last_tick, mid.ticks_per_beat, tempo)
+        last_tick = tick
+        if msg.type == "set_tempo":
+            tempo = msg.tempo
+        elif msg.type == "note_on" and msg.velocity > 0:
+            held.setdefault((index, msg.note), []).append(now)
+        elif msg.type in ("note_on", "note_off"):
+            starts = held.get((index, msg.note))
+            if starts:
+                notes.append((msg.note, round(starts.pop(0), 3), round(now, 3), index))
+    return sorted(notes), now
+
+
+def _measure(fn, repeat):
+    timings = []
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return result, min(timings), peak
+
+
+def _unison(notes, pitch, at):
+    """at 시점에 같은 음높이를 두 개 이상의 트랙이 울리고 있는지"""
+    tracks = {n[3] for n in notes if n[0] == pitch and n[1] - TOLERANCE <= at <= n[2] + TOLERANCE}
+    return len(tracks) > 1
+
+
+def _compare(fast_notes, slow_notes):
+    """불일치가 없으면 "ok", 모두 여러 파트가 같은 음을 겹쳐 연주한 곳이면 "unison", 아니면 "mismatch"
+
+    music21 은 같은 악기의 파트를 한 채널에 쓰면서 겹친 같은 음을 합치거나 길이 0 으로 끊는다.
+    빠른 변환기는 파트마다 채널을 따로 쓰므로 그런 곳의 차이는 따로 분류한다.
+    """
+    diffs = []
+    for index in (1, 2):
+        fast = Counter((n[0], round(n[index], 2)) for n in fast_notes)
+        slow = Counter((n[0], round(n[index], 2)) for n in slow_notes)
+        diffs.extend((fast - slow).elements())
+        diffs.extend((slow - fast).elements())
+    if not diffs:
+        return "ok", None
+    unexplained = [d for d in sorted(diffs)
+                   if not (_unison(fast_notes, *d) or _unison(slow_notes, *d))]
+    if unexplained:
+        return "mismatch", f"{len(unexplained)}곳 불일치, 첫 위치 (음높이, 초) = {unexplained[0]}"
+    return "unison", f"같은 음 겹침 {len(diffs)}곳"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scores", nargs="*")
+    parser.add_argument("--corpus", help="music21 내장 코퍼스 작곡가 이름 (예: bach)")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--out", help="결과 JSON 파일 경로")
+    args = parser.parse_args()
+
+    import musicxml_midi
+    import server
+    from music21 import converter
+
+    paths = []
+    for pattern in args.scores:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    if args.corpus:
+        from music21 import corpus
+        paths.extend(str(p) for p in corpus.getComposer(args.corpus)
+                     if str(p).endswith((".mxl", ".xml", ".musicxml")))
+    if args.limit:
+        paths = paths[:args.limit]
+
+    work = tempfile.mkdtemp(prefix="mxl-bench-")
+    results = []
+    for path in paths:
+        fast_mid = os.path.join(work, "fast.mid")
+        slow_mid = os.path.join(work, "slow.mid")
+        entry = {"score": os.path.basename(path)}
+        try:
+            fast_seconds, fast_time, fast_peak = _measure(lambda: musicxml_midi.convert(path, fast_mid), args.repeat)
+        except musicxml_midi.Unsupported as e:
+            entry.update(status="fallback", reason=str(e))
+            results.append(entry)
+            print(f"{entry['score']}: fallback ({e})", file=sys.stderr)
+            continue
+
+        def music21_chain():
+            score = converter.parse(path)
+            server._write_score_midi(score, slow_mid)
+            return score
+
+        score, slow_time, slow_peak = _measure(music21_chain, args.repeat)
+        graces = [n for n in score.recurse().notes if n.duration.isGrace]
+        if graces:
+            # music21 은 꾸밈음을 끝나지 않는 note_on 으로 써서 이후 같은 음과 짝이 꼬이므로
+            # 비교용 MIDI 는 꾸밈음을 뺀 악보로 다시 만든다 (빠른 변환기는 꾸밈음을 건너뜀)
+            for n in graces:
+                n.activeSite.remove(n)
+            server._write_score_midi(score, slow_mid)
+        fast_notes, fast_end = _notes(fast_mid)
+        slow_notes, slow_end = _notes(slow_mid)
+        status, detail = _compare(fast_notes, slow_notes)
+        entry.update(
+            status=status,
+            notes=len(fast_notes),
+            seconds={"fast": round(fast_seconds, 2), "music21Midi": round(slow_end, 2)},
+            time={"fast": round(fast_time, 4), "music21": round(slow_time, 4),
+                  "speedup": round(slow_time / fast_time, 1) if fast_time else None},
+            peakMemoryMB={"fast": round(fast_peak / 2**20, 1), "music21": round(slow_peak / 2**20, 1)},
+        )
+        if detail:
+            entry["detail"] = detail
+        results.append(entry)
+        print(f"{entry['score']}: {entry['status']} x{entry['time']['speedup']}", file=sys.stderr)
+
+    compared = [r for r in results if r["status"] != "fallback"]
+    summary = {
+        "scores": len(results),
+        "ok": sum(r["status"] == "ok" for r in results),
+        "unison": sum(r["status"] == "unison" for r in results),
+        "mismatch": sum(r["status"] == "mismatch" for r in results),
+        "fallback": sum(r["status"] == "fallback" for r in results),
+    }
+    if compared:
+        summary["medianSpeedup"] = statistics.median(r["time"]["speedup"] for r in compared)
+        summary["medianMemoryRatio"] = statistics.median(
+            r["peakMemoryMB"]["music21"] / max(r["peakMemoryMB"]["fast"], 0.1) for r in compared)
+
+    text = json.dumps({"summary": summary, "results": results}, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    sys.exit(1 if summary["mismatch"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""페이지 분할 OMR 과 단일 JVM OMR 의 소요 시간 비교
+
+    python bench/omr_shards.py score.pdf --shards 1 2 4 --repeat 2 --jvms 4
+
+각 분할 수마다 _run_audiveris 를 repeat 번 실행해 평균/최소 시간과 단일 JVM(shards=1)
+대비 속도 향상을 JSON 으로 출력한다. 분할 수와 상관없이 동시에 실행되는 JVM 은 --jvms 개로 제한된다.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--jvms", type=int, default=4)
+    parser.add_argument("--out", help="결과 JSON 파일 경로")
+    args = parser.parse_args()
+
+    os.environ["OMR_MAX_JVMS"] = str(args.jvms)
+    os.environ["OMR_SHARD_MIN_PAGES"] = "1"
+    import server
+
+    pages = server._pdf_page_count(args.pdf)
+    results = []
+    for shards in args.shards:
+        server.OMR_SHARDS = shards
+        timings = []
+        for _ in range(args.repeat):
+            work = tempfile.mkdtemp(prefix="omr-bench-")
+            pdf_path = os.path.join(work, os.path.basename(args.pdf))
+            shutil.copyfile(args.pdf, pdf_path)
+            started = time.perf_counter()
+            server._run_audiveris(pdf_path, work)
+            timings.append(time.perf_counter() - started)
+            shutil.rmtree(work, ignore_errors=True)
+        results.append({
+            "shards": shards,
+            "mean": round(statistics.mean(timings), 2),
+            "min": round(min(timings), 2),
+            "runs": [round(t, 2) for t in timings],
+        })
+        print(f"shards={shards}: mean {results[-1]['mean']}s", file=sys.stderr)
+
+    baseline = next((r["mean"] for r in results if r["shards"] == 1), None)
+    for r in results:
+        r["speedup"] = round(baseline / r["mean"], 2) if baseline else None
+
+    report = {"pdf": os.path.basename(args.pdf), "pages": pages, "jvms": args.jvms, "results": results}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
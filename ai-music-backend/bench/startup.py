@@ -0,0 +1,67 @@
+"""server 모듈 import 시간 회귀 검사
+
+    python bench/startup.py                 # 기본 예산 0.6초
+    python bench/startup.py --runs 9 --budget 0.5 --out startup.json
+
+매 회 새 인터프리터에서 `import server` + create_app(warm_up=False) 까지 걸린 시간을 재고
+중앙값이 예산을 넘거나, 지연 로딩해야 할 무거운 모듈(music21, replicate 등)이 import 시점에
+이미 올라와 있으면 종료 코드 1. 예열(_warm_up) 시간도 함께 기록한다.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED_MODULES = ("music21", "replicate", "midi2audio", "fluidsynth", "mido", "numpy")
+
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import server
+server.create_app(warm_up=False)
+imported = time.perf_counter() - started
+loaded = [m for m in {DEFERRED_MODULES!r} if m in sys.modules]
+started = time.perf_counter()
+server._warm_up()
+print(json.dumps({{"import": imported, "warmUp": time.perf_counter() - started, "eager": loaded}}))
+"""
+
+
+def _probe():
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=0.6, help="import 시간 중앙값 상한(초)")
+    parser.add_argument("--out", help="결과 JSON 파일 경로")
+    args = parser.parse_args()
+
+    samples = [_probe() for _ in range(args.runs)]
+    eager = sorted({m for s in samples for m in s["eager"]})
+    summary = {
+        "runs": args.runs,
+        "budgetSeconds": args.budget,
+        "importSeconds": {"median": round(statistics.median(s["import"] for s in samples), 3),
+                          "max": round(max(s["import"] for s in samples), 3)},
+        "warmUpSeconds": {"median": round(statistics.median(s["warmUp"] for s in samples), 3)},
+        "eagerModules": eager,
+    }
+    summary["pass"] = summary["importSeconds"]["median"] <= args.budget and not eager
+
+    text = json.dumps(summary, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    sys.exit(0 if summary["pass"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""부하 테스트용 외부 서비스/실행 파일 스텁 (Replicate 스텁은 replicate_stub.py)
+
+    python bench/stubs.py papago --port 5056 --latency 0.2
+    python bench/stubs.py audiveris <java 인자...>      # AUDIVERIS_JAVA 대신 실행됨
+    python bench/stubs.py fluidsynth -ni <sf2> <mid> -F <wav> -r <rate>
+
+audiveris / fluidsynth 는 bench/loadtest.py 가 만드는 래퍼 스크립트를 통해 실행되며,
+지연 시간은 환경 변수 STUB_OMR_DELAY, STUB_SYNTH_DELAY(초)와
+STUB_SCORE_MEASURES(만들어 낼 악보의 마디 수)로 조절한다.
+"""
+import argparse
+import os
+import sys
+import time
+import wave
+
+# ───── 가짜 Papago ──────────────────────────────────────────────────
+PAPAGO_CONFIG = {"latency": 0.2, "error_rate": 0.0}
+
+
+def papago_main(argv):
+    import random
+
+    from flask import Flask, jsonify, request
+
+    parser = argparse.ArgumentParser(prog="stubs.py papago")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--latency", type=float, default=PAPAGO_CONFIG["latency"])
+    parser.add_argument("--error-rate", type=float, default=PAPAGO_CONFIG["error_rate"])
+    args = parser.parse_args(argv)
+    PAPAGO_CONFIG.update(latency=args.latency, error_rate=args.error_rate)
+
+    app = Flask(__name__)
+    stats = {"requests": 0, "errors": 0}
+
+    @app.route("/nmt/v1/translation", methods=["POST"])
+    def translate():
+        stats["requests"] += 1
+        time.sleep(PAPAGO_CONFIG["latency"])
+        if random.random() < PAPAGO_CONFIG["error_rate"]:
+            stats["errors"] += 1
+            return jsonify({"errorMessage": "stub: simulated error", "errorCode": "500"}), 500
+        # 실제 Papago 처럼 줄바꿈을 보존한다 (서버가 짧은 문장 여러 개를 줄 단위로 묶어 보냄)
+        text = "\n".join(f"[en] {line}" for line in request.form.get("text", "").split("\n"))
+        return jsonify({"message": {"result": {"srcLangType": request.form.get("source", "ko"),
+                                               "tarLangType": request.form.get("target", "en"),
+                                               "translatedText": text}}})
+
+    @app.route("/stats", methods=["GET"])
+    def papago_stats():
+        return jsonify(stats)
+
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+# ───── 가짜 Audiveris ───────────────────────────────────────────────
+def _canned_musicxml(measures: int) -> str:
+    """4/4 박자 한 파트짜리 C 장조 음계 악보"""
+    steps = "CDEFGAB"
+    body = []
+    for m in range(measures):
+        notes = []
+        for beat in range(4):
+            i = (m * 4 + beat) % 14
+            step, octave = steps[i % 7], 4 + i // 7
+            notes.append(f"<note><pitch><step>{step}</step><octave>{octave}</octave></pitch>"
+                         f"<duration>1</duration><voice>1</voice><type>quarter</type></note>")
+        attributes = ("<attributes><divisions>1</divisions><key><fifths>0</fifths></key>"
+                      "<time><beats>4</beats><beat-type>4</beat-type></time>"
+                      "<clef><sign>G</sign><line>2</line></clef></attributes>") if m == 0 else ""
+        body.append(f'<measure number="{m + 1}">{attributes}{"".join(notes)}</measure>')
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<score-partwise version="3.1"><part-list><score-part id="P1"><part-name>Piano</part-name>'
+            '</score-part></part-list><part id="P1">' + "".join(body) + "</part></score-partwise>\n")
+
+
+def audiveris_main(argv):
+    """java ... org.audiveris.omr.Main -batch -export -output <폴더> [-sheets a-b] <pdf...>"""
+    time.sleep(float(os.getenv("STUB_OMR_DELAY", "2")))
+    args = argv[argv.index("org.audiveris.omr.Main") + 1:]
+    output, pdfs, i = ".", [], 0
+    while i < len(args):
+        if args[i] in ("-output", "-sheets"):
+            if args[i] == "-output":
+                output = args[i + 1]
+            i += 2
+            continue
+        if not args[i].startswith("-"):
+            pdfs.append(args[i])
+        i += 1
+    xml = _canned_musicxml(int(os.getenv("STUB_SCORE_MEASURES", "32")))
+    os.makedirs(output, exist_ok=True)
+    for pdf in pdfs:
+        base = os.path.splitext(os.path.basename(pdf))[0]
+        with open(os.path.join(output, f"{base}.xml"), "w", encoding="utf-8") as f:
+            f.write(xml)
+    print(f"[stub audiveris] {len(pdfs)}개 파일 -> {output}")
+
+
+# ───── 가짜 FluidSynth CLI ──────────────────────────────────────────
+def fluidsynth_main(argv):
+    """midi2audio 가 부르는 형태만 지원: -ni <sf2> <mid> -F <wav> -r <rate>"""
+    time.sleep(float(os.getenv("STUB_SYNTH_DELAY", "1")))
+    wav_path = argv[argv.index("-F") + 1]
+    rate = int(argv[argv.index("-r") + 1]) if "-r" in argv else 44100
+    midi_path = next(a for a in argv if a.lower().endswith((".mid", ".midi")))
+    try:
+        import mido
+        seconds = mido.MidiFile(midi_path).length
+    except Exception:
+        seconds = 10.0
+    with wave.open(wav_path, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\x00" * (4 * int((seconds + 1) * rate)))
+
+
+COMMANDS = {"papago": papago_main, "audiveris": audiveris_main, "fluidsynth": fluidsynth_main}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        sys.exit(f"usage: stubs.py {{{','.join(COMMANDS)}}} ...")
+    COMMANDS[sys.argv[1]](sys.argv[2:])
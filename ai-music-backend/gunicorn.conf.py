@@ -0,0 +1,30 @@
+"""gunicorn 설정 — gevent 워커 (Linux/macOS)
+
+    gunicorn -c gunicorn.conf.py 'server:create_app()'
+
+SSE(/api/music/task/<id>/events)와 long-poll(?wait=) 구독자는 연결마다 OS 스레드를 잡지 않고
+그린렛 하나로 기다린다. gevent 가 threading/socket/subprocess 를 패치하므로 TaskEventHub 의
+Condition.wait, 생성 스케줄러·OMR 워커 스레드, Replicate/Papago HTTP 호출이 모두 협력적으로 양보한다.
+
+주의: 같은 워커 안에서 CPU 를 오래 쓰는 작업(music21 대체 경로 파싱 등)이 도는 동안에는 다른 연결도 멈춘다.
+연결이 많으면 WEB_CONCURRENCY 로 워커를 늘리고 TASK_STORE=sqlite 로 task 상태를 공유한다
+(다른 워커에서 바뀐 상태는 TASK_EVENT_RECHECK 초마다 반영).
+"""
+import os
+
+# trio 가 설치된 환경에서는 httpcore 가 패치 뒤에 처음 import 되면 select.epoll 이 없어 실패하므로
+# 마스터에서 미리 불러 둔다 (gevent 워커는 fork 이후에 패치한다)
+try:
+    import httpcore  # noqa: F401
+except ImportError:
+    pass
+
+bind = os.getenv("BIND", "127.0.0.1:5000")
+worker_class = "gevent"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+# 워커 하나가 동시에 붙잡고 있을 수 있는 연결 수 (SSE 구독 포함)
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", "2000"))
+# SSE 는 하트비트(SSE_HEARTBEAT)마다 데이터를 보내므로 워커 타임아웃과 무관하지만, 업로드가 느린 경우를 위해 넉넉히
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
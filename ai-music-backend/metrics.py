@@ -0,0 +1,162 @@
+"""Prometheus 텍스트 형식(0.0.4) 지표 — 외부 의존성 없는 최소 구현
+
+히스토그램은 관측할 때 버킷 하나만 증가시키고 누적 합은 /metrics 를 긁어 갈 때 계산한다.
+게이지는 값을 직접 set/inc/dec 하거나, 긁어 갈 때 호출할 함수를 넘긴다.
+카운터는 늘어나기만 하는 값으로, 이름은 관례대로 _total 로 끝낸다.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    pairs = [f'{n}="{v}"' for n, v in zip(names, escaped)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], list] = {}   # 라벨 값 -> [버킷별 개수..., +Inf 개수, 합]
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for labelvalues, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _label_text(self.labelnames, labelvalues, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _label_text(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """fn 을 주면 긁어 갈 때 호출한다. 라벨이 있으면 fn 은 {라벨 값(또는 튜플): 값} 을 돌려준다"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 fn: Optional[Callable[[], object]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0}
+
+    def set(self, value: float, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def inc(self, amount: float = 1, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def dec(self, amount: float = 1, *labelvalues: str):
+        self.inc(-amount, *labelvalues)
+
+    def value(self, *labelvalues: str) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0)
+
+    def _current(self) -> Dict[Tuple[str, ...], float]:
+        if self.fn is None:
+            with self._lock:
+                return dict(self._values)
+        value = self.fn()
+        if not self.labelnames:
+            return {(): value}
+        return {k if isinstance(k, tuple) else (k,): v for k, v in value.items()}
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self._current()
+        except Exception:
+            return []   # 한 지표가 실패해도 나머지는 내보낸다
+        for labelvalues, value in sorted(values.items()):
+            if value is not None:
+                lines.append(f"{self.name}{_label_text(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class Counter(Gauge):
+    """프로세스가 뜬 뒤로 단조 증가하는 값. fn 을 주는 경우 fn 도 줄어들지 않는 값을 돌려줘야 한다"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, *labelvalues: str):
+        if amount < 0:
+            raise ValueError("카운터는 줄일 수 없습니다")
+        super().inc(amount, *labelvalues)
+
+    def set(self, value: float, *labelvalues: str):
+        raise TypeError("카운터는 set 할 수 없습니다")
+
+    def dec(self, amount: float = 1, *labelvalues: str):
+        raise TypeError("카운터는 줄일 수 없습니다")
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,428 @@
+"""MusicXML/MXL -> MIDI 빠른 변환기 (music21 없이 스트리밍으로 처리)
+
+Audiveris 가 만드는 일반적인 악보(음표, 쉼표, 화음, 붙임줄, 템포, 단순 반복/volta, 여러 파트)를
+ElementTree.iterparse 로 마디 단위로 읽어 바로 MIDI 로 쓴다. 같은 패스에서 템포 맵으로 실제
+연주 시간(초)을 계산한다. 처리할 수 없는 악보는 Unsupported 를 던지며, server.py 는 이때 기존
+music21 경로(converter.parse -> expandRepeats -> write('midi'))로 대체한다.
+
+    seconds = convert("score.mxl", "score.mid")
+"""
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from fractions import Fraction
+from typing import Dict, List, Optional, Tuple
+
+TICKS_PER_QUARTER = 480
+DEFAULT_TEMPO = 120.0
+DEFAULT_VELOCITY = 90
+MAX_EXPANSION = 16          # 반복 전개 후 마디 수가 원래의 몇 배를 넘으면 구조가 잘못된 것으로 본다
+
+_STEPS = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+_NOTE_TYPES = {"long": 16, "breve": 8, "whole": 4, "half": 2, "quarter": 1, "eighth": Fraction(1, 2),
+               "16th": Fraction(1, 4), "32nd": Fraction(1, 8), "64th": Fraction(1, 16), "128th": Fraction(1, 32)}
+_BEAT_UNITS = _NOTE_TYPES
+# 점프 기호(D.C./D.S./Coda/Fine)는 music21 의 expandRepeats 로 넘긴다
+_JUMP_SOUND_ATTRS = ("dacapo", "dalsegno", "segno", "coda", "tocoda", "fine")
+
+
+class Unsupported(Exception):
+    """빠른 변환기가 처리하지 않는 악보 (music21 로 대체해야 함)"""
+
+
+class _Measure:
+    __slots__ = ("length", "notes", "tempos", "forward", "backward", "endings", "ending_stop")
+
+    def __init__(self):
+        self.length = Fraction(0)
+        self.notes: List[tuple] = []          # (start, dur, pitch, velocity, tie_start, tie_stop)
+        self.tempos: List[Tuple[Fraction, float]] = []
+        self.forward = False
+        self.backward = 0                     # 0 이면 반복 끝 아님, 아니면 연주 횟수
+        self.endings: Optional[Tuple[int, ...]] = None
+        self.ending_stop = False
+
+
+def _open_score(path: str):
+    """.mxl 이면 container.xml 이 가리키는 루트 파일을, 아니면 파일 자체를 연다"""
+    if not zipfile.is_zipfile(path):
+        return open(path, "rb")
+    zf = zipfile.ZipFile(path)
+    names = zf.namelist()
+    root_name = None
+    if "META-INF/container.xml" in names:
+        rootfile = ET.fromstring(zf.read("META-INF/container.xml")).find(".//rootfile")
+        if rootfile is not None:
+            root_name = rootfile.get("full-path")
+    if not root_name:
+        root_name = next((n for n in names if n.endswith((".xml", ".musicxml")) and not n.startswith("META-INF")), None)
+    if not root_name:
+        raise Unsupported("MXL 안에서 MusicXML 파일을 찾을 수 없습니다")
+    return zf.open(root_name)
+
+
+def _text_int(el, path: str, default: int = 0) -> int:
+    node = el.find(path)
+    if node is None or not (node.text or "").strip():
+        return default
+    return int(round(float(node.text)))
+
+
+def _parse_endings(number: str) -> Tuple[int, ...]:
+    nums = tuple(int(n) for n in re.split(r"[,\s]+", number or "") if n.isdigit())
+    if not nums:
+        raise Unsupported(f"volta 번호를 해석할 수 없습니다: {number!r}")
+    return nums
+
+
+def _typed_duration(note) -> Optional[Fraction]:
+    """<type>/<dot>/<time-modification> 으로 계산한 길이 (type 이 없으면 None)"""
+    base = _NOTE_TYPES.get((note.findtext("type") or "").strip())
+    if base is None:
+        return None
+    dur = Fraction(base)
+    dot = dur / 2
+    for _ in note.findall("dot"):
+        dur += dot
+        dot /= 2
+    mod = note.find("time-modification")
+    if mod is not None:
+        dur = dur * _text_int(mod, "normal-notes", 1) / max(1, _text_int(mod, "actual-notes", 1))
+    return dur
+
+
+def _metronome_bpm(metronome) -> Optional[float]:
+    unit = _BEAT_UNITS.get((metronome.findtext("beat-unit") or "").strip())
+    per_minute = (metronome.findtext("per-minute") or "").strip()
+    match = re.search(r"\d+(\.\d+)?", per_minute)
+    if unit is None or not match:
+        return None
+    beat = Fraction(unit)
+    dot = beat / 2
+    for _ in metronome.findall("beat-unit-dot"):
+        beat += dot
+        dot /= 2
+    return float(match.group()) * float(beat)
+
+
+class _PartReader:
+    """한 파트의 마디들을 순서대로 읽어 _Measure 로 만든다 (divisions/transpose 상태 유지)"""
+
+    def __init__(self):
+        self.divisions = 1
+        self.transpose = 0
+        self.bar_length = Fraction(4)
+        self.velocity = DEFAULT_VELOCITY
+        self.endings: Optional[Tuple[int, ...]] = None
+
+    def _sound(self, sound, pos: Fraction, measure: _Measure):
+        for attr in _JUMP_SOUND_ATTRS:
+            if sound.get(attr) is not None:
+                raise Unsupported(f"점프 기호({attr})는 music21 로 처리합니다")
+        if sound.get("tempo"):
+            measure.tempos.append((pos, float(sound.get("tempo"))))
+        if sound.get("dynamics"):
+            self.velocity = max(1, min(127, round(float(sound.get("dynamics")) * DEFAULT_VELOCITY / 100)))
+
+    def read(self, el) -> _Measure:
+        m = _Measure()
+        pos = Fraction(0)
+        high = Fraction(0)
+        last_start = Fraction(0)
+        voice_ends: Dict[str, Fraction] = {}
+        for child in el:
+            tag = child.tag
+            if tag == "note":
+                # 꾸밈음은 길이가 없어 music21 도 note_off 없는 note_on 만 남기므로 건너뛴다
+                if child.find("grace") is not None or child.find("cue") is not None:
+                    continue
+                if child.find("unpitched") is not None:
+                    raise Unsupported("타악기(unpitched) 파트는 music21 로 처리합니다")
+                dur = Fraction(_text_int(child, "duration"), self.divisions)
+                rest = child.find("rest")
+                if rest is None or rest.get("measure") != "yes":
+                    typed = _typed_duration(child)
+                    if typed is not None and typed != dur:
+                        # duration 과 type 이 어긋나면 music21 은 음표마다 다르게 해석해 위치가 밀린다
+                        raise Unsupported(f"duration 과 type 이 다른 음표가 있습니다 ({dur} != {typed})")
+                if child.find("chord") is not None:
+                    start = last_start
+                else:
+                    start = pos
+                    pos += dur
+                last_start = start
+                pitch_el = child.find("pitch")
+                if pitch_el is not None and dur > 0:
+                    step = (pitch_el.findtext("step") or "").strip()
+                    if step not in _STEPS:
+                        raise Unsupported(f"알 수 없는 음이름: {step!r}")
+                    alter = round(float(pitch_el.findtext("alter") or 0))
+                    pitch = (_text_int(pitch_el, "octave", 4) + 1) * 12 + _STEPS[step] + alter + self.transpose
+                    if not 0 <= pitch <= 127:
+                        raise Unsupported(f"MIDI 범위를 벗어난 음: {pitch}")
+                    ties = {t.get("type") for t in child.findall("tie")}
+                    velocity = self.velocity
+                    if child.get("dynamics"):
+                        velocity = max(1, min(127, round(float(child.get("dynamics")) * DEFAULT_VELOCITY / 100)))
+                    m.notes.append((start, dur, pitch, velocity, "start" in ties, "stop" in ties))
+                high = max(high, start + dur)
+                voice = child.findtext("voice") or "1"
+                voice_ends[voice] = max(voice_ends.get(voice, Fraction(0)), start + dur)
+            elif tag == "backup":
+                pos -= Fraction(_text_int(child, "duration"), self.divisions)
+                if pos < 0:
+                    raise Unsupported("backup 이 마디 시작보다 앞으로 갑니다")
+            elif tag == "forward":
+                pos += Fraction(_text_int(child, "duration"), self.divisions)
+                high = max(high, pos)
+            elif tag == "attributes":
+                if child.find("divisions") is not None:
+                    self.divisions = max(1, _text_int(child, "divisions", 1))
+                transpose = child.find("transpose")
+                if transpose is not None:
+                    self.transpose = (_text_int(transpose, "chromatic")
+                                      + 12 * _text_int(transpose, "octave-change"))
+                time_el = child.find("time")
+                if time_el is not None and time_el.find("beats") is not None:
+                    try:
+                        beats = sum(Fraction(b) for b in time_el.findtext("beats").split("+"))
+                        self.bar_length = beats * 4 / Fraction(time_el.findtext("beat-type"))
+                    except (ValueError, ZeroDivisionError, TypeError):
+                        pass
+            elif tag in ("direction", "sound"):
+                at = pos
+                offset = child.find("offset")
+                if offset is not None and (offset.text or "").strip():
+                    at = max(Fraction(0), pos + Fraction(_text_int(child, "offset"), self.divisions))
+                    # music21 은 offset 으로 밀린 지시어까지 마디 길이에 포함한다
+                    high = max(high, at)
+                sounds = [child] if tag == "sound" else child.findall("sound")
+                tempo_count = len(m.tempos)
+                for sound in sounds:
+                    self._sound(sound, at, m)
+                if tag == "direction" and len(m.tempos) == tempo_count:
+                    metronome = child.find("direction-type/metronome")
+                    bpm = _metronome_bpm(metronome) if metronome is not None else None
+                    if bpm:
+                        m.tempos.append((at, bpm))
+                for text in child.iter("words"):
+                    if re.search(r"\b(D\.?\s?C\.?|D\.?\s?S\.?|da capo|dal segno|to coda|fine)\b", text.text or "", re.I):
+                        raise Unsupported(f"점프 지시어 '{text.text}' 는 music21 로 처리합니다")
+                if child.find("direction-type/segno") is not None or child.find("direction-type/coda") is not None:
+                    raise Unsupported("segno/coda 는 music21 로 처리합니다")
+            elif tag == "barline":
+                repeat = child.find("repeat")
+                if repeat is not None:
+                    if repeat.get("direction") == "forward":
+                        m.forward = True
+                    elif repeat.get("direction") == "backward":
+                        m.backward = int(repeat.get("times") or 2)
+                ending = child.find("ending")
+                if ending is not None:
+                    kind = ending.get("type")
+                    if kind == "start":
+                        self.endings = _parse_endings(ending.get("number"))
+                    elif kind in ("stop", "discontinue"):
+                        m.endings = m.endings or self.endings or _parse_endings(ending.get("number"))
+                        m.ending_stop = True
+                if child.find("segno") is not None or child.find("coda") is not None:
+                    raise Unsupported("segno/coda 는 music21 로 처리합니다")
+        m.endings = m.endings or self.endings
+        if m.ending_stop:
+            self.endings = None
+        # 음표가 없는 마디(마디 쉼표가 duration 없이 적힌 경우 등)는 박자표 길이를 쓴다
+        if len(set(voice_ends.values())) > 1:
+            # 성부마다 길이가 다르면 music21 은 마디 길이를 high 와 다르게 잡아 뒤 마디가 밀린다
+            raise Unsupported("마디 안의 성부 길이가 서로 다릅니다")
+        m.length = high if high > 0 else self.bar_length
+        return m
+
+
+def _play_order(measures: List[_Measure]) -> List[int]:
+    """반복 기호와 volta 를 따라 실제 연주 순서(마디 인덱스 목록)를 만든다"""
+    order: List[int] = []
+    passes: Dict[int, int] = {}
+    start, current_pass, i = 0, 1, 0
+    explicit = True      # start 가 곡 처음이거나 forward 반복 기호에서 정해졌는지
+    limit = max(1, len(measures)) * MAX_EXPANSION
+    while i < len(measures):
+        m = measures[i]
+        if m.forward and (i != start or not explicit):
+            start, current_pass, explicit = i, 1, True
+        if m.backward and not explicit:
+            # 앞 반복 기호 없는 두 번째 반복 끝을 music21 은 곡 처음으로 되돌아가는 것으로 해석한다
+            raise Unsupported("forward 기호 없이 이어지는 반복은 music21 로 처리합니다")
+        if m.endings and current_pass not in m.endings:
+            i += 1
+            continue
+        order.append(i)
+        if len(order) > limit:
+            raise Unsupported("반복 구조를 전개할 수 없습니다")
+        if m.backward:
+            done = passes.get(i, 1)
+            if done < m.backward:
+                if m.endings and (i + 1 >= len(measures) or not measures[i + 1].endings):
+                    # 다음 volta 가 없는 1번 괄호는 music21 이 반복하지 않는 것으로 해석한다
+                    raise Unsupported("짝이 없는 volta 는 music21 로 처리합니다")
+                passes[i] = done + 1
+                current_pass = done + 1
+                i = start
+                continue
+            start, current_pass, explicit = i + 1, 1, False
+        elif m.ending_stop:
+            start, current_pass, explicit = i + 1, 1, False
+        i += 1
+    return order
+
+
+def _read_score(path: str):
+    parts: Dict[str, dict] = {}
+    part_order: List[str] = []
+    measures: Dict[str, List[_Measure]] = {}
+    reader: Optional[_PartReader] = None
+    current = None
+    with _open_score(path) as f:
+        for event, el in ET.iterparse(f, events=("start", "end")):
+            tag = el.tag
+            if event == "start":
+                if tag == "score-timewise":
+                    raise Unsupported("score-timewise 형식은 music21 로 처리합니다")
+                if tag == "part":
+                    current = el.get("id")
+                    if current in measures:
+                        raise Unsupported(f"중복된 파트 id: {current}")
+                    measures[current] = []
+                    reader = _PartReader()
+                continue
+            if tag == "score-part":
+                pid = el.get("id")
+                program = _text_int(el, "midi-instrument/midi-program", 1) - 1
+                if el.find("midi-instrument/midi-unpitched") is not None or _text_int(el, "midi-instrument/midi-channel", 1) == 10:
+                    raise Unsupported("타악기 파트는 music21 로 처리합니다")
+                parts[pid] = {"name": (el.findtext("part-name") or pid).strip(), "program": max(0, min(127, program))}
+                part_order.append(pid)
+                el.clear()
+            elif tag == "measure" and reader is not None:
+                measures[current].append(reader.read(el))
+                el.clear()
+            elif tag == "part":
+                reader = None
+                el.clear()
+    for pid in measures:
+        if pid not in parts:
+            parts[pid] = {"name": pid, "program": 0}
+            part_order.append(pid)
+    part_ids = [pid for pid in part_order if pid in measures]
+    if not part_ids:
+        raise Unsupported("파트가 없습니다")
+    counts = {len(measures[pid]) for pid in part_ids}
+    if len(counts) != 1:
+        raise Unsupported("파트마다 마디 수가 다릅니다")
+    if len(part_ids) > 15:
+        raise Unsupported("파트가 15개를 넘습니다")
+    return [(parts[pid], measures[pid]) for pid in part_ids]
+
+
+def _tempo_map(tempos: List[Tuple[Fraction, float]]) -> List[Tuple[Fraction, float]]:
+    """같은 위치에 템포가 여럿이면 music21 처럼 먼저 나온 것을 쓴다"""
+    result: List[Tuple[Fraction, float]] = []
+    seen = set()
+    for offset, bpm in sorted(tempos, key=lambda t: t[0]):
+        if bpm <= 0 or offset in seen:
+            continue
+        seen.add(offset)
+        if not result or result[-1][1] != bpm:
+            result.append((offset, bpm))
+    if not result or result[0][0] > 0:
+        result.insert(0, (Fraction(0), DEFAULT_TEMPO))
+    return result
+
+
+def _seconds(tempo_map: List[Tuple[Fraction, float]], end: Fraction) -> float:
+    total = 0.0
+    for idx, (offset, bpm) in enumerate(tempo_map):
+        if offset >= end:
+            break
+        nxt = tempo_map[idx + 1][0] if idx + 1 < len(tempo_map) else end
+        total += float(min(nxt, end) - offset) * 60.0 / bpm
+    return total
+
+
+def _tie_notes(events: List[tuple]) -> List[Tuple[Fraction, Fraction, int, int]]:
+    """펼친 타임라인 위에서 붙임줄로 이어진 음을 하나로 합친다"""
+    notes: List[list] = []
+    open_ties: Dict[int, list] = {}
+    for start, dur, pitch, velocity, tie_start, tie_stop in sorted(events, key=lambda e: (e[0], e[2])):
+        held = open_ties.get(pitch) if tie_stop else None
+        if held is not None and held[0] + held[1] == start:
+            held[1] += dur
+            if not tie_start:
+                del open_ties[pitch]
+            continue
+        note = [start, dur, pitch, velocity]
+        notes.append(note)
+        if tie_start:
+            open_ties[pitch] = note
+    return [tuple(n) for n in notes]
+
+
+def convert(path: str, midi_path: str) -> float:
+    """MusicXML/MXL 을 MIDI 로 저장하고 템포 맵으로 계산한 연주 시간(초)을 반환"""
+    import mido
+
+    score = _read_score(path)
+    first = score[0][1]
+    order = _play_order(first)
+    lengths = [first[i].length for i in range(len(first))]
+    for _, measures in score[1:]:
+        if any(m.length != length for m, length in zip(measures, lengths)):
+            # music21 은 파트마다 마디 위치를 따로 누적하므로 결과를 맞출 수 없다 (OMR 오류 등)
+            raise Unsupported("파트마다 마디 길이가 다릅니다")
+
+    # 펼친 순서대로 마디 시작 위치를 계산
+    offsets: List[Fraction] = []
+    cursor = Fraction(0)
+    for i in order:
+        offsets.append(cursor)
+        cursor += lengths[i]
+    end = cursor
+
+    tempos = [(offsets[k] + at, bpm) for _, measures in score
+              for k, i in enumerate(order) for at, bpm in measures[i].tempos]
+    tempo_map = _tempo_map(tempos)
+
+    mid = mido.MidiFile(type=1, ticks_per_beat=TICKS_PER_QUARTER)
+    conductor = mido.MidiTrack()
+    last = 0
+    for offset, bpm in tempo_map:
+        tick = int(round(offset * TICKS_PER_QUARTER))
+        conductor.append(mido.MetaMessage("set_tempo", tempo=mido.bpm2tempo(bpm), time=tick - last))
+        last = tick
+    mid.tracks.append(conductor)
+
+    channels = [c for c in range(16) if c != 9]
+    for idx, (info, measures) in enumerate(score):
+        channel = channels[idx]
+        events = []
+        for k, i in enumerate(order):
+            base = offsets[k]
+            events.extend((base + n[0],) + n[1:] for n in measures[i].notes)
+        timed = []
+        for start, dur, pitch, velocity in _tie_notes(events):
+            on = int(round(start * TICKS_PER_QUARTER))
+            off = int(round((start + dur) * TICKS_PER_QUARTER))
+            # 같은 tick 에서는 note_off 를 먼저 내보내야 같은 음 연타가 끊기지 않는다
+            timed.append((on, 1, mido.Message("note_on", channel=channel, note=pitch, velocity=velocity)))
+            timed.append((off, 0, mido.Message("note_off", channel=channel, note=pitch, velocity=0)))
+        timed.sort(key=lambda e: (e[0], e[1]))
+        track = mido.MidiTrack()
+        track.append(mido.MetaMessage("track_name", name=info["name"], time=0))
+        track.append(mido.Message("program_change", channel=channel, program=info["program"], time=0))
+        last = 0
+        for tick, _, msg in timed:
+            track.append(msg.copy(time=tick - last))
+            last = tick
+        mid.tracks.append(track)
+
+    mid.save(midi_path)
+    return _seconds(tempo_map, end)
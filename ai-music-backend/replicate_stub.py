@@ -0,0 +1,200 @@
+"""Replicate 예측 API 로컬 스텁 (오프라인 부하 테스트용)
+
+server.py 의 PredictionEngine 이 사용하는 엔드포인트만 흉내낸다.
+
+    python replicate_stub.py --port 5055 --latency 8 --jitter 4 --error-rate 0.05
+
+    # 다른 터미널에서
+    REPLICATE_API_TOKEN=stub REPLICATE_BASE_URL=http://127.0.0.1:5055 python server.py
+
+예측은 생성 시각 + 지연 시간이 지나면 조회 시점에 완료로 계산되므로, 진행 중인 예측이
+수천 개여도 스텁 쪽에는 추가 스레드가 생기지 않는다. (웹훅 전송만 타이머를 사용)
+"""
+import argparse
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict
+
+import requests
+from flask import Flask, Response, jsonify, request
+
+app = Flask(__name__)
+
+CONFIG: Dict[str, Any] = {
+    "latency": 8.0,         # 예측 완료까지 걸리는 시간(초)
+    "jitter": 0.0,          # latency 에 더해지는 0~jitter 초의 무작위 지연
+    "error_rate": 0.0,      # 예측이 failed 로 끝날 확률
+    "rate_limit_rate": 0.0, # 예측 생성 요청에 429를 돌려줄 확률
+    "output_bytes": 64 * 1024,
+    "base_url": "http://127.0.0.1:5055",
+}
+
+PREDICTIONS: Dict[str, Dict[str, Any]] = {}
+FILES: Dict[str, bytes] = {}
+LOCK = threading.Lock()
+
+
+def _now_iso(ts: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+
+def _view(pred: Dict[str, Any]) -> Dict[str, Any]:
+    """조회 시점 기준으로 상태를 계산해 Replicate 응답 형식으로 반환"""
+    now = time.time()
+    status = pred["status"]
+    if status in ("starting", "processing"):
+        status = "succeeded" if now >= pred["done_at"] else ("processing" if now - pred["created"] > 0.5 else "starting")
+        if status == "succeeded" and pred["fail"]:
+            status = "failed"
+        if status in ("succeeded", "failed"):
+            pred["status"] = status
+    pid = pred["id"]
+    return {
+        "id": pid,
+        "model": pred["model"],
+        "version": pred["version"],
+        "status": status,
+        "input": pred["input"],
+        "output": f"{CONFIG['base_url']}/files/{pid}.mp3" if status == "succeeded" else None,
+        "logs": "",
+        "error": "stub: simulated model error" if status == "failed" else None,
+        "metrics": {"predict_time": pred["done_at"] - pred["created"]} if status == "succeeded" else {},
+        "created_at": _now_iso(pred["created"]),
+        "started_at": _now_iso(pred["created"]),
+        "completed_at": _now_iso(pred["done_at"]) if status in ("succeeded", "failed", "canceled") else None,
+        "urls": {
+            "get": f"{CONFIG['base_url']}/v1/predictions/{pid}",
+            "cancel": f"{CONFIG['base_url']}/v1/predictions/{pid}/cancel",
+        },
+    }
+
+
+def _send_webhook(pid: str):
+    with LOCK:
+        pred = PREDICTIONS.get(pid)
+        body = _view(pred) if pred else None
+    if body and pred.get("webhook"):
+        try:
+            requests.post(pred["webhook"], json=body, timeout=5)
+        except requests.exceptions.RequestException as e:
+            print(f"[stub] 웹훅 전송 실패: {e}")
+
+
+def _create(model: str, version: str):
+    if random.random() < CONFIG["rate_limit_rate"]:
+        return jsonify({"title": "Too Many Requests", "detail": "stub rate limit", "status": 429}), 429
+    body = request.get_json(force=True, silent=True) or {}
+    now = time.time()
+    pred = {
+        "id": uuid.uuid4().hex[:20],
+        "model": model,
+        "version": version,
+        "status": "starting",
+        "input": body.get("input") or {},
+        "created": now,
+        "done_at": now + CONFIG["latency"] + random.uniform(0, CONFIG["jitter"]),
+        "fail": random.random() < CONFIG["error_rate"],
+        "webhook": body.get("webhook"),
+    }
+    with LOCK:
+        PREDICTIONS[pred["id"]] = pred
+        view = _view(pred)
+    if pred["webhook"]:
+        timer = threading.Timer(pred["done_at"] - now, _send_webhook, args=(pred["id"],))
+        timer.daemon = True
+        timer.start()
+    return jsonify(view), 201
+
+
+@app.route("/v1/models/<owner>/<name>/predictions", methods=["POST"])
+def create_model_prediction(owner, name):
+    return _create(f"{owner}/{name}", "stub")
+
+
+@app.route("/v1/predictions", methods=["POST"])
+def create_prediction():
+    body = request.get_json(force=True, silent=True) or {}
+    return _create("stub/model", body.get("version") or "stub")
+
+
+@app.route("/v1/predictions/<pid>", methods=["GET"])
+def get_prediction(pid):
+    with LOCK:
+        pred = PREDICTIONS.get(pid)
+        if not pred:
+            return jsonify({"title": "Not found", "status": 404}), 404
+        return jsonify(_view(pred))
+
+
+@app.route("/v1/predictions/<pid>/cancel", methods=["POST"])
+def cancel_prediction(pid):
+    with LOCK:
+        pred = PREDICTIONS.get(pid)
+        if not pred:
+            return jsonify({"title": "Not found", "status": 404}), 404
+        if pred["status"] in ("starting", "processing") and _view(pred)["status"] not in ("succeeded", "failed"):
+            pred["status"] = "canceled"
+            pred["done_at"] = time.time()
+        return jsonify(_view(pred))
+
+
+@app.route("/v1/files", methods=["POST"])
+def upload_file():
+    f = request.files.get("content")
+    data = f.read() if f else b""
+    fid = uuid.uuid4().hex
+    with LOCK:
+        FILES[fid] = data
+    now = time.time()
+    return jsonify({
+        "id": fid,
+        "name": f.filename if f else "file",
+        "content_type": f.mimetype if f else "application/octet-stream",
+        "size": len(data),
+        "etag": fid,
+        "checksums": {},
+        "metadata": {},
+        "created_at": _now_iso(now),
+        "expires_at": _now_iso(now + 3600),
+        "urls": {"get": f"{CONFIG['base_url']}/v1/files/{fid}"},
+    }), 201
+
+
+@app.route("/files/<pid>.mp3", methods=["GET"])
+def output_file(pid):
+    # 재생 가능한 파일일 필요는 없으므로 고정 크기의 더미 바이트를 돌려준다
+    return Response(b"\xff\xfb" + b"\x00" * (CONFIG["output_bytes"] - 2), mimetype="audio/mpeg")
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    with LOCK:
+        counts: Dict[str, int] = {}
+        for pred in PREDICTIONS.values():
+            st = _view(pred)["status"]
+            counts[st] = counts.get(st, 0) + 1
+    return jsonify({"predictions": counts, "files": len(FILES)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replicate prediction API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--latency", type=float, default=CONFIG["latency"])
+    parser.add_argument("--jitter", type=float, default=CONFIG["jitter"])
+    parser.add_argument("--error-rate", type=float, default=CONFIG["error_rate"])
+    parser.add_argument("--rate-limit-rate", type=float, default=CONFIG["rate_limit_rate"])
+    parser.add_argument("--output-bytes", type=int, default=CONFIG["output_bytes"])
+    args = parser.parse_args()
+    CONFIG.update(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, output_bytes=args.output_bytes,
+        base_url=f"http://{args.host}:{args.port}",
+    )
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
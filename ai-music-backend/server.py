@@ -1,42 +1,86 @@
 import os
+import asyncio
+import functools
 import uuid
 import time
 import threading
+import queue
 import subprocess
 import importlib
-from io import BytesIO
+import hashlib
+import random
+import json
+import logging
+import re
+import shutil
+import sqlite3
+import tempfile
+import warnings
+import wave
+import zipfile
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from pathlib import Path
 from typing import Any, Dict, Optional, List
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
-import replicate
-from music21 import converter
 import requests
 
-midi2audio_spec = importlib.util.find_spec("midi2audio")
-if midi2audio_spec:
-    midi2audio_module = importlib.import_module("midi2audio")
-    FluidSynth = getattr(midi2audio_module, "FluidSynth", None)
-else:
-    FluidSynth = None
+import metrics
+import musicxml_midi
+import synth_worker
 
 # ───── env ──────────────────────────────────────────────────────────
 load_dotenv(dotenv_path=Path(__file__).parent / ".env", override=True)
 
 REPLICATE_TOKEN = os.getenv("REPLICATE_API_TOKEN")
 MODEL_SLUG = os.getenv("REPLICATE_MODEL", "meta/musicgen")
-client = replicate.Client(api_token=REPLICATE_TOKEN) if REPLICATE_TOKEN else None
+# 로컬 스텁(replicate_stub.py)으로 부하 테스트할 때 REPLICATE_BASE_URL=http://127.0.0.1:5055 지정
+REPLICATE_BASE_URL = os.getenv("REPLICATE_BASE_URL")
+
+# replicate / music21 / midi2audio 는 import 만으로 수백 ms 가 걸리므로 모듈 로드 시점이 아니라
+# 처음 쓸 때(또는 create_app 의 예열 스레드에서) 불러온다
+_lazy_lock = threading.RLock()
+_client = None
+
+def _get_client():
+    """Replicate 클라이언트 (토큰이 없으면 None)"""
+    global _client
+    if _client is None and REPLICATE_TOKEN:
+        with _lazy_lock:
+            if _client is None:
+                import replicate
+                _client = replicate.Client(api_token=REPLICATE_TOKEN,
+                                           **({"base_url": REPLICATE_BASE_URL} if REPLICATE_BASE_URL else {}))
+    return _client
+
+# 클라이언트에 돌려주는 /api/audio URL 의 기준 주소
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://127.0.0.1:5000").rstrip("/")
 
 PAPAGO_CLIENT_ID = os.getenv("PAPAGO_CLIENT_ID")
 PAPAGO_CLIENT_SECRET = os.getenv("PAPAGO_CLIENT_SECRET")
+# 부하 테스트 때는 bench/stubs.py 의 가짜 Papago 주소로 바꾼다
+PAPAGO_URL = os.getenv("PAPAGO_URL", "https://papago.apigw.ntruss.com/nmt/v1/translation")
 
 # ───── Flask app ────────────────────────────────────────────────────
 app = Flask(__name__)
 CORS(app)
 
+log = logging.getLogger("mai")
+
+# ───── 지표 ─────────────────────────────────────────────────────────
+# 단계별 소요 시간은 mai_stage_seconds{stage=...} 히스토그램 하나에 모은다 (게이지와 /metrics 는 아래쪽)
+metrics_registry = metrics.Registry()
+STAGE_SECONDS = metrics_registry.histogram(
+    "mai_stage_seconds", "Time spent in each processing stage", ["stage"])
+HTTP_SECONDS = metrics_registry.histogram(
+    "mai_http_request_seconds", "HTTP request handling time", ["endpoint", "method", "status"])
+
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
 OUTPUT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "outputs")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -49,69 +93,463 @@ fluidsynth_executable_path = r'C:\Program Files\FluidSynth\bin'
 if fluidsynth_executable_path not in os.environ['PATH']:
     os.environ['PATH'] += os.pathsep + fluidsynth_executable_path
 
-# ───── in-memory task 관리 ───────────────────────────────────────────
-TASKS: Dict[str, Dict[str, Any]] = {}
+# ───── task 저장소 ───────────────────────────────────────────────
+# TASK_STORE=memory : 프로세스 내부 (TTL + 최대 개수 제한)
+# TASK_STORE=sqlite : WAL 모드 SQLite 파일, gunicorn 워커 여러 개가 같은 task를 조회할 수 있다
+TASK_STORE = os.getenv("TASK_STORE", "memory")
+TASK_DB_PATH = os.getenv("TASK_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tasks.db"))
+TASK_TTL = int(os.getenv("TASK_TTL", "86400"))            # 끝난 task 보관 시간(초)
+TASK_MAX_ENTRIES = int(os.getenv("TASK_MAX_ENTRIES", "10000"))
+TASK_TERMINAL = ("succeeded", "failed", "canceled")
+
+class TaskStore(ABC):
+    """task 상태 저장소 인터페이스. 모든 연산은 task id 기준 O(1)."""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def set(self, task_id: str, task: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def delete(self, task_id: str):
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+class MemoryTaskStore(TaskStore):
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, tuple] = {}   # id -> (task, updated_at)
+        # 끝난 task 만 마지막 갱신 순서로 따로 유지한다. 만료/개수 제한으로 지우는 것은 이 중 가장 오래된 것뿐이라
+        # 대기 중이거나 실행 중인 task 는 밀려나지 않는다 (SqliteTaskStore.prune 과 같은 규칙)
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+
+    def _expired(self, task: Dict[str, Any], updated_at: float, now: float) -> bool:
+        return task.get("status") in TASK_TERMINAL and updated_at + self.ttl < now
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        if not task_id:
+            return None
+        with self._lock:
+            entry = self._tasks.get(task_id)
+            if entry is None:
+                return None
+            if self._expired(entry[0], entry[1], time.time()):
+                del self._tasks[task_id]
+                self._finished.pop(task_id, None)
+                return None
+            return entry[0]
+
+    def set(self, task_id: str, task: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._tasks[task_id] = (task, now)
+            if task.get("status") in TASK_TERMINAL:
+                self._finished[task_id] = None
+                self._finished.move_to_end(task_id)
+            else:
+                self._finished.pop(task_id, None)
+            while self._finished:
+                oldest_id = next(iter(self._finished))
+                oldest, updated_at = self._tasks[oldest_id]
+                if len(self._tasks) > self.max_entries or self._expired(oldest, updated_at, now):
+                    del self._tasks[oldest_id]
+                    del self._finished[oldest_id]
+                else:
+                    break
+
+    def delete(self, task_id: str):
+        with self._lock:
+            self._tasks.pop(task_id, None)
+            self._finished.pop(task_id, None)
+
+    def count(self) -> int:
+        return len(self._tasks)
+
+class SqliteTaskStore(TaskStore):
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str, ttl: int, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_updated ON tasks(status, updated_at)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간 공유하지 않는다
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        if not task_id:
+            return None
+        row = self._conn().execute(
+            "SELECT data, status, updated_at FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        if row[1] in TASK_TERMINAL and row[2] + self.ttl < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, task_id: str, task: Dict[str, Any]):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tasks (id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+                (task_id, task.get("status") or "", json.dumps(task, ensure_ascii=False), time.time()))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete(self, task_id: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def prune(self):
+        terminal = ",".join("?" * len(TASK_TERMINAL))
+        conn = self._conn()
+        with conn:
+            conn.execute(f"DELETE FROM tasks WHERE status IN ({terminal}) AND updated_at < ?",
+                         (*TASK_TERMINAL, time.time() - self.ttl))
+            excess = self.count() - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    f"DELETE FROM tasks WHERE id IN (SELECT id FROM tasks WHERE status IN ({terminal})"
+                    " ORDER BY updated_at LIMIT ?)", (*TASK_TERMINAL, excess))
+
+def _create_task_store() -> TaskStore:
+    if TASK_STORE == "sqlite":
+        return SqliteTaskStore(TASK_DB_PATH, TASK_TTL, TASK_MAX_ENTRIES)
+    return MemoryTaskStore(TASK_TTL, TASK_MAX_ENTRIES)
+
+task_store = _create_task_store()
+
+def _get_task(task_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    return task_store.get(task_id) if task_id else None
+
+# ───── task 상태 변경 알림 (SSE / long-poll) ─────────────────────────
+# 구독자는 task별 Condition 에서 잠들어 있다가 _set_task_status 가 호출될 때만 깨어난다.
+# 다른 프로세스(SQLite 저장소)에서 바뀐 상태는 TASK_EVENT_RECHECK 초마다 저장소를 다시 읽어 반영한다.
+# gunicorn.conf.py 의 gevent 워커로 띄우면 이 대기가 스레드가 아니라 그린렛 하나씩이라 구독자 수가 스레드 수에 묶이지 않는다.
+# (werkzeug 개발 서버나 스레드 워커에서는 열린 스트림마다 요청 스레드 하나를 잡는다)
+TASK_EVENT_RECHECK = float(os.getenv("TASK_EVENT_RECHECK", "5"))
+TASK_WAIT_MAX = float(os.getenv("TASK_WAIT_MAX", "30"))
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", "15"))
+
+class TaskEventHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conds: Dict[str, list] = {}   # task_id -> [Condition, 구독자 수]
+
+    def publish(self, task_id: str):
+        with self._lock:
+            entry = self._conds.get(task_id)
+        if entry:
+            with entry[0]:
+                entry[0].notify_all()
+
+    def wait_for_change(self, task_id: str, since: Optional[float], timeout: float) -> Optional[Dict[str, Any]]:
+        """task의 updatedAt 이 since 보다 새로워지거나 끝난 상태가 되면 반환, 시간 초과 시 현재 상태 반환"""
+        with self._lock:
+            entry = self._conds.setdefault(task_id, [threading.Condition(), 0])
+            entry[1] += 1
+        deadline = time.monotonic() + timeout
+        try:
+            with entry[0]:
+                while True:
+                    task = _get_task(task_id)
+                    if (task is None or task.get("status") in TASK_TERMINAL
+                            or since is None or task.get("updatedAt", 0) > since):
+                        return task
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return task
+                    entry[0].wait(min(remaining, TASK_EVENT_RECHECK))
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._conds.pop(task_id, None)
+
+    def subscribers(self) -> int:
+        with self._lock:
+            return sum(entry[1] for entry in self._conds.values())
+
+task_events = TaskEventHub()
 
 def _set_task_status(task_id: str, status: str, **kwargs):
-    TASKS[task_id] = {"status": status, **kwargs}
+    task_store.set(task_id, {"status": status, **kwargs, "updatedAt": time.time()})
+    task_events.publish(task_id)
+    group_id = _task_groups.get(task_id)
+    if group_id:
+        _on_group_item(group_id, task_id, status)
+
+# 취소와 워커의 상태 기록이 엇갈려 canceled 가 running/succeeded 로 덮이지 않도록 같은 잠금 아래에서 확인 후 기록
+_task_transition_lock = threading.RLock()
+
+def _set_task_status_unless_canceled(task_id: str, status: str, **kwargs) -> bool:
+    """취소된 task 는 건드리지 않고 False"""
+    with _task_transition_lock:
+        if (_get_task(task_id) or {}).get("status") == "canceled":
+            return False
+        _set_task_status(task_id, status, **kwargs)
+    return True
 
 # ───── Papago 번역 API ───────────────────────────────────────────
+# 장르/분위기 태그와 짧은 한국어 프롬프트는 사용자마다 거의 똑같이 반복되므로
+#  - 번역 결과를 LRU + TTL 캐시에 두고 (TRANSLATE_CACHE_PATH 를 주면 SQLite 파일에도 저장해 재시작 후에도 재사용)
+#  - 같은 문장을 동시에 찾는 요청은 진행 중인 번역 하나에 합류시키며
+#  - 캐시에 없는 짧은 문장 여러 개는 줄바꿈으로 이어 Papago 호출 한 번에 보낸다 (줄 수가 안 맞으면 하나씩)
+# 요청 하나가 번역을 기다리는 시간은 TRANSLATE_BUDGET 초까지. 넘기면 원문을 그대로 쓰고,
+# 늦게 도착한 번역은 캐시에만 채워 다음 요청이 쓰게 한다.
+TRANSLATE_CACHE_TTL = int(os.getenv("TRANSLATE_CACHE_TTL", str(30 * 86400)))
+TRANSLATE_CACHE_MAX = int(os.getenv("TRANSLATE_CACHE_MAX", "5000"))
+TRANSLATE_CACHE_PATH = os.getenv("TRANSLATE_CACHE_PATH", "")
+TRANSLATE_BUDGET = float(os.getenv("TRANSLATE_BUDGET", "1.5"))
+TRANSLATE_BATCH_CHARS = int(os.getenv("TRANSLATE_BATCH_CHARS", "1000"))
+TRANSLATE_WORKERS = int(os.getenv("TRANSLATE_WORKERS", "4"))
+TRANSLATE_TIMEOUT = (3.05, 5)   # (연결, 읽기) 초
+
+_HANGUL = re.compile(r"[ㄱ-ㆎ가-힣]")
+
+class TranslationCache:
+    """원문 -> 번역문. 메모리 LRU 가 먼저이고, 선택적으로 SQLite 파일이 뒤를 받친다"""
+
+    def __init__(self, ttl: int, max_entries: int, path: str = ""):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()   # 원문 -> (번역문, expires_at)
+        self._local = threading.local()
+        if path:
+            conn = self._conn()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS translations ("
+                         " source TEXT PRIMARY KEY, translated TEXT NOT NULL, expires_at REAL NOT NULL)")
+            with conn:
+                conn.execute("DELETE FROM translations WHERE expires_at < ?", (time.time(),))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, source: str, translated: str, expires_at: float):
+        with self._lock:
+            self._entries[source] = (translated, expires_at)
+            self._entries.move_to_end(source)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, source: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            hit = self._entries.get(source)
+            if hit and hit[1] >= now:
+                self._entries.move_to_end(source)
+                return hit[0]
+            if hit:
+                del self._entries[source]
+        if not self.path:
+            return None
+        try:
+            row = self._conn().execute(
+                "SELECT translated, expires_at FROM translations WHERE source = ?", (source,)).fetchone()
+        except sqlite3.Error as e:
+            log.warning("[Papago] 번역 캐시 조회 실패: %s", e)
+            return None
+        if row is None or row[1] < now:
+            return None
+        self._remember(source, row[0], row[1])
+        return row[0]
+
+    def put(self, source: str, translated: str):
+        expires_at = time.time() + self.ttl
+        self._remember(source, translated, expires_at)
+        if not self.path:
+            return
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO translations (source, translated, expires_at) VALUES (?, ?, ?)",
+                             (source, translated, expires_at))
+        except sqlite3.Error as e:
+            log.warning("[Papago] 번역 캐시 저장 실패: %s", e)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+translation_cache = TranslationCache(TRANSLATE_CACHE_TTL, TRANSLATE_CACHE_MAX, TRANSLATE_CACHE_PATH)
+_papago_session = requests.Session()
+_papago_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=TRANSLATE_WORKERS))
+_papago_session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=TRANSLATE_WORKERS))
+_translate_executor = ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS, thread_name_prefix="translate")
+_translate_lock = threading.Lock()
+_translate_inflight: Dict[str, Future] = {}
+TRANSLATE_STATS = {"cacheHits": 0, "coalesced": 0, "upstreamCalls": 0, "upstreamStrings": 0,
+                   "errors": 0, "budgetFallbacks": 0}
+
 def translate_to_english(text: str) -> str:
     """Papago API를 사용하여 한국어 텍스트를 영어로 번역하는 함수"""
-    # --- [디버깅 로그] ---
-    print("\n--- Papago 번역 시작 ---")
-    print(f"[Papago] 원본 텍스트: '{text}'")
-    
+    return translate_many([text])[0]
+
+def translate_many(texts: List[str], budget: Optional[float] = None) -> List[str]:
+    """여러 문장을 한꺼번에 번역. budget 초 안에 못 받은 문장과 실패한 문장은 원문 그대로 돌려준다"""
+    return _translate_all(texts, budget)[0]
+
+def _translate_all(texts: List[str], budget: Optional[float] = None) -> tuple:
+    """(번역 결과, 한국어 문장을 모두 번역했는지). 두 번째 값이 False 이면 원문으로 대신한 문장이 있다"""
     if not all([PAPAGO_CLIENT_ID, PAPAGO_CLIENT_SECRET]):
-        print("[Papago] Papago API 키가 설정되지 않아 번역을 건너뜁니다.")
-        print("--- Papago 번역 종료 ---\n")
-        return text
-    if not text or not text.strip():
-        print("[Papago] 입력 텍스트가 비어있어 번역을 건너뜁니다.")
-        print("--- Papago 번역 종료 ---\n")
-        return text
+        log.debug("[Papago] API 키가 설정되지 않아 번역을 건너뜁니다.")
+        return list(texts), True
+
+    results: Dict[str, str] = {}
+    waiting: Dict[str, Future] = {}
+    fetch: Dict[str, Future] = {}
+    for text in dict.fromkeys(t for t in texts if t and _HANGUL.search(t)):
+        cached = translation_cache.get(text)
+        if cached is not None:
+            TRANSLATE_STATS["cacheHits"] += 1
+            results[text] = cached
+            continue
+        with _translate_lock:
+            fut = _translate_inflight.get(text)
+            if fut is not None:
+                TRANSLATE_STATS["coalesced"] += 1
+            else:
+                fut = _translate_inflight[text] = fetch[text] = Future()
+        waiting[text] = fut
+    if fetch:
+        _translate_executor.submit(_papago_fetch, fetch)
 
+    if waiting:
+        done, pending = wait(waiting.values(), timeout=TRANSLATE_BUDGET if budget is None else budget)
+        if pending:
+            TRANSLATE_STATS["budgetFallbacks"] += 1
+            log.debug("[Papago] 번역 %d건이 시간 예산을 넘겨 원문을 사용합니다.", len(pending))
+        for text, fut in waiting.items():
+            if fut in done and fut.result():
+                results[text] = fut.result()
+    return [results.get(t, t) for t in texts], all(t in results for t in waiting)
+
+def _papago_fetch(pending: Dict[str, Future]):
+    """캐시에 없던 문장들을 TRANSLATE_BATCH_CHARS 단위로 묶어 번역하고 Future 를 채운다"""
+    texts = list(pending)
+    try:
+        batch: List[str] = []
+        for text in texts + [None]:
+            if batch and (text is None or sum(len(t) + 1 for t in batch) + len(text) > TRANSLATE_BATCH_CHARS):
+                for source, translated in zip(batch, _papago_translate_batch(batch)):
+                    if translated:
+                        translation_cache.put(source, translated)
+                    _resolve_translation(source, pending[source], translated)
+                batch = []
+            if text is not None:
+                batch.append(text)
+    except Exception as e:
+        log.warning("[Papago] 알 수 없는 오류: %s", e)
+    finally:
+        for source, fut in pending.items():
+            _resolve_translation(source, fut, None)
+
+def _resolve_translation(source: str, fut: Future, translated: Optional[str]):
+    with _translate_lock:
+        if _translate_inflight.get(source) is fut:
+            del _translate_inflight[source]
+    if not fut.done():
+        fut.set_result(translated)
+
+def _papago_translate_batch(batch: List[str]) -> List[Optional[str]]:
+    # 문장 안의 줄바꿈은 공백으로 바꿔 두어야 결과를 줄 단위로 다시 나눌 수 있다
+    if len(batch) > 1:
+        joined = _papago_translate("\n".join(" ".join(t.split()) for t in batch))
+        lines = [line.strip() for line in joined.splitlines()] if joined else []
+        if len(lines) == len(batch) and all(lines):
+            return lines
+        log.debug("[Papago] 묶음 번역의 줄 수가 맞지 않아 문장별로 다시 요청합니다.")
+    return [_papago_translate(text) for text in batch]
+
+def _papago_translate(text: str) -> Optional[str]:
+    """Papago 호출 한 번. 실패하면 None"""
+    TRANSLATE_STATS["upstreamCalls"] += 1
+    TRANSLATE_STATS["upstreamStrings"] += text.count("\n") + 1
     try:
-        url = "https://papago.apigw.ntruss.com/nmt/v1/translation"
         headers = {
             "X-NCP-APIGW-API-KEY-ID": PAPAGO_CLIENT_ID,
             "X-NCP-APIGW-API-KEY": PAPAGO_CLIENT_SECRET,
         }
         data = {"source": "ko", "target": "en", "text": text}
-        
-        # --- [디버깅 로그] ---
-        print("[Papago] API 서버로 번역을 요청합니다...")
-        response = requests.post(url, headers=headers, data=data, timeout=5)
-        
+        with STAGE_SECONDS.time("translate"):
+            response = _papago_session.post(PAPAGO_URL, headers=headers, data=data, timeout=TRANSLATE_TIMEOUT)
+
         if response.status_code != 200:
-            # --- [디버깅 로그] ---
-            print(f"[Papago Error] API가 오류를 반환했습니다. 상태 코드: {response.status_code}")
-            print(f"[Papago Error] 응답 내용: {response.text}")
-            print("--- Papago 번역 종료 ---\n")
-            return text # 오류 시 원본 텍스트 반환
+            TRANSLATE_STATS["errors"] += 1
+            log.warning("[Papago] API 오류 (상태 코드 %s): %s", response.status_code, response.text[:500])
+            return None
 
         result = response.json()
         translated_text = result.get("message", {}).get("result", {}).get("translatedText")
-        
         if translated_text:
-            # --- [디버깅 로그] ---
-            print(f"[Papago] ✨ 번역 성공! ✨ -> '{translated_text}'")
-            print("--- Papago 번역 종료 ---\n")
+            log.debug("[Papago] 번역 성공: %r -> %r", text, translated_text)
             return translated_text
-        
-        # --- [디버깅 로그] ---
-        print("[Papago] 번역된 텍스트를 찾을 수 없어 원본을 반환합니다.")
-        print("--- Papago 번역 종료 ---\n")
-        return text
+        TRANSLATE_STATS["errors"] += 1
+        log.warning("[Papago] 번역된 텍스트를 찾을 수 없어 원본을 반환합니다.")
+        return None
 
     except requests.exceptions.RequestException as e:
-        print(f"[Papago Error] API 요청 실패: {e}")
-        print("--- Papago 번역 종료 ---\n")
-        return text
+        TRANSLATE_STATS["errors"] += 1
+        log.warning("[Papago] API 요청 실패: %s", e)
+        return None
     except Exception as e:
-        print(f"[Papago Error] 알 수 없는 오류: {e}")
-        print("--- Papago 번역 종료 ---\n")
-        return text
+        TRANSLATE_STATS["errors"] += 1
+        log.warning("[Papago] 알 수 없는 오류: %s", e)
+        return None
+
+def _translate_prompt(prompt: str) -> tuple:
+    """생성 프롬프트의 한국어 부분만 영어로. 프론트가 '설명, genres: 발라드, 재즈, mood: 슬픈' 처럼
+    쉼표로 이어 보내므로 쉼표 단위로 나눠 태그마다 따로 캐시되게 한다.
+    (보낼 프롬프트, 모두 번역됐는지)를 돌려준다"""
+    if not prompt or not _HANGUL.search(prompt):
+        return prompt, True
+    parts = [p.strip() for p in prompt.split(",")]
+    labeled = []
+    for part in parts:
+        label, sep, rest = part.partition(":")
+        if sep and not _HANGUL.search(label):
+            labeled.append((label + sep + " ", rest.strip()))
+        else:
+            labeled.append(("", part))
+    translated, complete = _translate_all([text for _, text in labeled])
+    return ", ".join(label + text for (label, _), text in zip(labeled, translated)), complete
 
 # ───── Replicate AI 음악 생성 ───────────────────────────────────────
 def mk_result(audio_url: str, title="AI_Track",
@@ -129,6 +567,9 @@ def mk_result(audio_url: str, title="AI_Track",
         "type": kind,
     }
 
+def _local_audio_url(filename: str) -> str:
+    return f"{PUBLIC_BASE_URL}/api/audio/{filename}"
+
 def _extract_audio_url(output: Any) -> Optional[str]:
     def as_url(v: Any) -> Optional[str]:
         if isinstance(v, str) and v.startswith("http"): return v
@@ -165,318 +606,1923 @@ def _extract_audio_url(output: Any) -> Optional[str]:
                 if u: return u
     return None
 
+GEN_MAX_RETRIES = int(os.getenv("GEN_MAX_RETRIES", "3"))
+GEN_RETRY_BASE = float(os.getenv("GEN_RETRY_BASE", "2"))
+GEN_RETRY_CAP = float(os.getenv("GEN_RETRY_CAP", "30"))
+
+def _is_retryable(e: Exception) -> bool:
+    status = getattr(e, "status", None) or getattr(e, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
 def _run_replicate(input_dict: Dict[str, Any]) -> str:
+    client = _get_client()
     if not client:
         raise RuntimeError("No Replicate token loaded from .env")
-    out = client.run(MODEL_SLUG, input=input_dict)
+    attempt = 0
+    while True:
+        try:
+            out = client.run(MODEL_SLUG, input=input_dict)
+            break
+        except Exception as e:
+            if attempt >= GEN_MAX_RETRIES or not _is_retryable(e):
+                raise
+            # full jitter 지수 백오프: 동시에 실패한 요청들이 한꺼번에 재시도하지 않도록 분산
+            delay = random.uniform(0, min(GEN_RETRY_CAP, GEN_RETRY_BASE * (2 ** attempt)))
+            attempt += 1
+            log.warning("[replicate] 재시도 %d/%d (%.1fs 후): %r", attempt, GEN_MAX_RETRIES, delay, e)
+            time.sleep(delay)
+            audio = input_dict.get("input_audio")
+            if hasattr(audio, "seek"):
+                audio.seek(0)
     url = _extract_audio_url(out)
     if not url:
         raise RuntimeError(f"Replicate returned no audio URL. raw={out}")
     return url
 
+# ───── 생성 작업 스케줄러 ─────────────────────────────────────────
+# 고정된 워커 수와 제한된 대기열. 짧은 작업 레인을 우선 처리하되 긴 작업이 굶지 않도록
+# GEN_LONG_EVERY 번에 한 번은 긴 레인을 먼저 보고, 레인 안에서는 클라이언트별로 돌아가며 꺼낸다.
+# 작업 함수가 Future를 반환하면(비동기 예측 엔진) 스레드는 바로 풀리고, 슬롯은 Future가
+# 끝날 때까지 유지되어 동시에 진행 중인 예측 수를 GEN_MAX_INFLIGHT 로 제한한다.
+GEN_WORKERS = int(os.getenv("GEN_WORKERS", "4"))
+GEN_MAX_INFLIGHT = int(os.getenv("GEN_MAX_INFLIGHT", "64"))
+GEN_QUEUE_MAX = int(os.getenv("GEN_QUEUE_MAX", "64"))
+GEN_SHORT_DURATION = int(os.getenv("GEN_SHORT_DURATION", "15"))
+GEN_LONG_EVERY = int(os.getenv("GEN_LONG_EVERY", "3"))
+GEN_RETRY_AFTER = int(os.getenv("GEN_RETRY_AFTER", "10"))
+
+class GenerationScheduler:
+    LANES = ("short", "long")
+
+    def __init__(self, workers: int, max_queued: int, max_inflight: int):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.max_inflight = max(1, max_inflight)
+        self._cond = threading.Condition()
+        # lane -> client_id -> deque[(task_id, fn, args)]
+        self._lanes: Dict[str, "OrderedDict[str, deque]"] = {lane: OrderedDict() for lane in self.LANES}
+        self._queued = 0
+        self._running = 0
+        self._picks = 0
+        self._avg_runtime = 30.0
+        self._threads: List[threading.Thread] = []
+
+    def submit(self, task_id: str, client_id: str, duration: int, fn, *args) -> bool:
+        lane = "short" if duration <= GEN_SHORT_DURATION else "long"
+        with self._cond:
+            if self._queued >= self.max_queued:
+                return False
+            self._lanes[lane].setdefault(client_id, deque()).append((task_id, fn, args))
+            self._queued += 1
+            self._ensure_started()
+            self._cond.notify()
+        return True
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"gen-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _lane_order(self, picks: int) -> tuple:
+        if GEN_LONG_EVERY > 0 and picks % GEN_LONG_EVERY == GEN_LONG_EVERY - 1:
+            return ("long", "short")
+        return self.LANES
+
+    @staticmethod
+    def _pop_fair(clients: "OrderedDict[str, deque]"):
+        client_id, jobs = next(iter(clients.items()))
+        job = jobs.popleft()
+        del clients[client_id]
+        if jobs:
+            clients[client_id] = jobs  # 다음 차례를 위해 맨 뒤로 이동
+        return job
+
+    def _pop(self):
+        for lane in self._lane_order(self._picks):
+            if self._lanes[lane]:
+                self._picks += 1
+                self._queued -= 1
+                return self._pop_fair(self._lanes[lane])
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while self._running >= self.max_inflight or self._queued == 0:
+                    self._cond.wait()
+                job = self._pop()
+                self._running += 1
+            task_id, fn, args = job
+            started = time.monotonic()
+            ret = None
+            try:
+                ret = fn(*args)
+            except Exception as e:
+                log.exception("[scheduler] %s 작업 실패: %r", task_id, e)
+            if isinstance(ret, Future):
+                ret.add_done_callback(lambda _f, started=started: self._release(started))
+            else:
+                self._release(started)
+
+    def _release(self, started: float):
+        with self._cond:
+            self._running -= 1
+            self._avg_runtime = 0.8 * self._avg_runtime + 0.2 * (time.monotonic() - started)
+            self._cond.notify()
+
+    def cancel(self, task_id: str) -> Optional[tuple]:
+        """아직 대기 중인 작업을 대기열에서 제거하고 (client_id, fn, args) 반환. 이미 실행 중이면 None"""
+        with self._cond:
+            for clients in self._lanes.values():
+                for client_id, jobs in list(clients.items()):
+                    for job in jobs:
+                        if job[0] == task_id:
+                            jobs.remove(job)
+                            if not jobs:
+                                del clients[client_id]
+                            self._queued -= 1
+                            return client_id, job[1], job[2]
+        return None
+
+    def position(self, task_id: str) -> Optional[int]:
+        """대기열에서 task_id 앞에 있는 작업 수 (꺼내는 순서를 그대로 시뮬레이션)"""
+        with self._cond:
+            lanes = {lane: OrderedDict((c, deque(q)) for c, q in clients.items())
+                     for lane, clients in self._lanes.items()}
+            picks = self._picks
+            for ahead in range(self._queued):
+                for lane in self._lane_order(picks):
+                    if lanes[lane]:
+                        picks += 1
+                        if self._pop_fair(lanes[lane])[0] == task_id:
+                            return ahead
+                        break
+        return None
+
+    def eta(self, position: int) -> int:
+        return int((position // self.max_inflight + 1) * self._avg_runtime)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"queued": self._queued, "running": self._running,
+                    "workers": self.workers, "maxInflight": self.max_inflight,
+                    "avgRuntime": round(self._avg_runtime, 1)}
+
+gen_scheduler = GenerationScheduler(GEN_WORKERS, GEN_QUEUE_MAX, GEN_MAX_INFLIGHT)
+
+# ───── 비동기 Replicate 예측 엔진 ──────────────────────────────────
+# client.run 처럼 예측이 끝날 때까지 스레드를 붙잡지 않고, 예측을 생성만 한 뒤
+# 하나의 asyncio 루프(스레드 1개)가 진행 중인 모든 예측을 주기적으로 조회한다.
+# PRED_WEBHOOK_URL 이 설정되면 Replicate 웹훅을 받아 즉시 조회하고, 폴링은 안전망으로만 동작한다.
+PRED_ENGINE = os.getenv("PRED_ENGINE", "async")          # "async" | "blocking"
+PRED_POLL_INTERVAL = float(os.getenv("PRED_POLL_INTERVAL", "1.5"))
+PRED_WEBHOOK_POLL_INTERVAL = float(os.getenv("PRED_WEBHOOK_POLL_INTERVAL", "30"))
+PRED_POLL_CONCURRENCY = int(os.getenv("PRED_POLL_CONCURRENCY", "16"))
+PRED_TIMEOUT = float(os.getenv("PRED_TIMEOUT", "900"))
+PRED_WEBHOOK_URL = os.getenv("PRED_WEBHOOK_URL")  # 예: https://<공개 호스트>/api/replicate/webhook
+PRED_TERMINAL = ("succeeded", "failed", "canceled")
+
+class PredictionEngine:
+    def __init__(self, replicate_client, model_ref: str):
+        self.client = replicate_client
+        if ":" in model_ref:
+            self.create_ref = {"version": model_ref.split(":", 1)[1]}
+        else:
+            self.create_ref = {"model": model_ref}
+        self.poll_interval = PRED_WEBHOOK_POLL_INTERVAL if PRED_WEBHOOK_URL else PRED_POLL_INTERVAL
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._start_lock = threading.Lock()
+        # 아래 두 dict는 이벤트 루프 스레드에서만 수정한다
+        self._pending: Dict[str, tuple] = {}   # prediction id -> (task_id, future, started_at)
+        self._by_task: Dict[str, str] = {}     # task_id -> prediction id
+        self.stats = {"created": 0, "polls": 0, "webhooks": 0, "canceled": 0}
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="prediction-engine", daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self._poll_loop(), loop)
+                self._loop = loop
+        return self._loop
+
+    def submit(self, task_id: str, input_dict: Dict[str, Any]) -> Future:
+        """예측을 생성하고, 결과 오디오 URL로 완료되는 Future를 반환"""
+        fut: Future = Future()
+        loop = self._ensure_started()
+        asyncio.run_coroutine_threadsafe(self._create(task_id, input_dict, fut), loop)
+        return fut
+
+    def cancel(self, task_id: str):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._cancel(task_id), self._loop)
+
+    def notify(self, prediction_id: str):
+        """웹훅 수신 시 호출: 해당 예측을 바로 다시 조회한다 (웹훅 본문은 신뢰하지 않음)"""
+        if self._loop is not None:
+            self.stats["webhooks"] += 1
+            asyncio.run_coroutine_threadsafe(self._refresh(prediction_id), self._loop)
+
+    def inflight(self) -> int:
+        return len(self._pending)
+
+    async def _create(self, task_id: str, input_dict: Dict[str, Any], fut: Future):
+        params: Dict[str, Any] = {}
+        if PRED_WEBHOOK_URL:
+            params = {"webhook": PRED_WEBHOOK_URL, "webhook_events_filter": ["completed"]}
+        attempt = 0
+        while True:
+            try:
+                prediction = await self.client.predictions.async_create(
+                    **self.create_ref, input=input_dict, **params)
+                break
+            except Exception as e:
+                if attempt >= GEN_MAX_RETRIES or not _is_retryable(e):
+                    fut.set_exception(e)
+                    return
+                delay = random.uniform(0, min(GEN_RETRY_CAP, GEN_RETRY_BASE * (2 ** attempt)))
+                attempt += 1
+                log.warning("[replicate] 예측 생성 재시도 %d/%d (%.1fs 후): %r", attempt, GEN_MAX_RETRIES, delay, e)
+                await asyncio.sleep(delay)
+                audio = input_dict.get("input_audio")
+                if hasattr(audio, "seek"):
+                    audio.seek(0)
+        self.stats["created"] += 1
+        self._pending[prediction.id] = (task_id, fut, time.monotonic())
+        self._by_task[task_id] = prediction.id
+        if fut.cancelled() or (_get_task(task_id) or {}).get("status") == "canceled":
+            await self._cancel(task_id)
+        else:
+            self._complete(prediction)
+
+    def _complete(self, prediction) -> bool:
+        if prediction.status not in PRED_TERMINAL:
+            return False
+        entry = self._pending.pop(prediction.id, None)
+        if entry is None:
+            return True
+        task_id, fut, _ = entry
+        self._by_task.pop(task_id, None)
+        if prediction.status == "succeeded":
+            url = _extract_audio_url(prediction.output)
+            if url:
+                fut.set_result(url)
+            else:
+                fut.set_exception(RuntimeError(f"Replicate returned no audio URL. raw={prediction.output}"))
+        else:
+            fut.set_exception(RuntimeError(prediction.error or f"Prediction {prediction.status}"))
+        return True
+
+    async def _refresh(self, prediction_id: str, sem: Optional[asyncio.Semaphore] = None):
+        if prediction_id not in self._pending:
+            return
+        try:
+            if sem:
+                async with sem:
+                    prediction = await self.client.predictions.async_get(prediction_id)
+            else:
+                prediction = await self.client.predictions.async_get(prediction_id)
+        except Exception as e:
+            log.warning("[prediction-engine] 조회 실패 %s: %r", prediction_id, e)
+            return
+        self.stats["polls"] += 1
+        self._complete(prediction)
+
+    async def _cancel(self, task_id: str):
+        prediction_id = self._by_task.get(task_id)
+        if not prediction_id:
+            return
+        try:
+            await self.client.predictions.async_cancel(prediction_id)
+            self.stats["canceled"] += 1
+        except Exception as e:
+            log.warning("[prediction-engine] 취소 실패 %s: %r", prediction_id, e)
+        entry = self._pending.pop(prediction_id, None)
+        self._by_task.pop(task_id, None)
+        if entry and not entry[1].done():
+            entry[1].set_exception(RuntimeError("Prediction canceled"))
+
+    async def _poll_loop(self):
+        sem = asyncio.Semaphore(PRED_POLL_CONCURRENCY)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            now = time.monotonic()
+            for prediction_id, (task_id, fut, started) in list(self._pending.items()):
+                if now - started > PRED_TIMEOUT:
+                    log.warning("[prediction-engine] 시간 초과로 취소: %s", prediction_id)
+                    await self._cancel(task_id)
+            if self._pending:
+                await asyncio.gather(*(self._refresh(pid, sem) for pid in list(self._pending)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "inflight": len(self._pending)}
+
+_prediction_engine: Optional[PredictionEngine] = None
+
+def _get_prediction_engine() -> Optional[PredictionEngine]:
+    """PRED_ENGINE=async 이고 토큰이 있을 때만 만들어지는 예측 엔진 (없으면 client.run 경로)"""
+    global _prediction_engine
+    if _prediction_engine is None and PRED_ENGINE == "async" and REPLICATE_TOKEN:
+        with _lazy_lock:
+            if _prediction_engine is None:
+                _prediction_engine = PredictionEngine(_get_client(), MODEL_SLUG)
+    return _prediction_engine
+
+# ───── Replicate 결과 로컬 미러링 ──────────────────────────────────
+# 생성이 끝나면 succeeded 를 먼저 알리고, 백그라운드에서 원격 파일을 OUTPUT_FOLDER 로 스트리밍 저장한다.
+# 저장이 확인되면 task 의 audioUrl 을 로컬 /api/audio URL 로 바꾼다 (원격 URL은 remoteUrl 로 보존).
+MIRROR_ENABLED = os.getenv("MIRROR_ENABLED", "1") == "1"
+MIRROR_WORKERS = int(os.getenv("MIRROR_WORKERS", "4"))
+MIRROR_CHUNK = int(os.getenv("MIRROR_CHUNK_KB", "256")) * 1024
+MIRROR_RETRIES = int(os.getenv("MIRROR_RETRIES", "3"))
+MIRROR_TIMEOUT = float(os.getenv("MIRROR_TIMEOUT", "30"))
+
+_mirror_session = requests.Session()
+_mirror_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=MIRROR_WORKERS))
+_mirror_session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=MIRROR_WORKERS))
+_mirror_executor = ThreadPoolExecutor(max_workers=MIRROR_WORKERS, thread_name_prefix="mirror")
+_mirror_lock = threading.Lock()
+_mirror_jobs: Dict[str, Future] = {}                # 원격 URL -> 로컬 파일 이름 Future
+_mirrored: "OrderedDict[str, str]" = OrderedDict()  # 원격 URL -> 로컬 파일 이름 (최근 것만 유지)
+MIRROR_STATS = {"downloads": 0, "bytes": 0, "resumed": 0, "failed": 0}
+
+def _download_output(remote_url: str) -> str:
+    """원격 파일을 청크 단위로 내려받아 OUTPUT_FOLDER 에 저장하고 파일 이름을 반환 (이어받기 지원)"""
+    ext = os.path.splitext(remote_url.split("?", 1)[0])[1] or ".mp3"
+    filename = f"{uuid.uuid4()}{ext}"
+    final_path = os.path.join(OUTPUT_FOLDER, filename)
+    part_path = f"{final_path}.part"
+    attempt = 0
+    try:
+        while True:
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with _mirror_session.get(remote_url, headers=headers, stream=True,
+                                         timeout=MIRROR_TIMEOUT) as resp:
+                    resp.raise_for_status()
+                    if offset and resp.status_code == 206:
+                        MIRROR_STATS["resumed"] += 1
+                        mode = "ab"
+                        expected = offset + int(resp.headers.get("Content-Length", -offset - 1))
+                    else:
+                        mode = "wb"   # 서버가 Range 를 무시하면 처음부터 다시 받는다
+                        expected = int(resp.headers.get("Content-Length", -1))
+                    with open(part_path, mode) as f:
+                        for chunk in resp.iter_content(chunk_size=MIRROR_CHUNK):
+                            f.write(chunk)
+                size = os.path.getsize(part_path)
+                if expected >= 0 and size != expected:
+                    raise IOError(f"크기 불일치: {size} != {expected}")
+                break
+            except (requests.exceptions.RequestException, IOError) as e:
+                attempt += 1
+                if attempt > MIRROR_RETRIES:
+                    raise
+                log.warning("[mirror] 재시도 %d/%d: %r", attempt, MIRROR_RETRIES, e)
+                time.sleep(random.uniform(0, GEN_RETRY_BASE * (2 ** attempt)))
+        os.replace(part_path, final_path)
+    except Exception:
+        try: os.remove(part_path)
+        except OSError: pass
+        raise
+    MIRROR_STATS["downloads"] += 1
+    MIRROR_STATS["bytes"] += os.path.getsize(final_path)
+    _register_artifact(final_path)
+    return filename
+
+def _apply_mirror(task_id: str, remote_url: str, fut: Future):
+    try:
+        filename = fut.result()
+    except Exception as e:
+        MIRROR_STATS["failed"] += 1
+        log.warning("[mirror] 미러링 실패 (%s): %r", remote_url, e)
+        return
+    task = _get_task(task_id)
+    if not task or task.get("status") != "succeeded" or task.get("audioUrl") != remote_url:
+        return
+    _register_artifact(os.path.join(OUTPUT_FOLDER, filename), task_id)
+    local_url = _local_audio_url(filename)
+    result = {**(task.get("result") or {}), "audioUrl": local_url, "remoteUrl": remote_url,
+              "peaksUrl": _peaks_url(filename) if FFMPEG else None}
+    extra = {k: v for k, v in task.items() if k not in ("status", "result", "audioUrl", "updatedAt")}
+    _set_task_status(task_id, "succeeded", **extra, result=result, audioUrl=local_url, remoteUrl=remote_url)
+
+def _schedule_mirror(task_id: str, remote_url: str):
+    if not MIRROR_ENABLED or not remote_url.startswith("http"):
+        return
+    with _mirror_lock:
+        filename = _mirrored.get(remote_url)
+        fut = _mirror_jobs.get(remote_url)
+        if filename and _lookup_audio(filename):
+            fut = Future()
+            fut.set_result(filename)
+        elif fut is None:
+            # 같은 원격 파일(병합된 요청, 캐시 적중)은 한 번만 내려받는다
+            fut = _mirror_executor.submit(_download_output, remote_url)
+            _mirror_jobs[remote_url] = fut
+
+            def remember(f: Future, url=remote_url):
+                with _mirror_lock:
+                    _mirror_jobs.pop(url, None)
+                    if not f.exception():
+                        _mirrored[url] = f.result()
+                        while len(_mirrored) > GEN_CACHE_MAX:
+                            _mirrored.popitem(last=False)
+            fut.add_done_callback(remember)
+    fut.add_done_callback(functools.partial(_apply_mirror, task_id, remote_url))
+
+def _set_generate_succeeded(task_id: str, audio_url: str, genres, moods, duration: int):
+    res = mk_result(audio_url, "AI_Generated_Track", genres, moods, duration, "generated")
+    if _set_task_status_unless_canceled(task_id, "succeeded", result=res, audioUrl=res["audioUrl"]):
+        _schedule_mirror(task_id, audio_url)
+
+# ───── 생성 요청 병합 / 결과 캐시 ──────────────────────────────────
+# 같은 입력(정규화된 input dict + input_audio 해시)의 요청은 진행 중인 예측 하나에 합류하고,
+# 끝난 결과는 GEN_CACHE_TTL 초 동안 재사용한다. (0이면 결과 캐시 비활성화)
+GEN_CACHE_TTL = int(os.getenv("GEN_CACHE_TTL", "600"))
+GEN_CACHE_MAX = int(os.getenv("GEN_CACHE_MAX", "1000"))
+
+_gen_lock = threading.Lock()
+_gen_inflight: Dict[str, List[tuple]] = {}          # key -> [(task_id, genres, moods, duration), ...]
+_gen_leaders: Dict[str, str] = {}                    # 실제 예측을 수행하는 task_id -> key
+_gen_cache: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (audio_url, expires_at)
+GEN_STATS = {"cacheHits": 0, "coalesced": 0, "upstreamCalls": 0}
+
+def _build_generation_inputs(prompt: str, duration: int, seed: Optional[int] = None) -> Dict[str, Any]:
+    inputs = {
+        "prompt": " ".join((prompt or "instrumental background music").split()),
+        "duration": duration,
+        "output_format": "mp3",
+        "normalization_strategy": "peak",
+    }
+    if seed is not None:
+        inputs["seed"] = seed
+    return inputs
+
+def _generation_key(inputs: Dict[str, Any], audio_digest: Optional[str]) -> str:
+    normalized = {k: v for k, v in inputs.items() if k != "input_audio"}
+    if audio_digest:
+        normalized["input_audio"] = audio_digest
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _gen_cache_get(key: str) -> Optional[str]:
+    if GEN_CACHE_TTL <= 0:
+        return None
+    with _gen_lock:
+        hit = _gen_cache.get(key)
+        if not hit:
+            return None
+        audio_url, expires_at = hit
+        if expires_at < time.time():
+            del _gen_cache[key]
+            return None
+        GEN_STATS["cacheHits"] += 1
+        return audio_url
+
+def _gen_attach(key: str, task_id: str, genres, moods, duration: int) -> bool:
+    """진행 중인 동일 요청이 있으면 합류시키고 True, 없으면 새 진행 항목을 만들고 False"""
+    with _gen_lock:
+        followers = _gen_inflight.get(key)
+        if followers is not None:
+            followers.append((task_id, genres, moods, duration))
+            GEN_STATS["coalesced"] += 1
+            return True
+        _gen_inflight[key] = []
+        _gen_leaders[task_id] = key
+        return False
+
+def _gen_finish(key: str, audio_url: Optional[str] = None, error: Optional[str] = None,
+                cacheable: bool = True):
+    """합류한 요청들에 결과를 나눠 준다. cacheable=False 면 결과를 _gen_cache 에 남기지 않는다"""
+    with _gen_lock:
+        followers = _gen_inflight.pop(key, [])
+        for leader, leader_key in list(_gen_leaders.items()):
+            if leader_key == key:
+                del _gen_leaders[leader]
+        if audio_url and cacheable and GEN_CACHE_TTL > 0:
+            _gen_cache[key] = (audio_url, time.time() + GEN_CACHE_TTL)
+            _gen_cache.move_to_end(key)
+            while len(_gen_cache) > GEN_CACHE_MAX:
+                _gen_cache.popitem(last=False)
+    for task_id, genres, moods, duration in followers:
+        if audio_url:
+            _set_generate_succeeded(task_id, audio_url, genres, moods, duration)
+        else:
+            _set_task_status_unless_canceled(task_id, "failed", error=error)
+
+def _gen_has_waiters(key: Optional[str]) -> bool:
+    """같은 요청에 합류해 아직 결과를 기다리는(취소하지 않은) task 가 있는지"""
+    with _gen_lock:
+        followers = _gen_inflight.get(key, []) if key else []
+        return any((_get_task(f[0]) or {}).get("status") != "canceled" for f in followers)
+
+def _gen_promote(key: str, old_leader: str) -> Optional[tuple]:
+    """취소된 대표 요청 대신 아직 기다리는 첫 합류 요청을 대표로 세운다. 남은 요청이 없으면 None"""
+    with _gen_lock:
+        followers = _gen_inflight.get(key)
+        _gen_leaders.pop(old_leader, None)
+        while followers:
+            follower = followers.pop(0)
+            if (_get_task(follower[0]) or {}).get("status") != "canceled":
+                _gen_leaders[follower[0]] = key
+                return follower
+    return None
+
+def _complete_generate(task_id: str, genres, moods, duration: int, tmp_path: Optional[str],
+                       cache_key: Optional[str], audio_url: Optional[str] = None,
+                       error: Optional[str] = None, cacheable: bool = True):
+    # 사용자가 취소한 작업은 상태를 덮어쓰지 않는다
+    if audio_url:
+        _set_generate_succeeded(task_id, audio_url, genres, moods, duration)
+    else:
+        _set_task_status_unless_canceled(task_id, "failed", error=error)
+    if cache_key:
+        _gen_finish(cache_key, audio_url, error, cacheable)
+    if tmp_path:
+        try: os.remove(tmp_path)
+        except: pass
+
 def worker_generate(task_id: str, prompt: str, genres, moods, duration: int,
-                    tmp_path: Optional[str]):
+                    tmp_path: Optional[str], cache_key: Optional[str] = None,
+                    audio_digest: Optional[str] = None, seed: Optional[int] = None, shared_audio=None):
+    done = functools.partial(_complete_generate, task_id, genres, moods, duration, tmp_path, cache_key)
+    audio_file = None
     try:
-        _set_task_status(task_id, "running")
-        inputs: Dict[str, Any] = {
-            "prompt": prompt or "instrumental background music",
-            "duration": duration,
-            "output_format": "mp3",
-            "normalization_strategy": "peak",
-        }
-        if tmp_path:
-            with open(tmp_path, "rb") as f:
-                data = f.read()
-            bio = BytesIO(data)
-            setattr(bio, "name", os.path.basename(tmp_path))
-            bio.seek(0)
-            inputs["input_audio"] = bio
+        if not _set_task_status_unless_canceled(task_id, "running") and not _gen_has_waiters(cache_key):
+            # 대기열에서 꺼낸 직후에 취소됐고 기다리는 합류 요청도 없으면 업스트림 호출을 하지 않는다
+            done(error=CANCELED_MESSAGE)
+            return
+        # 병합/캐시 키는 원문 프롬프트 기준이고, 모델에는 번역된 프롬프트를 보낸다.
+        # 시간 예산을 넘기거나 실패해 한국어가 남은 채로 보냈다면 그 결과는 캐시하지 않는다
+        # (같은 키의 다음 요청이 제대로 번역된 프롬프트로 다시 생성되도록)
+        prompt_sent, translated = _translate_prompt(prompt)
+        if not translated:
+            done = functools.partial(done, cacheable=False)
+        inputs = _build_generation_inputs(prompt_sent, duration, seed)
+        if shared_audio is not None:
+            # 배치: 그룹이 한 번 올려 둔 조건 오디오 URL 을 함께 쓴다
+            inputs["input_audio"] = shared_audio()
+            inputs["continuation"] = False
+        elif tmp_path:
+            # 모델이 쓰는 구간만 잘라 모노/모델 샘플레이트로 줄인 파일을 디스크에서 바로 업로드
+            with STAGE_SECONDS.time("cond_prepare"):
+                prepared = _prepare_conditioning_audio(tmp_path, audio_digest or _file_sha256(tmp_path), duration)
+            audio_file = open(prepared, "rb")
+            inputs["input_audio"] = audio_file
             inputs["continuation"] = False
 
-        audio_url = _run_replicate(inputs)
-        res = mk_result(audio_url, "AI_Generated_Track", genres, moods, duration, "generated")
-        _set_task_status(task_id, "succeeded", result=res, audioUrl=res["audioUrl"])
+        GEN_STATS["upstreamCalls"] += 1
+        engine = _get_prediction_engine()
+        if engine is not None:
+            submitted = time.perf_counter()
+            fut = engine.submit(task_id, inputs)
+
+            def on_done(f: Future, audio_file=audio_file):
+                STAGE_SECONDS.observe(time.perf_counter() - submitted, "replicate_wait")
+                if audio_file:
+                    audio_file.close()
+                try:
+                    done(audio_url=f.result())
+                except Exception as e:
+                    log.warning("[worker_generate] %s 생성 실패: %r", task_id, e)
+                    done(error=str(e))
+            audio_file = None   # 닫는 책임은 on_done 으로 넘어감
+            fut.add_done_callback(on_done)
+            return fut
+
+        with STAGE_SECONDS.time("replicate_wait"):
+            audio_url = _run_replicate(inputs)
+        done(audio_url=audio_url)
     except Exception as e:
-        print("[worker_generate] ERROR:", repr(e))
-        _set_task_status(task_id, "failed", error=str(e))
+        log.warning("[worker_generate] %s 생성 실패: %r", task_id, e)
+        done(error=str(e))
     finally:
-        if tmp_path:
-            try: os.remove(tmp_path)
-            except: pass
+        if audio_file:
+            audio_file.close()
 
 # ───── PDF → MusicXML → MIDI/WAV/MP3 변환 ─────────────────────────
-@app.route('/api/process-score', methods=['POST'])
-def process_score():
-    if 'score' not in request.files:
-        return jsonify({'message': '악보 파일이 없습니다.'}), 400
-    
-    uploaded_file = request.files['score']
-
-    output_format = request.form.get('format', 'wav')
-    print(f"요청된 변환 형식: {output_format}")
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SCORE_UPLOAD_FOLDER = os.path.join(BACKEND_DIR, 'temp_scores')
+MIDI_FOLDER = os.path.join(BACKEND_DIR, 'generated_midi')
+os.makedirs(SCORE_UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(MIDI_FOLDER, exist_ok=True)
 
-    if uploaded_file.filename == '':
-        return jsonify({'message': '파일이 선택되지 않았습니다.'}), 400
+# 악보 작업마다 temp_scores/<작업 id>/ 를 따로 쓰므로 다른 작업의 파일을 집거나 지우지 않는다.
+# 끝나면 폴더 이름을 .trash-* 로 바꾼 뒤(원자적) 지우므로 반쯤 지워진 폴더가 보이지 않는다.
+# .trash-* / .omr-batch-* 이름에는 만든 프로세스의 pid 를 넣어, 시작할 때 죽은 프로세스가 남긴 것만 치운다
+# (gunicorn 워커 여러 개가 temp_scores 를 함께 쓰므로 살아 있는 다른 워커의 OMR 폴더를 지우면 안 된다).
+STALE_SCRATCH_SECONDS = 86400
+def _job_scratch(job_id: str) -> str:
+    path = os.path.join(SCORE_UPLOAD_FOLDER, job_id)
+    os.makedirs(path)
+    return path
 
-    if uploaded_file and uploaded_file.filename.endswith('.pdf'):
-        # --- 1. 경로 설정 ---
-        backend_dir = os.path.dirname(os.path.abspath(__file__))
-        upload_folder = os.path.join(backend_dir, 'temp_scores')
-        midi_folder = os.path.join(backend_dir, 'generated_midi')
-        os.makedirs(upload_folder, exist_ok=True)
-        os.makedirs(midi_folder, exist_ok=True)
-        
-        unique_filename = str(uuid.uuid4())
-        pdf_path = os.path.join(upload_folder, f"{unique_filename}.pdf")
-        uploaded_file.save(pdf_path)
+def _remove_scratch(path: str):
+    trash = os.path.join(SCORE_UPLOAD_FOLDER, f".trash-{os.getpid()}-{uuid.uuid4().hex}")
+    try:
+        os.replace(path, trash)
+    except OSError:
+        return
+    shutil.rmtree(trash, ignore_errors=True)
 
-        # --- 2. Audiveris 실행 경로 설정 ---
-        audiveris_jar_path = r"C:\Program Files\Audiveris\app"
-        java_executable = r"C:\Program Files\Audiveris\runtime\bin\java"
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":   # Windows 의 os.kill 은 프로세스를 종료시키므로 확인하지 않는다 (오래된 폴더만 정리)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
 
+def _clean_stale_scratch():
+    now = time.time()
+    for name in os.listdir(SCORE_UPLOAD_FOLDER):
+        match = re.match(r"^\.(?:trash|omr-batch)-(?:(\d+)-)?", name)
+        if not match:
+            continue
+        path = os.path.join(SCORE_UPLOAD_FOLDER, name)
+        owner = int(match.group(1)) if match.group(1) else None
         try:
-            # --- 3. Audiveris 실행 (PDF -> MusicXML) ---
-            print(f"Audiveris 실행 시작: {pdf_path}")
-            print(f"Audiveris jar 경로: {audiveris_jar_path}")
-            
-            jar_files = []
-            for file_name in os.listdir(audiveris_jar_path):
-                if file_name.endswith('.jar'):
-                    jar_files.append(os.path.join(audiveris_jar_path, file_name))
-            
-            classpath = ';'.join(jar_files)
-            print(f"클래스패스에 {len(jar_files)}개 JAR 파일 추가")
-            
+            old = now - os.path.getmtime(path) > STALE_SCRATCH_SECONDS
+        except OSError:
+            continue
+        if old or (owner is not None and owner != os.getpid() and not _pid_alive(owner)):
+            shutil.rmtree(path, ignore_errors=True)
+
+_clean_stale_scratch()
+
+AUDIVERIS_JAR_PATH = os.getenv("AUDIVERIS_JAR_PATH", r"C:\Program Files\Audiveris\app")
+AUDIVERIS_JAVA = os.getenv("AUDIVERIS_JAVA", r"C:\Program Files\Audiveris\runtime\bin\java")
+SOUND_FONT_PATH = os.getenv("SOUND_FONT_PATH", r'C:\soundfonts\FluidR3_GM.sf2')
+
+# 악보 변환 작업 풀: 동시에 실행할 작업 수와 대기열 길이를 제한한다
+SCORE_WORKERS = int(os.getenv("SCORE_WORKERS", "2"))
+SCORE_QUEUE_MAX = int(os.getenv("SCORE_QUEUE_MAX", "8"))
+SCORE_RETRY_AFTER = int(os.getenv("SCORE_RETRY_AFTER", "30"))
+SCORE_STAGES = ["queued", "omr", "parse", "midi", "render"]
+
+_score_executor = ThreadPoolExecutor(max_workers=SCORE_WORKERS, thread_name_prefix="score")
+_score_slots = threading.BoundedSemaphore(SCORE_WORKERS + SCORE_QUEUE_MAX)
+SCORE_INFLIGHT = metrics_registry.gauge("mai_score_inflight", "Score conversions accepted and not yet finished")
+# 제출됐지만 아직 워커가 집어 가지 않은 작업 수. mai_queue_depth{queue="score"} 로 내보내므로 따로 등록하지 않는다
+SCORE_QUEUED = metrics.Gauge("mai_score_queued", "Score conversions waiting for a worker")
+
+def _set_score_stage(task_id: str, stage: str):
+    progress = round(SCORE_STAGES.index(stage) / len(SCORE_STAGES), 2)
+    status = "queued" if stage == "queued" else "running"
+    _set_task_status(task_id, status, kind="score", stage=stage, progress=progress)
+
+# ───── Audiveris OMR 워커 풀 ─────────────────────────────────────
+# JVM 개수/힙 크기를 제한하고, 대기 중인 PDF 여러 개를 한 번의 -batch 실행으로 묶는다.
+OMR_MAX_JVMS = int(os.getenv("OMR_MAX_JVMS", "1"))
+OMR_JVM_HEAP = os.getenv("OMR_JVM_HEAP", "2g")
+OMR_BATCH_MAX = int(os.getenv("OMR_BATCH_MAX", "4"))
+OMR_BATCH_LINGER = float(os.getenv("OMR_BATCH_LINGER", "0.5"))
+OMR_TIMEOUT = int(os.getenv("OMR_TIMEOUT", "1800"))
+# JDK 19+ 의 AppCDS 아카이브: 첫 실행에서 만들고 이후 JVM 기동/클래스 로딩을 재사용
+OMR_JVM_CDS = os.getenv("OMR_JVM_CDS", "1") == "1"
+OMR_LOG_FOLDER = os.path.join(BACKEND_DIR, 'logs')
+MUSIC_EXTENSIONS = ['.mxl', '.xml', '.musicxml']
+
+def _audiveris_classpath() -> str:
+    jar_files = []
+    for file_name in sorted(os.listdir(AUDIVERIS_JAR_PATH)):
+        if file_name.endswith('.jar'):
+            jar_files.append(os.path.join(AUDIVERIS_JAR_PATH, file_name))
+    log.debug("클래스패스에 %d개 JAR 파일 추가", len(jar_files))
+    return os.pathsep.join(jar_files)
+
+def _find_music_file(output_folder: str, base_name: str, allow_any: bool = False) -> Optional[str]:
+    for folder in (output_folder, os.path.join(output_folder, base_name)):
+        for ext in MUSIC_EXTENSIONS:
+            potential_path = os.path.join(folder, f"{base_name}{ext}")
+            if os.path.exists(potential_path):
+                return potential_path
+    if allow_any:
+        for file_item in os.listdir(output_folder):
+            if any(file_item.endswith(ext) for ext in MUSIC_EXTENSIONS):
+                log.debug("폴더 검색으로 발견된 파일: %s", file_item)
+                return os.path.join(output_folder, file_item)
+    return None
+
+class _OmrJob:
+    def __init__(self, pdf_path: str, output_folder: str, sheets: Optional[str] = None):
+        self.pdf_path = pdf_path
+        self.output_folder = output_folder
+        self.sheets = sheets    # "3-5" 처럼 일부 페이지만 처리할 때 (-sheets)
+        self.future: Future = Future()
+
+class OmrWorkerPool:
+    """Audiveris 실행을 담당하는 고정 크기 워커 풀.
+
+    각 워커는 한 번에 하나의 JVM만 띄우며, 대기 작업을 최대 ``batch_max`` 개까지 모아
+    한 번의 ``-batch`` 호출로 처리한다. 출력 폴더가 서로 다르면 임시 폴더에 함께 내보낸 뒤
+    각 작업의 폴더로 옮긴다.
+    """
+
+    def __init__(self, max_jvms: int, heap: str, batch_max: int, linger: float):
+        self.max_jvms = max(1, max_jvms)
+        self.heap = heap
+        self.batch_max = max(1, batch_max)
+        self.linger = linger
+        self._queue: "queue.Queue[_OmrJob]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._classpath: Optional[str] = None
+        self.stats = {"batches": 0, "jobs": 0, "crashes": 0, "retries": 0}
+
+    def submit(self, pdf_path: str, output_folder: str, sheets: Optional[str] = None) -> Future:
+        self._ensure_started()
+        job = _OmrJob(pdf_path, output_folder, sheets)
+        self._queue.put(job)
+        return job.future
+
+    def run(self, pdf_path: str, output_folder: str) -> str:
+        return self.submit(pdf_path, output_folder).result()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._threads:
+                return
+            # 클래스패스는 풀 시작 시 한 번만 계산
+            self._classpath = _audiveris_classpath()
+            os.makedirs(OMR_LOG_FOLDER, exist_ok=True)
+            for i in range(self.max_jvms):
+                t = threading.Thread(target=self._worker_loop, name=f"omr-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _collect_batch(self, first: _OmrJob) -> List[_OmrJob]:
+        batch, deferred = [first], []
+        if first.sheets:
+            return batch    # -sheets 는 모든 입력 파일에 적용되므로 페이지 조각은 묶지 않는다
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_max:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            # 작업마다 출력 폴더(작업별 scratch)가 달라도 한 JVM 으로 묶고, 결과는 _run_batch 가 나눠 준다
+            (deferred if job.sheets else batch).append(job)
+        for job in deferred:
+            self._queue.put(job)
+        return batch
+
+    def _worker_loop(self):
+        while True:
+            first = self._queue.get()
+            batch = self._collect_batch(first)
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+
+    def _command(self, pdf_paths: List[str], output_folder: str, sheets: Optional[str] = None) -> List[str]:
+        cmd = [
+            AUDIVERIS_JAVA,
+            '-cp', self._classpath,
+            '-Djava.awt.headless=true',
+            f'-Xmx{self.heap}',
+            '-Duser.language=en',
+            '-Duser.country=US',
+            f'-XX:ErrorFile={os.path.join(OMR_LOG_FOLDER, "hs_err_pid%p.log")}',
+        ]
+        if OMR_JVM_CDS:
+            cmd += ['-XX:+AutoCreateSharedArchive',
+                    f'-XX:SharedArchiveFile={os.path.join(OMR_LOG_FOLDER, "audiveris.jsa")}']
+        cmd += ['org.audiveris.omr.Main', '-batch', '-export', '-output', output_folder]
+        if sheets:
+            cmd += ['-sheets', sheets]
+        return cmd + pdf_paths
+
+    def _invoke(self, jobs: List[_OmrJob], output_folder: str):
+        log.debug("Audiveris 실행 시작 (%d개 파일): %s", len(jobs), [j.pdf_path for j in jobs])
+        with STAGE_SECONDS.time("omr"):
             result = subprocess.run(
-                [
-                    java_executable,
-                    '-cp', classpath,
-                    '-Djava.awt.headless=true',
-                    '-Xmx2g',
-                    '-Duser.language=en',
-                    '-Duser.country=US',
-                    'org.audiveris.omr.Main',
-                    '-batch',
-                    '-export',
-                    '-output', upload_folder,
-                    pdf_path
-                ],
+                self._command([j.pdf_path for j in jobs], output_folder, jobs[0].sheets),
                 capture_output=True,
                 text=True,
                 encoding='utf-8',
-                timeout=1800
+                timeout=OMR_TIMEOUT * len(jobs)
             )
+        self.stats["batches"] += 1
+        self.stats["jobs"] += len(jobs)
 
-            print("Audiveris 실행 완료")
-
-            if result.returncode != 0:
-                print("----- Audiveris Stderr -----")
-                print(result.stderr)
-                print("----- Audiveris Stdout -----")
-                print(result.stdout)
-                
-                if "UnsupportedClassVersionError" in result.stderr or "Preview features" in result.stderr:
-                    raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
-                elif "No installed OCR languages" in result.stdout:
-                    print("OCR 언어 패키지가 없지만 악보 인식은 계속 진행합니다.")
-                else:
-                    raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
-
-            # --- 4. 변환된 MusicXML 파일 찾기 ---
-            print(f"출력 폴더 내용 확인: {os.listdir(upload_folder)}")
-            
-            base_pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
-            possible_extensions = ['.mxl', '.xml', '.musicxml']
-            music_file_path = None
-            
-            for ext in possible_extensions:
-                potential_path = os.path.join(upload_folder, f"{base_pdf_name}{ext}")
-                if os.path.exists(potential_path):
-                    music_file_path = potential_path
-                    print(f"변환된 파일 발견: {music_file_path}")
-                    break
-            
-            if not music_file_path:
-                for file_item in os.listdir(upload_folder):
-                    if any(file_item.endswith(ext) for ext in possible_extensions):
-                        music_file_path = os.path.join(upload_folder, file_item)
-                        print(f"폴더 검색으로 발견된 파일: {music_file_path}")
-                        break
-            
-            if not music_file_path or not os.path.exists(music_file_path):
-                raise FileNotFoundError("MusicXML 파일이 변환 후 생성되지 않았습니다.")
+        if result.returncode != 0:
+            # 전체 출력은 수 MB 가 될 수 있으므로 끝부분만 남긴다
+            log.warning("Audiveris 종료 코드 %s\n----- stderr (끝부분) -----\n%s\n----- stdout (끝부분) -----\n%s",
+                        result.returncode, (result.stderr or "")[-4000:], (result.stdout or "")[-2000:])
 
-        except subprocess.TimeoutExpired:
-            print("!!! Audiveris 실행 시간 초과 !!!")
-            return jsonify({'message': '악보 변환 작업이 너무 오래 걸려 중단되었습니다.'}), 500
-        except subprocess.CalledProcessError as e:
-            return jsonify({'message': 'PDF를 MusicXML로 변환하는데 실패했습니다.'}), 500
-        except FileNotFoundError as e:
-            print(f"파일을 찾을 수 없습니다: {e}")
-            return jsonify({'message': '변환된 MusicXML 파일을 찾을 수 없습니다.'}), 500
+            if "UnsupportedClassVersionError" in result.stderr or "Preview features" in result.stderr:
+                raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+            elif "No installed OCR languages" in result.stdout:
+                log.debug("OCR 언어 패키지가 없지만 악보 인식은 계속 진행합니다.")
+            else:
+                raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
 
-        # --- 5. MusicXML -> WAV 변환 (반복 기호 오류 처리) ---
+    def _run_batch(self, jobs: List[_OmrJob]):
+        shared = len({job.output_folder for job in jobs}) > 1
+        output_folder = (tempfile.mkdtemp(prefix=f".omr-batch-{os.getpid()}-", dir=SCORE_UPLOAD_FOLDER) if shared
+                         else jobs[0].output_folder)
         try:
-            print(f"Music21로 파일 파싱 시작: {music_file_path}")
-            score = converter.parse(music_file_path)
-            
-            # MIDI 파일 생성
-            midi_filename = f"{unique_filename}.mid"
-            midi_path = os.path.join(midi_folder, midi_filename)
-            
-            print(f"MIDI 파일 생성 중: {midi_path}")
-            
-            # 반복 기호 처리 시도
-            try:
-                # 1차 시도: 반복 기호 확장
-                expanded_score = score.expandRepeats()
-                expanded_score.write('midi', fp=midi_path)
-                print(f"MIDI 파일 생성 완료 (반복 확장): {midi_path}")
-            except Exception as repeat_error:
-                print(f"반복 확장 실패: {repeat_error}")
+            self._run_batch_in(jobs, output_folder)
+        finally:
+            if shared:
+                shutil.rmtree(output_folder, ignore_errors=True)
+
+    def _run_batch_in(self, jobs: List[_OmrJob], output_folder: str):
+        try:
+            self._invoke(jobs, output_folder)
+        except subprocess.CalledProcessError as e:
+            self.stats["crashes"] += 1
+            # JVM 크래시 시 CDS 아카이브가 손상되었을 수 있으므로 다음 실행에서 다시 만든다
+            if OMR_JVM_CDS:
+                try: os.remove(os.path.join(OMR_LOG_FOLDER, "audiveris.jsa"))
+                except OSError: pass
+            if len(jobs) == 1:
+                raise
+            # 묶음 중 하나가 실패해도 나머지가 영향을 받지 않도록 개별 재시도
+            log.warning("Audiveris 묶음 실행 실패 (code=%s), 파일별로 재시도합니다.", e.returncode)
+            self.stats["retries"] += len(jobs)
+            for job in jobs:
                 try:
-                    # 2차 시도: 반복 기호 무시하고 생성
-                    print("반복 기호를 제거하고 다시 시도합니다...")
-                    
-                    # 모든 반복 기호 제거
-                    for part in score.parts:
-                        for measure in part.getElementsByClass('Measure'):
-                            # 반복 기호 제거
-                            for repeat in measure.getElementsByClass('Repeat'):
-                                measure.remove(repeat)
-                            for barline in measure.getElementsByClass('Barline'):
-                                if barline.type in ['regular', 'final']:
-                                    continue
-                                measure.remove(barline)
-                    
-                    score.write('midi', fp=midi_path)
-                    print(f"MIDI 파일 생성 완료 (반복 제거): {midi_path}")
-                except Exception as fallback_error:
-                    print(f"반복 제거 후에도 실패: {fallback_error}")
-                    # 3차 시도: flatten으로 단순화
-                    try:
-                        print("악보를 단순화하여 다시 시도합니다...")
-                        flat_score = score.flatten()
-                        flat_score.write('midi', fp=midi_path)
-                        print(f"MIDI 파일 생성 완료 (단순화): {midi_path}")
-                    except Exception as final_error:
-                        print(f"모든 변환 시도 실패: {final_error}")
-                        raise Exception(f"MIDI 변환 실패: {final_error}")
-            
-            # WAV 파일로 변환
-            duration = 180 # 기본값
+                    self._run_batch([job])
+                except Exception as job_error:
+                    job.future.set_exception(job_error)
+            return
+
+        for job in jobs:
+            if job.future.done():
+                continue
+            base_name = os.path.splitext(os.path.basename(job.pdf_path))[0]
+            music_file_path = _find_music_file(output_folder, base_name, allow_any=len(jobs) == 1)
+            if music_file_path and output_folder != job.output_folder:
+                dest = os.path.join(job.output_folder, os.path.basename(music_file_path))
+                shutil.move(music_file_path, dest)
+                music_file_path = dest
+            if music_file_path:
+                job.future.set_result(music_file_path)
+            else:
+                job.future.set_exception(FileNotFoundError("MusicXML 파일이 변환 후 생성되지 않았습니다."))
+
+omr_pool = OmrWorkerPool(OMR_MAX_JVMS, OMR_JVM_HEAP, OMR_BATCH_MAX, OMR_BATCH_LINGER)
+
+# ───── 페이지 분할 병렬 OMR ─────────────────────────────────────
+# 페이지 수가 OMR_SHARD_MIN_PAGES 이상이면 PDF를 OMR_SHARDS 개의 페이지 구간으로 나눠
+# Audiveris -sheets 로 동시에 인식하고, 조각별 MusicXML 을 하나의 악보로 합친다.
+# (동시에 실행되는 JVM 수는 여전히 OMR_MAX_JVMS 로 제한됨)
+OMR_SHARDS = int(os.getenv("OMR_SHARDS", "1"))
+OMR_SHARD_MIN_PAGES = int(os.getenv("OMR_SHARD_MIN_PAGES", "4"))
+
+def _pdf_page_count(pdf_path: str) -> int:
+    if importlib.util.find_spec("pypdf"):
+        from pypdf import PdfReader
+        return len(PdfReader(pdf_path).pages)
+    # pypdf 가 없으면 페이지 객체 수를 직접 센다 (압축된 객체 스트림이면 0이 나올 수 있음)
+    with open(pdf_path, "rb") as f:
+        return len(re.findall(rb"/Type\s*/Page(?!s)", f.read()))
+
+def _shard_ranges(pages: int, shards: int) -> List[str]:
+    shards = max(1, min(shards, pages))
+    size, extra = divmod(pages, shards)
+    ranges, start = [], 1
+    for i in range(shards):
+        end = start + size - 1 + (1 if i < extra else 0)
+        ranges.append(f"{start}-{end}")
+        start = end + 1
+    return ranges
+
+def _read_musicxml(path: str) -> ET.Element:
+    if path.endswith(".mxl"):
+        with zipfile.ZipFile(path) as zf:
+            rootfile = None
+            if "META-INF/container.xml" in zf.namelist():
+                container = ET.fromstring(zf.read("META-INF/container.xml"))
+                node = container.find(".//rootfile")
+                rootfile = node.get("full-path") if node is not None else None
+            if not rootfile:
+                rootfile = next(n for n in zf.namelist()
+                                if n.endswith((".xml", ".musicxml")) and not n.startswith("META-INF"))
+            return ET.fromstring(zf.read(rootfile))
+    return ET.parse(path).getroot()
+
+def _merge_musicxml(paths: List[str], dest_path: str):
+    """페이지 조각별 score-partwise 를 이어 붙인다.
+
+    파트는 part-list 순서로 대응시키고, 마디 번호는 앞 조각에 이어서 다시 매긴다.
+    붙임줄/조표/박자표는 마디 안에 그대로 들어 있으므로 페이지 경계를 넘어 유지된다.
+    """
+    base = _read_musicxml(paths[0])
+    if base.tag != "score-partwise":
+        raise ValueError(f"지원하지 않는 MusicXML 형식: {base.tag}")
+    base_parts = base.findall("part")
+    last_number = 0
+    for m in base_parts[0].findall("measure"):
+        if m.get("number", "").isdigit():
+            last_number = int(m.get("number"))
+
+    for path in paths[1:]:
+        shard = _read_musicxml(path)
+        shard_parts = shard.findall("part")
+        if shard.tag != "score-partwise" or len(shard_parts) != len(base_parts):
+            raise ValueError(f"페이지 조각의 파트 구성이 다릅니다: {path}")
+        measure_count = 0
+        for base_part, shard_part in zip(base_parts, shard_parts):
+            measures = shard_part.findall("measure")
+            measure_count = max(measure_count, len(measures))
+            for i, measure in enumerate(measures):
+                measure.set("number", str(last_number + i + 1))
+                base_part.append(measure)
+        last_number += measure_count
+
+    ET.ElementTree(base).write(dest_path, encoding="UTF-8", xml_declaration=True)
+
+def _run_audiveris_sharded(pdf_path: str, output_folder: str, pages: int) -> str:
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    ranges = _shard_ranges(pages, OMR_SHARDS)
+    shard_folders = [os.path.join(output_folder, f"{base_name}.shard{i}") for i in range(len(ranges))]
+    log.debug("페이지 분할 OMR: %d쪽 -> %s", pages, ranges)
+    try:
+        futures = []
+        for sheets, folder in zip(ranges, shard_folders):
+            os.makedirs(folder, exist_ok=True)
+            futures.append(omr_pool.submit(pdf_path, folder, sheets))
+        shard_files = [f.result() for f in futures]
+        merged_path = os.path.join(output_folder, f"{base_name}.musicxml")
+        _merge_musicxml(shard_files, merged_path)
+        return merged_path
+    finally:
+        for folder in shard_folders:
+            shutil.rmtree(folder, ignore_errors=True)
+
+def _run_audiveris(pdf_path: str, output_folder: str) -> str:
+    """Audiveris로 PDF를 MusicXML로 변환하고 결과 파일 경로를 반환"""
+    if OMR_SHARDS > 1:
+        try:
+            pages = _pdf_page_count(pdf_path)
+        except Exception as e:
+            log.warning("PDF 페이지 수 확인 실패: %s", e)
+            pages = 0
+        if pages >= OMR_SHARD_MIN_PAGES:
             try:
-                if score.metronomeMarkBoundaries():
-                    tempo = score.metronomeMarkBoundaries()[0][-1].number
-                    duration = int(score.duration.quarterLength / tempo * 60)
+                return _run_audiveris_sharded(pdf_path, output_folder, pages)
+            except subprocess.TimeoutExpired:
+                raise
             except Exception as e:
-                print(f"곡 길이 계산 실패: {e}, 기본값(180) 사용")
-                duration = 180
+                log.warning("페이지 분할 OMR 실패, 전체 PDF 로 다시 시도합니다: %r", e)
+    return omr_pool.run(pdf_path, output_folder)
 
-            if output_format == 'midi':
-                # MIDI 형식이 요청된 경우:
-                print("MIDI 형식이 요청됨. WAV 변환을 건너뜁니다.")
-                audio_url = f"http://127.0.0.1:5000/api/audio/{midi_filename}"
-                audio_path = midi_path
-            
-            else:
-                # WAV 형식이 요청된 경우 (기본값):
-                wav_filename = f"{unique_filename}.wav"
-                wav_path = os.path.join(midi_folder, wav_filename)
-                
-                try:
-                    print(f"WAV 파일 변환 중: {wav_path}")
-                    if FluidSynth is None:
-                        raise RuntimeError("FluidSynth 가 설치되어 있지 않습니다. midi2audio 패키지를 확인하세요.")
-                    fs = FluidSynth(sound_font=r'C:\soundfonts\FluidR3_GM.sf2')
-                    fs.midi_to_audio(midi_path, wav_path)
-                    print(f"WAV 파일 생성 완료: {wav_path}")
-                    
-                    audio_url = f"http://127.0.0.1:5000/api/audio/{wav_filename}"
-                    audio_path = wav_path
-                except Exception as e:
-                    #
-                    print(f"FluidSynth 변환 실패: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    print("MIDI 파일을 그대로 사용합니다")
-                    audio_url = f"http://127.0.0.1:5000/api/audio/{midi_filename}"
-                    audio_path = midi_path
-
-            # 결과 데이터 생성
-            result_data = {
-                "id": unique_filename,
-                "title": f"악보 연주 - {uploaded_file.filename}",
-                "audioUrl": audio_url,
-                "audioPath": audio_path,
-                "genres": ["Classical"],
-                "moods": [],
-                "duration": duration,
-                "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-                "type": "score-audio",
-                "format": output_format
-            }
+def _write_score_midi(score, midi_path: str):
+    """music21 악보를 MIDI로 저장 (반복 기호 오류 처리)"""
+    log.debug("MIDI 파일 생성 중: %s", midi_path)
+    try:
+        # 1차 시도: 반복 기호 확장
+        expanded_score = score.expandRepeats()
+        expanded_score.write('midi', fp=midi_path)
+        log.debug("MIDI 파일 생성 완료 (반복 확장): %s", midi_path)
+    except Exception as repeat_error:
+        log.warning("반복 확장 실패: %s", repeat_error)
+        try:
+            # 2차 시도: 반복 기호 무시하고 생성
+            log.debug("반복 기호를 제거하고 다시 시도합니다...")
+
+            # 모든 반복 기호 제거
+            for part in score.parts:
+                for measure in part.getElementsByClass('Measure'):
+                    # 반복 기호 제거
+                    for repeat in measure.getElementsByClass('Repeat'):
+                        measure.remove(repeat)
+                    for barline in measure.getElementsByClass('Barline'):
+                        if barline.type in ['regular', 'final']:
+                            continue
+                        measure.remove(barline)
+
+            score.write('midi', fp=midi_path)
+            log.debug("MIDI 파일 생성 완료 (반복 제거): %s", midi_path)
+        except Exception as fallback_error:
+            log.warning("반복 제거 후에도 실패: %s", fallback_error)
+            # 3차 시도: flatten으로 단순화
+            try:
+                log.debug("악보를 단순화하여 다시 시도합니다...")
+                flat_score = score.flatten()
+                flat_score.write('midi', fp=midi_path)
+                log.debug("MIDI 파일 생성 완료 (단순화): %s", midi_path)
+            except Exception as final_error:
+                log.warning("모든 변환 시도 실패: %s", final_error)
+                raise Exception(f"MIDI 변환 실패: {final_error}")
+
+def _score_duration(score) -> int:
+    duration = 180 # 기본값
+    try:
+        if score.metronomeMarkBoundaries():
+            tempo = score.metronomeMarkBoundaries()[0][-1].number
+            duration = int(score.duration.quarterLength / tempo * 60)
+    except Exception as e:
+        log.warning("곡 길이 계산 실패: %s, 기본값(180) 사용", e)
+        duration = 180
+    return duration
 
-            print(f"오디오 파일 준비 완료: {result_data}")
-            
-            # Task ID 생성 및 저장
-            task_id = uuid.uuid4().hex
-            _set_task_status(task_id, "succeeded", result=result_data, audioUrl=audio_url)
-            print(f"Task ID 생성: {task_id}")
+# 일반적인 악보는 musicxml_midi 로 music21 객체 그래프 없이 바로 변환하고,
+# 처리할 수 없는 악보(점프 기호, 타악기 등)만 기존 music21 경로로 넘긴다.
+MIDI_FAST_PATH = os.getenv("MIDI_FAST_PATH", "1") == "1"
+MIDI_STATS = {"fast": 0, "music21": 0}
 
+def _convert_score_midi(task_id: str, music_file_path: str, midi_path: str) -> int:
+    _set_score_stage(task_id, "parse")
+    if MIDI_FAST_PATH:
+        try:
+            with STAGE_SECONDS.time("midi_fast"):
+                seconds = musicxml_midi.convert(music_file_path, midi_path)
+            MIDI_STATS["fast"] += 1
+            log.debug("MIDI 파일 생성 완료 (빠른 변환): %s, 길이 %.1fs", midi_path, seconds)
+            return max(1, int(round(seconds)))
+        except musicxml_midi.Unsupported as e:
+            log.debug("빠른 변환 불가, music21 사용: %s", e)
         except Exception as e:
-            print(f"오디오 변환 오류: {e}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({'message': f'오디오 변환 중 오류가 발생했습니다: {str(e)}'}), 500
+            log.warning("빠른 변환 실패, music21 사용: %r", e)
 
-        finally:
-            # 임시 파일 정리
+    from music21 import converter
+    with STAGE_SECONDS.time("music21_parse"):
+        score = converter.parse(music_file_path)
+    _set_score_stage(task_id, "midi")
+    with STAGE_SECONDS.time("midi_write"):
+        _write_score_midi(score, midi_path)
+    MIDI_STATS["music21"] += 1
+    return _score_duration(score)
+
+# ───── MIDI 합성 엔진 ────────────────────────────────────────────
+# pyfluidsynth + mido 가 있으면 워커 프로세스마다 SoundFont 를 한 번만 읽어 두고 프로세스 안에서
+# 렌더링한다 (synth_worker.py). 긴 곡(SYNTH_PARTS_MIN_SECONDS 이상)은 파트(트랙)별로 나눠
+# 여러 워커에서 동시에 렌더링한 뒤 섞는다. 사용할 수 없으면 midi2audio(fluidsynth CLI)로 대체.
+SYNTH_ENGINE = os.getenv("SYNTH_ENGINE", "auto")   # "auto" | "cli"
+SYNTH_WORKERS = int(os.getenv("SYNTH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+SYNTH_SAMPLE_RATE = int(os.getenv("SYNTH_SAMPLE_RATE", "44100"))
+SYNTH_GAIN = float(os.getenv("SYNTH_GAIN", "0.5"))
+SYNTH_TAIL = float(os.getenv("SYNTH_TAIL", "1.5"))
+SYNTH_PARTS_MIN_SECONDS = float(os.getenv("SYNTH_PARTS_MIN_SECONDS", "120"))
+SYNTH_STATS = {"renders": 0, "audioSeconds": 0.0, "renderSeconds": 0.0, "lastRealtimeFactor": None}
+
+_synth_pool: Optional[ProcessPoolExecutor] = None
+_synth_pool_lock = threading.Lock()
+_synth_inprocess: Optional[bool] = None
+
+@functools.lru_cache(maxsize=None)
+def _midi2audio_fluidsynth():
+    """midi2audio 의 FluidSynth 클래스 (CLI 합성 경로, 패키지가 없으면 None)"""
+    if importlib.util.find_spec("midi2audio") is None:
+        return None
+    return getattr(importlib.import_module("midi2audio"), "FluidSynth", None)
+
+def _inprocess_synth_available() -> bool:
+    global _synth_inprocess
+    if _synth_inprocess is None:
+        _synth_inprocess = False
+        if SYNTH_ENGINE != "cli" and os.path.exists(SOUND_FONT_PATH) and importlib.util.find_spec("mido"):
+            try:
+                importlib.import_module("fluidsynth")   # libfluidsynth 로드 실패 시 ImportError
+                _synth_inprocess = True
+            except (ImportError, OSError) as e:
+                log.warning("인프로세스 합성 엔진을 사용할 수 없습니다 (CLI 사용): %s", e)
+    return _synth_inprocess
+
+def _get_synth_pool() -> ProcessPoolExecutor:
+    global _synth_pool
+    with _synth_pool_lock:
+        if _synth_pool is None:
+            _synth_pool = ProcessPoolExecutor(
+                max_workers=SYNTH_WORKERS,
+                initializer=synth_worker.initialize,
+                initargs=(SOUND_FONT_PATH, SYNTH_SAMPLE_RATE, SYNTH_GAIN))
+        return _synth_pool
+
+def _render_pcm_inprocess(midi_path: str) -> bytes:
+    import mido
+    mid = mido.MidiFile(midi_path)
+    note_tracks = [i for i, track in enumerate(mid.tracks)
+                   if any(msg.type == "note_on" for msg in track)]
+    pool = _get_synth_pool()
+    if len(note_tracks) > 1 and mid.length >= SYNTH_PARTS_MIN_SECONDS:
+        log.debug("파트별 병렬 합성: %d개 트랙", len(note_tracks))
+        futures = [pool.submit(synth_worker.render_tracks, midi_path, [i], SYNTH_TAIL) for i in note_tracks]
+        return synth_worker.mix_pcm([f.result() for f in futures])
+    return pool.submit(synth_worker.render_tracks, midi_path, None, SYNTH_TAIL).result()
+
+def _render_wav(midi_path: str, wav_path: str):
+    started = time.perf_counter()
+    if _inprocess_synth_available():
+        pcm = _render_pcm_inprocess(midi_path)
+        with wave.open(wav_path, "wb") as w:
+            w.setnchannels(2)
+            w.setsampwidth(2)
+            w.setframerate(SYNTH_SAMPLE_RATE)
+            w.writeframes(pcm)
+        audio_seconds = len(pcm) / (4 * SYNTH_SAMPLE_RATE)
+    else:
+        FluidSynth = _midi2audio_fluidsynth()
+        if FluidSynth is None:
+            raise RuntimeError("FluidSynth 가 설치되어 있지 않습니다. midi2audio 패키지를 확인하세요.")
+        fs = FluidSynth(sound_font=SOUND_FONT_PATH, sample_rate=SYNTH_SAMPLE_RATE)
+        fs.midi_to_audio(midi_path, wav_path)
+        with wave.open(wav_path, "rb") as w:
+            audio_seconds = w.getnframes() / w.getframerate()
+    elapsed = time.perf_counter() - started
+    STAGE_SECONDS.observe(elapsed, "synth_render")
+    factor = audio_seconds / elapsed if elapsed > 0 else None
+    SYNTH_STATS["renders"] += 1
+    SYNTH_STATS["audioSeconds"] += audio_seconds
+    SYNTH_STATS["renderSeconds"] += elapsed
+    SYNTH_STATS["lastRealtimeFactor"] = round(factor, 1) if factor else None
+    log.debug("WAV 파일 생성 완료: %s (오디오 %.1fs / 렌더 %.2fs, 실시간 대비 %.1f배)",
+              wav_path, audio_seconds, elapsed, factor or 0)
+
+# ───── 악보 변환 결과 캐시 (PDF SHA-256 기반) ──────────────────────
+SCORE_CACHE_FOLDER = os.path.join(BACKEND_DIR, 'score_cache')
+SCORE_CACHE_MAX_MB = int(os.getenv("SCORE_CACHE_MAX_MB", "2048"))
+
+class ArtifactCache:
+    """내용 주소 기반 파일 캐시. 전체 크기를 넘으면 가장 오래 쓰이지 않은 항목부터 삭제한다.
+
+    키는 ``<sha256>.<확장자>`` 형태의 파일 이름이며, 단계별 산출물(MusicXML, MIDI,
+    WAV, 메타데이터)이 각자 하나의 키를 가진다.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(root, exist_ok=True)
+        # 재시작 후에도 LRU 순서를 유지하도록 마지막 사용 시각(atime, get 이 직접 기록) 순으로 인덱스 복원
+        files = []
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if os.path.isfile(path) and not name.startswith('.'):
+                st = os.stat(path)
+                files.append((max(st.st_atime, st.st_mtime), name, st.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str, count: bool = True) -> Optional[str]:
+        with self._lock:
+            path = self.path(key)
+            if key in self._entries and not os.path.exists(path):
+                self._bytes -= self._entries.pop(key)
+            if key not in self._entries:
+                if count:
+                    self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        # 캐시 파일은 generated_midi 의 응답 파일과 하드링크로 inode 를 공유하므로 mtime 을 바꾸면
+        # 이미 내보낸 파일의 ETag/Last-Modified 가 바뀐다. 사용 시각은 atime 에만 남긴다
+        try: os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        except OSError: pass
+        return path
+
+    def put(self, key: str, src_path: str, move: bool = False) -> str:
+        """src_path를 캐시에 넣는다. move=False 이면 하드링크(불가 시 복사)로 원본을 유지한다."""
+        dest = self.path(key)
+        tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+        if move:
+            shutil.move(src_path, tmp)
+        else:
+            try:
+                os.link(src_path, tmp)
+            except OSError:
+                shutil.copyfile(src_path, tmp)
+        os.replace(tmp, dest)
+        size = os.path.getsize(dest)
+        with self._lock:
+            self._bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+        return dest
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.stats["evictions"] += 1
             try:
-                os.remove(pdf_path)
-                if music_file_path and os.path.exists(music_file_path):
-                    os.remove(music_file_path)
-                for file_item in os.listdir(upload_folder):
-                    if file_item.endswith(('.log', '.omr')):
-                        try:
-                            os.remove(os.path.join(upload_folder, file_item))
-                        except:
-                            pass
-            except Exception as cleanup_error:
-                print(f"파일 정리 중 오류: {cleanup_error}")
-        
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hitRate": round(self.stats["hits"] / lookups, 3) if lookups else None,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+            }
+
+score_cache = ArtifactCache(SCORE_CACHE_FOLDER, SCORE_CACHE_MAX_MB * 1024 * 1024)
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _link_artifact(src_path: str, dest_path: str):
+    """캐시 파일을 응답용 경로로 연결 (캐시에서 삭제되어도 응답 파일은 유지됨)"""
+    try:
+        os.link(src_path, dest_path)
+    except OSError:
+        shutil.copyfile(src_path, dest_path)
+
+def _cached_music_file(digest: str) -> Optional[str]:
+    for ext in MUSIC_EXTENSIONS:
+        path = score_cache.get(f"{digest}{ext}", count=False)
+        if path:
+            return path
+    score_cache.stats["misses"] += 1
+    return None
+
+def _omr_to_cache(digest: str, pdf_path: str) -> str:
+    try:
+        music_file_path = _run_audiveris(pdf_path, os.path.dirname(pdf_path))
+    except subprocess.TimeoutExpired:
+        log.warning("Audiveris 실행 시간 초과")
+        raise RuntimeError('악보 변환 작업이 너무 오래 걸려 중단되었습니다.')
+    except subprocess.CalledProcessError:
+        raise RuntimeError('PDF를 MusicXML로 변환하는데 실패했습니다.')
+    except FileNotFoundError as e:
+        log.warning("파일을 찾을 수 없습니다: %s", e)
+        raise RuntimeError('변환된 MusicXML 파일을 찾을 수 없습니다.')
+    ext = os.path.splitext(music_file_path)[1]
+    return score_cache.put(f"{digest}{ext}", music_file_path, move=True)
+
+def worker_process_score(task_id: str, pdf_path: str, unique_filename: str,
+                         original_filename: str, output_format: str):
+    SCORE_QUEUED.dec()
+    scratch = os.path.dirname(pdf_path)
+    midi_folder = MIDI_FOLDER
+    try:
+        # 같은 PDF가 다시 올라오면 캐시에 없는 첫 단계부터 이어서 처리
+        digest = _file_sha256(pdf_path)
+        midi_filename = f"{unique_filename}.mid"
+        midi_path = os.path.join(midi_folder, midi_filename)
+
+        meta_path = score_cache.get(f"{digest}.json")
+        cached_midi = score_cache.get(f"{digest}.mid") if meta_path else None
+        if cached_midi:
+            log.debug("캐시된 MIDI 사용: %s", digest)
+            with open(meta_path, encoding="utf-8") as f:
+                duration = json.load(f).get("duration", 180)
+            _link_artifact(cached_midi, midi_path)
+        else:
+            # --- 1. Audiveris 실행 (PDF -> MusicXML) ---
+            music_file_path = _cached_music_file(digest)
+            if music_file_path:
+                log.debug("캐시된 MusicXML 사용: %s", music_file_path)
+            else:
+                _set_score_stage(task_id, "omr")
+                music_file_path = _omr_to_cache(digest, pdf_path)
+
+            # --- 2~3. MusicXML -> MIDI (빠른 변환기, 안 되면 music21) ---
+            duration = _convert_score_midi(task_id, music_file_path, midi_path)
+            score_cache.put(f"{digest}.mid", midi_path)
+            meta_tmp = os.path.join(scratch, f"{unique_filename}.json")
+            with open(meta_tmp, "w", encoding="utf-8") as f:
+                json.dump({"duration": duration}, f)
+            score_cache.put(f"{digest}.json", meta_tmp, move=True)
+
+        if output_format == 'midi':
+            # MIDI 형식이 요청된 경우:
+            log.debug("MIDI 형식이 요청됨. WAV 변환을 건너뜁니다.")
+            audio_url = _local_audio_url(midi_filename)
+            audio_path = midi_path
+
+        else:
+            # --- 4. WAV 형식이 요청된 경우 (기본값) ---
+            wav_filename = f"{unique_filename}.wav"
+            wav_path = os.path.join(midi_folder, wav_filename)
+
+            try:
+                cached_wav = score_cache.get(f"{digest}.wav")
+                if cached_wav:
+                    log.debug("캐시된 WAV 사용: %s", digest)
+                    _link_artifact(cached_wav, wav_path)
+                else:
+                    _set_score_stage(task_id, "render")
+                    _render_wav(midi_path, wav_path)
+                    score_cache.put(f"{digest}.wav", wav_path)
+                audio_url = _local_audio_url(wav_filename)
+                audio_path = wav_path
+            except Exception as e:
+                log.exception("FluidSynth 변환 실패, MIDI 파일을 그대로 사용합니다: %s", e)
+                audio_url = _local_audio_url(midi_filename)
+                audio_path = midi_path
+
+        _register_artifact(midi_path, task_id)
+        _register_artifact(audio_path, task_id)
+
+        # 결과 데이터 생성
+        result_data = {
+            "id": unique_filename,
+            "title": f"악보 연주 - {original_filename}",
+            "audioUrl": audio_url,
+            "audioPath": audio_path,
+            "peaksUrl": _peaks_url(os.path.basename(audio_path)) if audio_path.endswith(".wav") else None,
+            "genres": ["Classical"],
+            "moods": [],
+            "duration": duration,
+            "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "type": "score-audio",
+            "format": output_format
+        }
+
+        _set_task_status(task_id, "succeeded", stage="done", progress=1.0,
+                         result=result_data, audioUrl=audio_url)
+
+    except Exception as e:
+        log.exception("오디오 변환 오류: %s", e)
+        _set_task_status(task_id, "failed", error=f'오디오 변환 중 오류가 발생했습니다: {str(e)}')
+
+    finally:
+        _score_slots.release()
+        SCORE_INFLIGHT.dec()
+        # MusicXML은 캐시로 이동되었으므로 PDF와 Audiveris 부산물(.omr/.log)이 남은 작업 폴더째 삭제
+        _remove_scratch(scratch)
+
+@app.route('/api/process-score', methods=['POST'])
+def process_score():
+    if 'score' not in request.files:
+        return jsonify({'message': '악보 파일이 없습니다.'}), 400
+
+    uploaded_file = request.files['score']
+
+    output_format = request.form.get('format', 'wav')
+
+    if uploaded_file.filename == '':
+        return jsonify({'message': '파일이 선택되지 않았습니다.'}), 400
+
+    if uploaded_file and uploaded_file.filename.endswith('.pdf'):
+        # 대기열이 가득 찬 경우 업로드를 저장하지 않고 바로 거절
+        if not _score_slots.acquire(blocking=False):
+            resp = jsonify({'message': '악보 변환 대기열이 가득 찼습니다. 잠시 후 다시 시도해주세요.',
+                            'retryAfter': SCORE_RETRY_AFTER})
+            resp.headers['Retry-After'] = str(SCORE_RETRY_AFTER)
+            return resp, 503
+        SCORE_INFLIGHT.inc()
+
+        unique_filename = str(uuid.uuid4())
+        try:
+            pdf_path = os.path.join(_job_scratch(unique_filename), f"{unique_filename}.pdf")
+            with STAGE_SECONDS.time("upload_save"):
+                uploaded_file.save(pdf_path)
+        except Exception:
+            _remove_scratch(os.path.join(SCORE_UPLOAD_FOLDER, unique_filename))
+            _score_slots.release()
+            SCORE_INFLIGHT.dec()
+            raise
+
+        task_id = uuid.uuid4().hex
+        _set_score_stage(task_id, "queued")
+        SCORE_QUEUED.inc()
+        _score_executor.submit(worker_process_score, task_id, pdf_path, unique_filename,
+                               uploaded_file.filename, output_format)
+
         # taskId 반환 (다른 API와 동일한 형식)
         return jsonify({
             'taskId': task_id
-        })
+        }), 202
 
     return jsonify({'message': '잘못된 파일 형식입니다.'}), 400
 
+# ───── 업로드 저장 / 컨디셔닝 오디오 전처리 ───────────────────────────
+# 요청 전체 크기는 MAX_CONTENT_LENGTH 로, 컨디셔닝 오디오는 COND_UPLOAD_MAX_MB 로 제한한다.
+UPLOAD_MAX_MB = int(os.getenv("UPLOAD_MAX_MB", "100"))
+COND_UPLOAD_MAX_MB = int(os.getenv("COND_UPLOAD_MAX_MB", "60"))
+app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_MB * 1024 * 1024
+
+# MusicGen 은 32kHz 모노로 처리하고 생성 길이만큼만 조건 오디오를 사용한다
+COND_AUDIO_RATE = int(os.getenv("COND_AUDIO_RATE", "32000"))
+COND_AUDIO_MAX_SECONDS = float(os.getenv("COND_AUDIO_MAX_SECONDS", "30"))
+COND_CACHE_FOLDER = os.path.join(BACKEND_DIR, 'cond_cache')
+COND_CACHE_MAX_MB = int(os.getenv("COND_CACHE_MAX_MB", "512"))
+FFMPEG = shutil.which("ffmpeg")
+
+cond_cache = ArtifactCache(COND_CACHE_FOLDER, COND_CACHE_MAX_MB * 1024 * 1024)
+
+class UploadTooLarge(Exception):
+    pass
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"message": f"업로드 파일이 너무 큽니다 (최대 {UPLOAD_MAX_MB}MB)."}), 413
+
+def _save_upload(up, dest_path: str, max_bytes: int) -> str:
+    """업로드를 청크 단위로 디스크에 쓰면서 SHA-256 을 함께 계산 (메모리에 통째로 올리지 않음)"""
+    h = hashlib.sha256()
+    written = 0
+    try:
+        with open(dest_path, "wb") as f:
+            for chunk in iter(lambda: up.stream.read(1024 * 1024), b""):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(dest_path)
+                h.update(chunk)
+                f.write(chunk)
+    except Exception:
+        try: os.remove(dest_path)
+        except OSError: pass
+        raise
+    return h.hexdigest()
+
+def _trim_wav(src_path: str, dest_path: str, seconds: float):
+    """ffmpeg 가 없을 때: 표준 라이브러리로 WAV 앞부분만 읽어 모노/목표 샘플레이트로 변환"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            import audioop
+        except ImportError:
+            audioop = None
+    with wave.open(src_path, "rb") as src:
+        channels, width, rate = src.getnchannels(), src.getsampwidth(), src.getframerate()
+        frames = src.readframes(int(rate * seconds))
+    if audioop is not None:
+        if channels == 2:
+            frames = audioop.tomono(frames, width, 0.5, 0.5)
+            channels = 1
+        if width != 2:
+            frames = audioop.lin2lin(frames, width, 2)
+            width = 2
+        if rate != COND_AUDIO_RATE and channels == 1:
+            frames, _ = audioop.ratecv(frames, width, channels, rate, COND_AUDIO_RATE, None)
+            rate = COND_AUDIO_RATE
+    with wave.open(dest_path, "wb") as dst:
+        dst.setnchannels(channels)
+        dst.setsampwidth(width)
+        dst.setframerate(rate)
+        dst.writeframes(frames)
+
+def _prepare_conditioning_audio(src_path: str, digest: str, duration: int) -> str:
+    """조건 오디오에서 필요한 구간만 잘라 작게 인코딩한 파일 경로를 반환 (원본 해시 기준 캐시)"""
+    seconds = min(max(duration, 1), COND_AUDIO_MAX_SECONDS)
+    key = f"{digest}-{int(seconds)}s-{COND_AUDIO_RATE}"
+    for ext in (".flac", ".wav"):
+        cached = cond_cache.get(f"{key}{ext}", count=False)
+        if cached:
+            return cached
+    cond_cache.stats["misses"] += 1
+
+    out_path = os.path.join(COND_CACHE_FOLDER, f".{uuid.uuid4().hex}")
+    try:
+        if FFMPEG:
+            # 입력 옵션 -t: 필요한 길이만 디코딩
+            out_path += ".flac"
+            subprocess.run(
+                [FFMPEG, "-v", "error", "-y", "-t", str(seconds), "-i", src_path,
+                 "-ac", "1", "-ar", str(COND_AUDIO_RATE), "-c:a", "flac", out_path],
+                check=True, capture_output=True, timeout=120)
+        elif src_path.lower().endswith(".wav"):
+            out_path += ".wav"
+            _trim_wav(src_path, out_path, seconds)
+        else:
+            log.debug("[conditioning] ffmpeg 가 없어 원본 오디오를 그대로 사용합니다.")
+            return src_path
+    except Exception as e:
+        log.warning("[conditioning] 전처리 실패, 원본 사용: %r", e)
+        try: os.remove(out_path)
+        except OSError: pass
+        return src_path
+    ext = os.path.splitext(out_path)[1]
+    return cond_cache.put(f"{key}{ext}", out_path, move=True)
+
+# ───── 파형 피크 / 압축 파생 오디오 ───────────────────────────────────
+# 산출물이 등록되면 파형 피크(waveform.py)를 백그라운드로 미리 계산하고, /api/audio 가 요청받은
+# Opus/MP3 변환본은 처음 요청될 때 ffmpeg 로 만든다. 둘 다 원본 이름+크기+mtime 해시를 키로
+# AUDIO_DERIVED_FOLDER 의 LRU 캐시에 두므로 원본이 지워져도 고아 파일은 용량 한도 안에서 밀려난다.
+AUDIO_DERIVED_FOLDER = os.path.join(BACKEND_DIR, "audio_derived")
+AUDIO_DERIVED_MAX_MB = int(os.getenv("AUDIO_DERIVED_MAX_MB", "1024"))
+PEAKS_ON_ARTIFACT = os.getenv("PEAKS_ON_ARTIFACT", "1") == "1"
+DERIVE_WORKERS = int(os.getenv("DERIVE_WORKERS", "2"))
+DERIVE_TIMEOUT = float(os.getenv("DERIVE_TIMEOUT", "120"))
+
+TRANSCODE_FORMATS = {
+    "opus": {"ext": ".opus", "mimetype": "audio/ogg", "codec": "libopus", "muxer": "ogg",
+             "bitrates": (32, 48, 64, 96, 128, 160), "default": 96},
+    "mp3": {"ext": ".mp3", "mimetype": "audio/mpeg", "codec": "libmp3lame", "muxer": "mp3",
+            "bitrates": (64, 96, 128, 160, 192, 256, 320), "default": 128},
+}
+# Accept 협상은 브라우저가 압축 형식을 명시했고 원본이 비압축일 때만 한다 (*/* 는 원본 그대로)
+_ACCEPT_FORMATS = {"audio/ogg": "opus", "audio/opus": "opus", "audio/mpeg": "mp3", "audio/mp3": "mp3"}
+_UNCOMPRESSED_AUDIO = {".wav": ("audio/wav", "audio/x-wav", "audio/wave"), ".flac": ("audio/flac", "audio/x-flac")}
+_PEAK_SOURCES = (".wav", ".mp3", ".ogg", ".opus", ".flac", ".m4a")
+
+derived_cache = ArtifactCache(AUDIO_DERIVED_FOLDER, AUDIO_DERIVED_MAX_MB * 1024 * 1024)
+_derive_executor = ThreadPoolExecutor(max_workers=DERIVE_WORKERS, thread_name_prefix="derive")
+_derive_lock = threading.Lock()
+_derive_inflight: Dict[str, Future] = {}
+DERIVE_STATS = {"peaks": 0, "transcodes": 0, "failed": 0}
+
+def _derived_key(path: str, suffix: str) -> str:
+    # uuid 이름의 산출물은 내용이 바뀌지 않으므로 이름+크기면 충분하다 (mtime 은 하드링크/복사로 달라질 수 있음).
+    # 그 밖의 이름(static 등)은 같은 이름으로 덮어쓸 수 있어 mtime 까지 넣는다
+    name, st = os.path.basename(path), os.stat(path)
+    source = f"{name}:{st.st_size}" if _IMMUTABLE_NAME.match(name) else f"{name}:{st.st_size}:{st.st_mtime_ns}"
+    return hashlib.sha256(source.encode("utf-8")).hexdigest() + suffix
+
+def _derive(key: str, build, stage: str) -> Future:
+    """derived_cache 의 key 를 돌려주는 Future. 없으면 build(출력 경로) 로 만들고, 같은 key 는 한 번만 만든다"""
+    with _derive_lock:
+        fut = _derive_inflight.get(key)
+        if fut is not None:
+            return fut
+        cached = derived_cache.get(key)
+        if cached:
+            fut = Future()
+            fut.set_result(cached)
+            return fut
+
+        def run():
+            tmp = os.path.join(AUDIO_DERIVED_FOLDER, f".{uuid.uuid4().hex}")
+            try:
+                with STAGE_SECONDS.time(stage):
+                    build(tmp)
+                return derived_cache.put(key, tmp, move=True)
+            except Exception:
+                DERIVE_STATS["failed"] += 1
+                try: os.remove(tmp)
+                except OSError: pass
+                raise
+            finally:
+                with _derive_lock:
+                    _derive_inflight.pop(key, None)
+        fut = _derive_inflight[key] = _derive_executor.submit(run)
+        return fut
+
+def _peaks_future(path: str) -> Optional[Future]:
+    """파형 피크 파일(.npz) 을 만드는 Future. 디코딩할 수 없는 형식이면 None"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in _PEAK_SOURCES or (ext != ".wav" and not FFMPEG):
+        return None
+
+    def build(out_path: str):
+        import waveform   # NumPy 는 첫 파형 계산 때 불러온다
+        waveform.save(waveform.compute_peaks(path, ffmpeg=FFMPEG), out_path)
+        DERIVE_STATS["peaks"] += 1
+    return _derive(_derived_key(path, ".peaks.npz"), build, "peaks")
+
+def _schedule_peaks(path: str):
+    if not PEAKS_ON_ARTIFACT:
+        return
+    try:
+        fut = _peaks_future(path)
+    except OSError:
+        return
+    if fut is None:
+        return
+
+    def report(f: Future):
+        if f.exception():
+            log.warning("[peaks] 파형 계산 실패 (%s): %r", os.path.basename(path), f.exception())
+    fut.add_done_callback(report)
+
+def _transcode_future(path: str, fmt: str, bitrate: int) -> Optional[Future]:
+    if not FFMPEG:
+        return None
+    spec = TRANSCODE_FORMATS[fmt]
+
+    def build(out_path: str):
+        subprocess.run([FFMPEG, "-v", "error", "-y", "-i", path, "-vn", "-c:a", spec["codec"],
+                        "-b:a", f"{bitrate}k", "-f", spec["muxer"], out_path],
+                       check=True, capture_output=True, timeout=DERIVE_TIMEOUT)
+        DERIVE_STATS["transcodes"] += 1
+    return _derive(_derived_key(path, f"-{bitrate}k{spec['ext']}"), build, "transcode")
+
+def _requested_audio_format(audio_path: str) -> Optional[tuple]:
+    """?format=opus|mp3&bitrate=96 또는 Accept 헤더로 고른 (형식, 비트레이트). 원본을 그대로 보낼 때는 None"""
+    ext = os.path.splitext(audio_path)[1].lower()
+    fmt = (request.args.get("format") or "").lower()
+    if not fmt and ext in _UNCOMPRESSED_AUDIO:
+        # 품질값 순으로 훑다가 원본 형식이 먼저 나오면 원본을 보낸다
+        for mimetype, quality in request.accept_mimetypes:
+            if quality <= 0:
+                continue
+            if mimetype in _UNCOMPRESSED_AUDIO[ext]:
+                break
+            if mimetype in _ACCEPT_FORMATS:
+                fmt = _ACCEPT_FORMATS[mimetype]
+                break
+    spec = TRANSCODE_FORMATS.get(fmt)
+    if spec is None:
+        return None
+    try:
+        wanted = int(str(request.args.get("bitrate") or "").lower().rstrip("k") or spec["default"])
+    except ValueError:
+        wanted = spec["default"]
+    if ext == spec["ext"] and not request.args.get("bitrate"):
+        return None
+    return fmt, min(spec["bitrates"], key=lambda b: abs(b - wanted))
+
+def _peaks_url(filename: str) -> str:
+    return f"{_local_audio_url(filename)}/peaks"
+
 # ───── 오디오 서빙 ────────────────────────────────────────────────
+# 파일 이름 -> 경로 인덱스. 시작 시 한 번 폴더를 훑고, 이후에는 산출물을 쓸 때 _register_artifact 로 갱신한다.
+AUDIO_FOLDERS = [MIDI_FOLDER, OUTPUT_FOLDER, STATIC_FOLDER]   # 악보 변환 / AI 생성 / 기타 파일
+AUDIO_IMMUTABLE_MAX_AGE = int(os.getenv("AUDIO_IMMUTABLE_MAX_AGE", str(365 * 24 * 3600)))
+# uuid 이름의 산출물은 내용이 바뀌지 않으므로 브라우저가 재검증 없이 캐시해도 된다
+_IMMUTABLE_NAME = re.compile(r"^[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}\.[A-Za-z0-9]+$")
+# nginx/apache 앞단에서 파일 전송을 맡기려면 USE_X_SENDFILE=1
+app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE") == "1"
+
+_audio_index: Dict[str, str] = {}
+
+# ───── 산출물 용량 관리 (generated_midi / outputs) ─────────────────────
+ARTIFACT_QUOTA_MB = int(os.getenv("ARTIFACT_QUOTA_MB", "4096"))
+
+class ArtifactManager:
+    """관리 폴더 안 파일의 크기와 마지막 접근 순서를 추적하고, 합계가 한도를 넘으면
+    가장 오래 쓰이지 않은 파일부터 지운다. 아직 살아 있는(task 저장소에 남아 있는) task 가
+    참조하는 파일은 건너뛴다.
+    """
+
+    def __init__(self, folders: List[str], max_bytes: int, is_live):
+        self.folders = [os.path.abspath(f) for f in folders]
+        self.max_bytes = max_bytes
+        self.is_live = is_live
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()   # 경로 -> 크기 (오래된 접근이 앞)
+        self._refs: Dict[str, set] = {}                          # 경로 -> 참조하는 task id
+        self._bytes = 0
+        self.stats = {"evictions": 0, "evictedBytes": 0, "pinnedSkips": 0}
+        # 재시작 후에도 LRU 순서를 유지하도록 mtime 순으로 복원 (.part 등 쓰는 중인 파일 제외)
+        files = []
+        for folder in self.folders:
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if os.path.isfile(path) and not name.startswith('.') and not name.endswith('.part'):
+                    st = os.stat(path)
+                    files.append((st.st_mtime, path, st.st_size))
+        for _, path, size in sorted(files):
+            self._entries[path] = size
+            self._bytes += size
+
+    def manages(self, path: str) -> bool:
+        return os.path.dirname(os.path.abspath(path)) in self.folders
+
+    def add(self, path: str, task_id: Optional[str] = None):
+        path = os.path.abspath(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            self._bytes += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+            if task_id:
+                self._refs.setdefault(path, set()).add(task_id)
+            self._evict()
+
+    def touch(self, path: str):
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+
+    def _pinned(self, path: str) -> bool:
+        refs = self._refs.get(path)
+        if not refs:
+            return False
+        refs.difference_update([t for t in refs if not self.is_live(t)])
+        if refs:
+            return True
+        del self._refs[path]
+        return False
+
+    def _evict(self):
+        if self._bytes <= self.max_bytes:
+            return
+        for path in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            if self._pinned(path):
+                self.stats["pinnedSkips"] += 1
+                continue
+            size = self._entries.pop(path)
+            self._bytes -= size
+            try:
+                os.remove(path)
+                self.stats["evictions"] += 1
+                self.stats["evictedBytes"] += size
+            except OSError:
+                pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "files": len(self._entries), "pinned": len(self._refs),
+                    "bytes": self._bytes, "maxBytes": self.max_bytes}
+
+artifacts = ArtifactManager([MIDI_FOLDER, OUTPUT_FOLDER], ARTIFACT_QUOTA_MB * 1024 * 1024,
+                            is_live=lambda task_id: _get_task(task_id) is not None)
+
+def _build_audio_index():
+    # 앞쪽 폴더가 우선하도록 역순으로 채운다
+    for folder in reversed(AUDIO_FOLDERS):
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path):
+                _audio_index[name] = path
+
+def _register_artifact(path: str, task_id: Optional[str] = None):
+    """/api/audio 로 내보낼 파일을 인덱스에 넣고, 관리 폴더의 파일이면 용량 관리 대상(task 참조 포함)으로 등록"""
+    _audio_index[os.path.basename(path)] = path
+    if artifacts.manages(path):
+        artifacts.add(path, task_id)
+    _schedule_peaks(path)
+
+def _lookup_audio(filename: str) -> Optional[str]:
+    path = _audio_index.get(filename)
+    if path and os.path.isfile(path):
+        artifacts.touch(path)
+        return path
+    _audio_index.pop(filename, None)
+    # 인덱스 밖에서 추가된 파일(수동 복사 등)만 폴더를 직접 확인
+    for folder in AUDIO_FOLDERS:
+        path = os.path.join(folder, filename)
+        if os.path.isfile(path):
+            _register_artifact(path)
+            return path
+    return None
+
+_build_audio_index()
+
 @app.route('/api/audio/<filename>', methods=['GET'])
 def serve_audio(filename):
-    # 여러 폴더에서 파일 찾기
-    backend_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    possible_paths = [
-        os.path.join(backend_dir, 'generated_midi', filename),  # 악보 변환 파일
-        os.path.join(OUTPUT_FOLDER, filename),                   # AI 생성 파일
-        os.path.join(STATIC_FOLDER, filename)                    # 기타 파일
-    ]
-    
-    for audio_path in possible_paths:
-        if os.path.exists(audio_path):
-            print(f"파일 제공: {audio_path}")
-            return send_file(audio_path)
-    
-    print(f"파일을 찾을 수 없음: {filename}")
-    print(f"검색한 경로들:")
-    for path in possible_paths:
-        print(f"  - {path} (존재: {os.path.exists(path)})")
-    
-    return jsonify({'error': '파일이 존재하지 않습니다.'}), 404
+    if os.path.basename(filename) != filename:
+        return jsonify({'error': '파일이 존재하지 않습니다.'}), 404
+    audio_path = _lookup_audio(filename)
+    if not audio_path:
+        return jsonify({'error': '파일이 존재하지 않습니다.'}), 404
+
+    # ?format= / Accept 로 Opus·MP3 변환본을 요청하면 캐시된 파생 파일을 보낸다. 변환본이 아직 없으면
+    # 첫 재생을 늦추지 않도록 원본을 바로 보내고 변환은 백그라운드로 돌린다 (ffmpeg 가 없거나 실패해도 원본)
+    send_path, mimetype, download_name = audio_path, None, None
+    pending = False
+    target = _requested_audio_format(audio_path)
+    fut = _transcode_future(audio_path, *target) if target else None
+    if fut is not None:
+        if not fut.done():
+            pending = True
+        elif fut.exception() is not None:
+            pending = True   # 실패한 변환은 캐시되지 않으므로 다음 요청이 다시 시도한다
+            log.warning("[audio] %s 변환 실패, 원본을 보냅니다: %r", filename, fut.exception())
+        else:
+            send_path = fut.result()
+            spec = TRANSCODE_FORMATS[target[0]]
+            mimetype = spec["mimetype"]
+            download_name = os.path.splitext(filename)[0] + spec["ext"]
+
+    # conditional=True: Range(206), ETag/Last-Modified(304) 처리. 본문은 wsgi.file_wrapper(sendfile)로 전송
+    # 변환본 대신 보낸 원본은 브라우저가 오래 캐시하면 변환본으로 넘어가지 못하므로 매번 재검증하게 한다
+    immutable = bool(_IMMUTABLE_NAME.match(filename)) and not pending
+    resp = send_file(send_path, mimetype=mimetype, download_name=download_name, conditional=True, etag=True,
+                     max_age=AUDIO_IMMUTABLE_MAX_AGE if immutable else 0)
+    resp.headers["Accept-Ranges"] = "bytes"
+    if pending:
+        resp.headers["X-Transcode"] = "pending"
+    if os.path.splitext(filename)[1].lower() in _UNCOMPRESSED_AUDIO:
+        resp.vary.add("Accept")
+    if immutable:
+        resp.cache_control.public = True
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.no_cache = True
+    return resp
+
+@app.route('/api/audio/<filename>/peaks', methods=['GET'])
+def serve_audio_peaks(filename):
+    """파형 피크. ?spp=256|1024|4096|16384 또는 ?width=<픽셀 수>, ?bits=8|16,
+    ?format=json(기본)|dat (audiowaveform 형식, Accept: application/octet-stream 도 dat)"""
+    if os.path.basename(filename) != filename:
+        return jsonify({'error': '파일이 존재하지 않습니다.'}), 404
+    audio_path = _lookup_audio(filename)
+    fut = _peaks_future(audio_path) if audio_path else None
+    if fut is None:
+        return jsonify({'error': '파형 데이터를 만들 수 없는 파일입니다.'}), 404
+    try:
+        peaks_path = fut.result(timeout=DERIVE_TIMEOUT)
+    except Exception as e:
+        log.warning("[peaks] %s 파형 계산 실패: %r", filename, e)
+        return jsonify({'error': '파형 데이터를 만들지 못했습니다.'}), 500
+
+    import waveform
+    try:
+        spp = int(request.args.get("spp") or 0)
+        width = int(request.args.get("width") or 0)
+    except ValueError:
+        return jsonify({'error': 'spp / width 는 정수여야 합니다.'}), 400
+    bits = 16 if request.args.get("bits") == "16" else 8
+    peaks = waveform.load(peaks_path)
+    spp, data = waveform.select(peaks, spp=spp, width=width)
+
+    fmt = request.args.get("format")
+    if not fmt:
+        fmt = "dat" if request.accept_mimetypes.best == "application/octet-stream" else "json"
+    if fmt == "dat":
+        resp = Response(waveform.to_dat(peaks.sample_rate, spp, data, bits), mimetype="application/octet-stream")
+    else:
+        resp = jsonify(waveform.to_json(peaks.sample_rate, spp, data, bits))
+        resp.vary.add("Accept")
+    resp.set_etag(f"{os.path.basename(peaks_path)}-{spp}-{bits}-{fmt}")
+    if _IMMUTABLE_NAME.match(filename):
+        resp.cache_control.public = True
+        resp.cache_control.immutable = True
+        resp.cache_control.max_age = AUDIO_IMMUTABLE_MAX_AGE
+    else:
+        resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
+
+@app.route("/api/audio/derived/stats", methods=["GET"])
+def audio_derived_stats():
+    with _derive_lock:
+        inflight = len(_derive_inflight)
+    return jsonify({**DERIVE_STATS, **derived_cache.snapshot(), "inflight": inflight, "ffmpeg": bool(FFMPEG)})
 
 # ───── AI 음악 생성 엔드포인트 ─────────────────────────────────────
+GEN_QUEUE_FULL = "생성 대기열이 가득 찼습니다. 잠시 후 다시 시도해주세요."
+CANCELED_MESSAGE = "사용자가 작업을 취소했습니다."
+
+def _as_list(v):
+    if v is None: return []
+    if isinstance(v, list): return v
+    if isinstance(v, str):
+        try: return json.loads(v)
+        except: return [v] if v else []
+    return []
+
+def _as_duration(v) -> int:
+    try: return int(v or 10)
+    except: return 10
+
+def _save_conditioning_upload(up) -> tuple:
+    """조건 오디오 업로드를 tmp/ 에 저장하고 (경로, SHA-256) 반환. 너무 크면 UploadTooLarge"""
+    os.makedirs("tmp", exist_ok=True)
+    safe = secure_filename(up.filename or f"audio_{uuid.uuid4().hex}.wav")
+    tmp_path = os.path.join("tmp", f"{uuid.uuid4().hex}_{safe}")
+    with STAGE_SECONDS.time("upload_save"):
+        return tmp_path, _save_upload(up, tmp_path, COND_UPLOAD_MAX_MB * 1024 * 1024)
+
+def _submit_generation(task_id: str, prompt: str, genres, moods, duration: int, client_id: str,
+                       fresh: bool = False, tmp_path: Optional[str] = None, audio_digest: Optional[str] = None,
+                       seed: Optional[int] = None, shared_audio=None) -> bool:
+    """캐시 적중 / 진행 중인 같은 요청에 합류 / 스케줄러 제출 중 하나로 시작. 대기열이 가득 차면 False"""
+    cache_key = None
+    if not fresh:
+        cache_key = _generation_key(_build_generation_inputs(prompt, duration, seed), audio_digest)
+        cached_url = _gen_cache_get(cache_key)
+        if cached_url or _gen_attach(cache_key, task_id, genres, moods, duration):
+            if tmp_path:
+                try: os.remove(tmp_path)
+                except: pass
+            if cached_url:
+                _set_generate_succeeded(task_id, cached_url, genres, moods, duration)
+            else:
+                _set_task_status(task_id, "queued")
+            return True
+
+    _set_task_status(task_id, "queued")
+    if not gen_scheduler.submit(task_id, client_id, duration, worker_generate,
+                                task_id, prompt, genres, moods, duration, tmp_path, cache_key,
+                                audio_digest, seed, shared_audio):
+        if cache_key:
+            _gen_finish(cache_key, error=GEN_QUEUE_FULL)
+        if tmp_path:
+            try: os.remove(tmp_path)
+            except: pass
+        return False
+    return True
+
 @app.route("/api/music/generate", methods=["POST"])
 def generate_music():
     ct = (request.content_type or "")
@@ -489,49 +2535,479 @@ def generate_music():
         data = request.get_json(force=True, silent=True) or {}
         up = None
 
-    import json
-    def as_list(v):
-        if v is None: return []
-        if isinstance(v, list): return v
-        if isinstance(v, str):
-            try: return json.loads(v)
-            except: return [v] if v else []
-        return []
-
     prompt = data.get("description") or "instrumental background music"
-    genres = as_list(data.get("genres"))
-    moods = as_list(data.get("moods"))
-    try: duration = int(data.get("duration") or 10)
-    except: duration = 10
+    genres = _as_list(data.get("genres"))
+    moods = _as_list(data.get("moods"))
+    duration = _as_duration(data.get("duration"))
+
+    # fresh=true 이면 캐시/병합 없이 항상 새 변주를 생성
+    fresh = str(data.get("fresh") or "").lower() in ("1", "true", "yes", "on")
 
     tmp_path = None
+    audio_digest = None
     if up:
-        os.makedirs("tmp", exist_ok=True)
-        safe = secure_filename(up.filename or f"audio_{uuid.uuid4().hex}.wav")
-        tmp_path = os.path.join("tmp", f"{uuid.uuid4().hex}_{safe}")
-        up.save(tmp_path)
+        try:
+            tmp_path, audio_digest = _save_conditioning_upload(up)
+        except UploadTooLarge:
+            return jsonify({"message": f"오디오 파일이 너무 큽니다 (최대 {COND_UPLOAD_MAX_MB}MB)."}), 413
 
     task_id = uuid.uuid4().hex
-    _set_task_status(task_id, "queued")
-    threading.Thread(target=worker_generate,
-                     args=(task_id, prompt, genres, moods, duration, tmp_path),
-                     daemon=True).start()
+    client_id = request.headers.get("X-Client-Id") or request.remote_addr or "anonymous"
+    if not _submit_generation(task_id, prompt, genres, moods, duration, client_id, fresh,
+                              tmp_path, audio_digest):
+        task_store.delete(task_id)
+        resp = jsonify({"message": GEN_QUEUE_FULL, "retryAfter": GEN_RETRY_AFTER})
+        resp.headers["Retry-After"] = str(GEN_RETRY_AFTER)
+        return resp, 503
     return jsonify({"taskId": task_id})
 
-@app.route("/api/music/task/status", methods=["GET"])
-def task_status():
-    task_id = request.args.get("task_id") or request.args.get("taskId")
-    task = TASKS.get(task_id)
+# ───── 배치 생성 (그룹) ─────────────────────────────────────────────
+# 여러 생성 스펙(또는 스펙 하나 + 시드 N개)을 한 그룹으로 받아, 그룹마다 BATCH_CONCURRENCY 개씩만
+# 스케줄러에 올린다. 그룹 id 도 task 저장소에 들어가므로 /api/music/task/status 와 SSE 로
+# 항목별 진행 상황과 먼저 끝난 결과를 그대로 받아볼 수 있다. 조건 오디오는 그룹당 한 번만 업로드.
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "16"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_GROUPS_MAX = 1000
+
+class _SharedConditioning:
+    """그룹의 모든 항목이 함께 쓰는 조건 오디오. 처음 필요할 때 한 번만 전처리해 Replicate 에 올린다"""
+
+    def __init__(self, tmp_path: str, digest: str, duration: int):
+        self.tmp_path = tmp_path
+        self.digest = digest
+        self.duration = duration
+        self._lock = threading.Lock()
+        self._url: Optional[str] = None
+        self._error: Optional[Exception] = None
+
+    def __call__(self) -> str:
+        with self._lock:
+            if self._url is None and self._error is None:
+                try:
+                    client = _get_client()
+                    if not client:
+                        raise RuntimeError("No Replicate token loaded from .env")
+                    with STAGE_SECONDS.time("cond_prepare"):
+                        prepared = _prepare_conditioning_audio(self.tmp_path, self.digest, self.duration)
+                    with open(prepared, "rb") as f:
+                        self._url = client.files.create(f).urls["get"]
+                except Exception as e:
+                    self._error = e
+                finally:
+                    self.release()
+            if self._error is not None:
+                raise self._error
+            return self._url
+
+    def release(self):
+        try: os.remove(self.tmp_path)
+        except OSError: pass
+
+class _BatchGroup:
+    def __init__(self, group_id: str, client_id: str, items: List[Dict[str, Any]], fresh: bool,
+                 shared_audio: Optional[_SharedConditioning]):
+        self.group_id = group_id
+        self.client_id = client_id
+        self.items = items                     # [{"taskId", "prompt", "genres", "moods", "duration", "seed"}]
+        self.fresh = fresh
+        self.shared_audio = shared_audio
+        self.pending = deque(items)
+        self.started: set = set()
+        self.finished: set = set()
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+_groups: "OrderedDict[str, _BatchGroup]" = OrderedDict()
+_task_groups: Dict[str, str] = {}   # 항목 task id -> 그룹 id
+
+def _pump_group(group: _BatchGroup):
+    """그룹의 동시 실행 한도가 빌 때마다 다음 항목을 스케줄러에 올린다"""
+    while True:
+        with group.lock:
+            if not group.pending or len(group.started) - len(group.finished) >= BATCH_CONCURRENCY:
+                return
+            item = group.pending.popleft()
+            if (_get_task(item["taskId"]) or {}).get("status") == "canceled":
+                continue
+            group.started.add(item["taskId"])
+        audio_digest = group.shared_audio.digest if group.shared_audio else None
+        if not _submit_generation(item["taskId"], item["prompt"], item["genres"], item["moods"],
+                                  item["duration"], group.client_id, group.fresh, None, audio_digest,
+                                  item["seed"], group.shared_audio):
+            _set_task_status(item["taskId"], "failed", error=GEN_QUEUE_FULL)
+
+def _on_group_item(group_id: str, task_id: str, status: str):
+    group = _groups.get(group_id)
+    if group is None:
+        return
+    if status in TASK_TERMINAL:
+        with group.lock:
+            newly_done = task_id in group.started and task_id not in group.finished
+            if newly_done:
+                group.finished.add(task_id)
+        if newly_done:
+            _pump_group(group)
+    _refresh_group(group)
+
+def _refresh_group(group: _BatchGroup):
+    """항목 상태를 모아 그룹 task 를 갱신 (끝난 항목의 결과는 바로 result.items 에 나타난다)"""
+    with group.refresh_lock:
+        items, counts = [], {}
+        for item in group.items:
+            task = _get_task(item["taskId"]) or {"status": "failed", "error": "Unknown task"}
+            status = task.get("status")
+            counts[status] = counts.get(status, 0) + 1
+            items.append({"taskId": item["taskId"], "seed": item["seed"], "status": status,
+                          "result": task.get("result"), "error": task.get("error")})
+        total = len(items)
+        done = sum(counts.get(st, 0) for st in TASK_TERMINAL)
+        if done < total:
+            status = "running" if done or counts.get("running") else "queued"
+        elif counts.get("succeeded"):
+            status = "succeeded"
+        else:
+            status = "canceled" if counts.get("canceled") == total else "failed"
+        error = f"{total - counts.get('succeeded', 0)}/{total}개 항목 실패" if done == total and status != "succeeded" else None
+        _set_task_status(group.group_id, status, kind="group", progress=round(done / total, 2), error=error,
+                         result={"type": "batch", "total": total, "counts": counts, "items": items})
+        if done == total and group.shared_audio:
+            group.shared_audio.release()   # 모든 항목이 캐시/합류로 끝나 업로드가 필요 없었던 경우
+
+def _parse_batch_specs(data) -> List[Dict[str, Any]]:
+    """{"items": [스펙...]} 또는 스펙 하나 + "seeds": [...] / "count": N"""
+    def spec(d, seed=None):
+        return {"prompt": d.get("description") or "instrumental background music",
+                "genres": _as_list(d.get("genres")), "moods": _as_list(d.get("moods")),
+                "duration": _as_duration(d.get("duration")),
+                "seed": seed if seed is not None else (int(d["seed"]) if d.get("seed") not in (None, "") else None)}
+
+    # 한도를 하나 넘는 데까지만 펼친다 (넘치면 호출한 쪽이 400 으로 거절)
+    limit = BATCH_MAX_ITEMS + 1
+    items = _as_list(data.get("items"))
+    if items:
+        return [spec(d) for d in items[:limit] if isinstance(d, dict)]
+    seeds = [int(x) for x in _as_list(data.get("seeds"))[:limit]]
+    if not seeds and data.get("count"):
+        seeds = [random.randrange(2 ** 31) for _ in range(min(int(data.get("count")), limit))]
+    return [spec(data, seed) for seed in seeds] or [spec(data)]
+
+@app.route("/api/music/generate/batch", methods=["POST"])
+def generate_music_batch():
+    is_multipart = (request.content_type or "").startswith("multipart/form-data")
+    data = request.form if is_multipart else (request.get_json(force=True, silent=True) or {})
+    up = request.files.get("file") if is_multipart else None
+    try:
+        specs = _parse_batch_specs(data)
+    except (TypeError, ValueError):
+        return jsonify({"message": "잘못된 배치 요청입니다."}), 400
+    if not specs:
+        return jsonify({"message": "생성할 항목이 없습니다."}), 400
+    if len(specs) > BATCH_MAX_ITEMS:
+        return jsonify({"message": f"한 번에 최대 {BATCH_MAX_ITEMS}개까지 생성할 수 있습니다."}), 400
+    fresh = str(data.get("fresh") or "").lower() in ("1", "true", "yes", "on")
+
+    shared_audio = None
+    if up:
+        try:
+            tmp_path, audio_digest = _save_conditioning_upload(up)
+        except UploadTooLarge:
+            return jsonify({"message": f"오디오 파일이 너무 큽니다 (최대 {COND_UPLOAD_MAX_MB}MB)."}), 413
+        shared_audio = _SharedConditioning(tmp_path, audio_digest, max(s["duration"] for s in specs))
+
+    group_id = uuid.uuid4().hex
+    client_id = request.headers.get("X-Client-Id") or request.remote_addr or "anonymous"
+    for item in specs:
+        item["taskId"] = uuid.uuid4().hex
+    group = _BatchGroup(group_id, client_id, specs, fresh, shared_audio)
+    for item in specs:
+        _set_task_status(item["taskId"], "queued")
+        _task_groups[item["taskId"]] = group_id
+    _groups[group_id] = group
+    while len(_groups) > BATCH_GROUPS_MAX:
+        _, old = _groups.popitem(last=False)
+        for item in old.items:
+            _task_groups.pop(item["taskId"], None)
+    _refresh_group(group)
+    _pump_group(group)
+    return jsonify({"groupId": group_id, "taskIds": [item["taskId"] for item in specs]})
+
+@app.route("/api/music/cache/stats", methods=["GET"])
+def generation_cache_stats():
+    with _gen_lock:
+        stats = {**GEN_STATS, "entries": len(_gen_cache), "inflight": len(_gen_inflight)}
+    return jsonify({**stats, "scheduler": gen_scheduler.snapshot(),
+                    "engine": _prediction_engine.snapshot() if _prediction_engine else None})
+
+@app.route("/api/translate/stats", methods=["GET"])
+def translate_stats():
+    with _translate_lock:
+        inflight = len(_translate_inflight)
+    return jsonify({**TRANSLATE_STATS, "entries": len(translation_cache), "inflight": inflight,
+                    "persistent": bool(TRANSLATE_CACHE_PATH), "budgetSeconds": TRANSLATE_BUDGET})
+
+@app.route("/api/synth/stats", methods=["GET"])
+def synth_stats():
+    total_audio, total_render = SYNTH_STATS["audioSeconds"], SYNTH_STATS["renderSeconds"]
+    return jsonify({**SYNTH_STATS, "engine": "inprocess" if _inprocess_synth_available() else "cli",
+                    "realtimeFactor": round(total_audio / total_render, 1) if total_render else None})
+
+@app.route("/api/artifacts/stats", methods=["GET"])
+def artifact_stats():
+    return jsonify(artifacts.snapshot())
+
+@app.route("/api/score-cache/stats", methods=["GET"])
+def score_cache_stats():
+    return jsonify({**score_cache.snapshot(), "midiConverter": MIDI_STATS})
+
+@app.route("/api/music/task/cancel", methods=["POST"])
+def cancel_task():
+    data = request.get_json(force=True, silent=True) or {}
+    task_id = data.get("taskId") or data.get("task_id") or request.args.get("taskId")
+    task = _get_task(task_id)
     if not task:
         return jsonify({"status": "failed", "error": "Unknown task"}), 404
-    return jsonify({
+    if task.get("status") in ("succeeded", "failed", "canceled"):
+        return jsonify({"taskId": task_id, "status": task.get("status")}), 409
+    if task.get("kind") == "score":
+        # 악보 변환은 OMR/합성 단계 중간에 멈출 수 없으므로 취소를 받지 않는다
+        return jsonify({"taskId": task_id, "status": task.get("status"),
+                        "error": "악보 변환 작업은 취소할 수 없습니다."}), 409
+    if task.get("kind") == "group":
+        # 그룹 취소: 아직 끝나지 않은 항목을 모두 취소하면 그룹 상태는 _refresh_group 이 정리한다
+        for item in (task.get("result") or {}).get("items", []):
+            if (_get_task(item["taskId"]) or {}).get("status") not in TASK_TERMINAL:
+                _cancel_generation(item["taskId"])
+        return jsonify({"taskId": task_id, "status": (_get_task(task_id) or {}).get("status", "canceled")})
+    _cancel_generation(task_id)
+    return jsonify({"taskId": task_id, "status": "canceled"})
+
+def _cancel_generation(task_id: str):
+    with _task_transition_lock:
+        _set_task_status(task_id, "canceled", error=CANCELED_MESSAGE)
+    job = gen_scheduler.cancel(task_id)
+    key = _gen_leaders.get(task_id)
+    if job is None:
+        # 이미 실행 중: 비동기 엔진이면 합류한 요청이 없을 때만 업스트림 예측을 취소한다.
+        # blocking 모드는 호출을 끊을 수 없으므로 끝까지 돌게 두고, 결과는 _gen_finish 가 합류한 요청에 나눠 준다
+        if _prediction_engine is not None and not _gen_has_waiters(key):
+            _prediction_engine.cancel(task_id)
+        return
+
+    # 대기열에서 빠진 작업은 워커가 실행하지 않는다. 합류한 요청이 남아 있으면 첫 요청에 넘겨 다시 대기열에 넣는다
+    client_id, fn, args = job
+    successor = _gen_promote(key, task_id) if key else None
+    if successor is not None:
+        new_id, genres, moods, duration = successor
+        if gen_scheduler.submit(new_id, client_id, duration, fn, new_id, args[1], genres, moods, duration, *args[5:]):
+            return
+        _gen_finish(key, error=GEN_QUEUE_FULL)
+    elif key:
+        _gen_finish(key, error=CANCELED_MESSAGE)
+    tmp_path = args[5]
+    if tmp_path:
+        try: os.remove(tmp_path)
+        except OSError: pass
+
+@app.route("/api/replicate/webhook", methods=["POST"])
+def replicate_webhook():
+    data = request.get_json(force=True, silent=True) or {}
+    if _prediction_engine is not None and data.get("id"):
+        _prediction_engine.notify(data["id"])
+    return "", 204
+
+def _task_payload(task_id: str, task: Dict[str, Any]) -> Dict[str, Any]:
+    position = gen_scheduler.position(task_id) if task.get("status") == "queued" else None
+    return {
         "taskId": task_id,
         "status": task.get("status"),
+        "queuePosition": position,
+        "etaSeconds": gen_scheduler.eta(position) if position is not None else None,
         "audioUrl": task.get("audioUrl"),
+        "remoteUrl": task.get("remoteUrl"),
         "result": task.get("result"),
         "error": task.get("error"),
-    })
+        "stage": task.get("stage"),
+        "progress": task.get("progress"),
+        "updatedAt": task.get("updatedAt"),
+    }
+
+@app.route("/api/music/task/status", methods=["GET"])
+def task_status():
+    task_id = request.args.get("task_id") or request.args.get("taskId")
+    task = _get_task(task_id)
+    if not task:
+        return jsonify({"status": "failed", "error": "Unknown task"}), 404
+    # long-poll: ?wait=<초> 이면 상태가 바뀌거나(since 기준) 끝날 때까지 기다렸다가 응답
+    try:
+        wait = min(float(request.args.get("wait") or 0), TASK_WAIT_MAX)
+    except ValueError:
+        wait = 0
+    if wait > 0 and task.get("status") not in TASK_TERMINAL:
+        try:
+            since = float(request.args.get("since") or task.get("updatedAt") or 0)
+        except ValueError:
+            since = task.get("updatedAt") or 0
+        task = task_events.wait_for_change(task_id, since, wait) or task
+    return jsonify(_task_payload(task_id, task))
+
+@app.route("/api/music/task/<task_id>/events", methods=["GET"])
+def task_events_stream(task_id):
+    if not _get_task(task_id):
+        return jsonify({"status": "failed", "error": "Unknown task"}), 404
+
+    def stream():
+        since = None
+        while True:
+            task = task_events.wait_for_change(task_id, since, SSE_HEARTBEAT)
+            if task is None:
+                yield 'event: error\ndata: {"error": "Unknown task"}\n\n'
+                return
+            if since is not None and task.get("updatedAt", 0) <= since:
+                yield ": keep-alive\n\n"
+                continue
+            since = task.get("updatedAt", 0)
+            yield f"event: status\ndata: {json.dumps(_task_payload(task_id, task), ensure_ascii=False)}\n\n"
+            if task.get("status") in TASK_TERMINAL:
+                return
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ───── /metrics (Prometheus) / 요청 프로파일링 ─────────────────────────
+# 게이지는 긁어 갈 때 계산한다. 폴더 용량은 디렉터리를 훑어야 하므로 METRICS_DISK_TTL 초 동안 재사용.
+METRICS_DISK_TTL = float(os.getenv("METRICS_DISK_TTL", "30"))
+# PROFILE_REQUESTS=1 이면 ?profile=1 또는 X-Profile: 1 요청을 pyinstrument(샘플링 프로파일러)로 기록한다
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") == "1"
+PROFILE_FOLDER = os.path.join(BACKEND_DIR, "logs", "profiles")
+_disk_usage_cache: Dict[str, Any] = {"at": 0.0, "value": {}}
+
+def _folder_bytes(folder: str) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(folder):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _disk_usage() -> Dict[str, int]:
+    if time.monotonic() - _disk_usage_cache["at"] > METRICS_DISK_TTL:
+        usage = {os.path.basename(folder): _folder_bytes(folder)
+                 for folder in (UPLOAD_FOLDER, SCORE_UPLOAD_FOLDER, MIDI_FOLDER, OUTPUT_FOLDER)}
+        # 캐시 폴더는 ArtifactCache 가 크기를 따로 세고 있다
+        usage["score_cache"] = score_cache.snapshot()["bytes"]
+        usage["cond_cache"] = cond_cache.snapshot()["bytes"]
+        usage["audio_derived"] = derived_cache.snapshot()["bytes"]
+        _disk_usage_cache.update(at=time.monotonic(), value=usage)
+    return _disk_usage_cache["value"]
+
+def _queue_depths() -> Dict[str, int]:
+    return {"generate": gen_scheduler.snapshot()["queued"], "omr": omr_pool.pending(),
+            "score": SCORE_QUEUED.value()}
+
+def _inflight() -> Dict[str, int]:
+    with _gen_lock:
+        coalesced = len(_gen_inflight)
+    return {"generate": gen_scheduler.snapshot()["running"], "generate_coalesced": coalesced,
+            "prediction": _prediction_engine.inflight() if _prediction_engine else 0,
+            "mirror": len(_mirror_jobs)}
+
+metrics_registry.gauge("mai_queue_depth", "Jobs waiting in each queue", ["queue"], fn=_queue_depths)
+metrics_registry.gauge("mai_inflight", "Jobs currently running", ["kind"], fn=_inflight)
+metrics_registry.gauge("mai_tasks", "Entries in the task store", fn=task_store.count)
+metrics_registry.gauge("mai_disk_bytes", "Disk usage of artifact folders", ["folder"], fn=_disk_usage)
+metrics_registry.counter("mai_translate_events_total", "Papago translation cache/upstream events", ["event"],
+                         fn=lambda: dict(TRANSLATE_STATS))
+
+@app.before_request
+def _before_request():
+    request.environ["mai.started"] = time.perf_counter()
+    if PROFILE_REQUESTS and (request.args.get("profile") == "1" or request.headers.get("X-Profile") == "1"):
+        if importlib.util.find_spec("pyinstrument"):
+            from pyinstrument import Profiler
+            profiler = Profiler(interval=0.001)
+            profiler.start()
+            request.environ["mai.profiler"] = profiler
+
+@app.after_request
+def _after_request(resp):
+    started = request.environ.get("mai.started")
+    if started is not None:
+        HTTP_SECONDS.observe(time.perf_counter() - started,
+                             request.endpoint or "unknown", request.method, str(resp.status_code))
+    profiler = request.environ.pop("mai.profiler", None)
+    if profiler is not None:
+        profiler.stop()
+        os.makedirs(PROFILE_FOLDER, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unknown'}-{uuid.uuid4().hex[:6]}.html"
+        with open(os.path.join(PROFILE_FOLDER, name), "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+        resp.headers["X-Profile-File"] = name
+    return resp
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics_registry.render(), content_type=metrics.CONTENT_TYPE)
+
+# ───── 앱 팩토리 / 예열 / 헬스 체크 ─────────────────────────────────
+# 무거운 의존성(music21, replicate, 합성 엔진)은 create_app 이 띄우는 예열 스레드에서 미리 불러 둔다.
+# /healthz 는 프로세스가 요청을 받을 수 있는지만, /readyz 는 예열이 끝나 실제 작업을 받을 수 있는지를 본다.
+WARMUP_STATE: Dict[str, Any] = {"startedAt": None, "finishedAt": None, "seconds": None, "components": {}}
+_warmup_lock = threading.Lock()
+_warmup_done = threading.Event()
+
+def _warm_up():
+    started = time.perf_counter()
+    components = WARMUP_STATE["components"]
+
+    def step(name, fn):
+        try:
+            components[name] = fn() or "ok"
+        except Exception as e:
+            components[name] = f"error: {e!r}"
+            log.warning("[warm-up] %s 실패: %r", name, e)
+
+    step("music21", lambda: importlib.import_module("music21.converter") and None)
+    step("replicate", lambda: None if _get_client() else "disabled")
+    step("predictionEngine", lambda: None if _get_prediction_engine() else "disabled")
+    step("synth", lambda: "inprocess" if _inprocess_synth_available()
+         else ("cli" if _midi2audio_fluidsynth() else "unavailable"))
+    WARMUP_STATE["finishedAt"] = time.time()
+    WARMUP_STATE["seconds"] = round(time.perf_counter() - started, 3)
+    _warmup_done.set()
+    log.info("[warm-up] 완료 (%ss): %s", WARMUP_STATE["seconds"], components)
+
+def _start_warm_up():
+    with _warmup_lock:
+        if WARMUP_STATE["startedAt"] is None:
+            WARMUP_STATE["startedAt"] = time.time()
+            threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+
+def create_app(warm_up: bool = True) -> Flask:
+    """WSGI 진입점 (예: gunicorn 'server:create_app()'). warm_up=False 면 첫 사용 시점에 불러온다"""
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)   # replicate 의 요청마다 남는 INFO 로그
+    if warm_up:
+        _start_warm_up()
+    return app
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    _start_warm_up()   # create_app 을 거치지 않고 app 을 직접 띄운 경우
+    components = dict(WARMUP_STATE["components"])
+    failed = [name for name in ("music21", "replicate") if str(components.get(name, "")).startswith("error")]
+    ready = _warmup_done.is_set() and not failed
+    body = {"status": "ready" if ready else ("failed" if failed else "warming"),
+            "warmUpSeconds": WARMUP_STATE["seconds"], "components": components}
+    return jsonify(body), 200 if ready else 503
 
 # ───── 서버 실행 ─────────────────────────────────────────────────
 if __name__ == "__main__":
-    app.run(host="127.0.0.1", port=5000, debug=True)    
+    # 디버그 모드(리로더 + 디버거)는 FLASK_DEBUG=1 일 때만 켠다
+    create_app().run(host="127.0.0.1", port=5000, debug=os.getenv("FLASK_DEBUG") == "1")    
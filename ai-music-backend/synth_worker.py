@@ -0,0 +1,95 @@
+"""MIDI -> PCM 인프로세스 합성 워커 (ProcessPoolExecutor 에서 실행)
+
+워커 프로세스마다 initialize() 에서 SoundFont 를 한 번만 읽어 두고, render_tracks() 는
+그 Synth 로 MIDI 이벤트를 직접 흘려 넣어 16-bit 스테레오 PCM 을 만든다.
+pyfluidsynth(libfluidsynth) 와 mido 가 필요하다. server.py 는 둘 중 하나라도 없으면
+기존 midi2audio(fluidsynth CLI) 경로를 사용한다.
+"""
+from typing import List, Optional
+
+_synth = None
+_sfid = None
+_rate = 44100
+
+
+def initialize(sound_font: str, sample_rate: int, gain: float):
+    global _synth, _sfid, _rate
+    import fluidsynth
+
+    _rate = sample_rate
+    _synth = fluidsynth.Synth(gain=gain, samplerate=float(sample_rate))
+    _sfid = _synth.sfload(sound_font)
+    _reset()
+
+
+def _reset():
+    _synth.system_reset()
+    for chan in range(16):
+        # 10번 채널(9)은 GM 드럼 뱅크
+        _synth.program_select(chan, _sfid, 128 if chan == 9 else 0, 0)
+
+
+def _select_tracks(midi_path: str, track_indexes: Optional[List[int]]):
+    import mido
+
+    mid = mido.MidiFile(midi_path)
+    if track_indexes is None:
+        return mid
+    # 선택한 트랙만 남기되, 다른 트랙에 있는 템포 변경은 그대로 유지해야 시간이 맞는다
+    tempo_events = []
+    for track in mid.tracks:
+        tick = 0
+        for msg in track:
+            tick += msg.time
+            if msg.type == "set_tempo":
+                tempo_events.append((tick, msg))
+    tempo_track = mido.MidiTrack()
+    last = 0
+    for tick, msg in sorted(tempo_events, key=lambda e: e[0]):
+        tempo_track.append(msg.copy(time=tick - last))
+        last = tick
+    sub = mido.MidiFile(type=1, ticks_per_beat=mid.ticks_per_beat)
+    sub.tracks.append(tempo_track)
+    sub.tracks.extend(mid.tracks[i] for i in track_indexes)
+    return sub
+
+
+def render_tracks(midi_path: str, track_indexes: Optional[List[int]] = None, tail: float = 1.5) -> bytes:
+    """MIDI 파일(또는 일부 트랙)을 렌더링해 16-bit 스테레오 interleaved PCM 바이트로 반환"""
+    import numpy
+
+    _reset()
+    chunks = []
+    pending = 0.0
+    for msg in _select_tracks(midi_path, track_indexes):
+        pending += msg.time
+        frames = int(pending * _rate)
+        if frames > 0:
+            chunks.append(_synth.get_samples(frames))
+            pending -= frames / _rate
+        if msg.is_meta:
+            continue
+        kind = msg.type
+        if kind == "note_on" and msg.velocity > 0:
+            _synth.noteon(msg.channel, msg.note, msg.velocity)
+        elif kind in ("note_on", "note_off"):
+            _synth.noteoff(msg.channel, msg.note)
+        elif kind == "program_change":
+            _synth.program_change(msg.channel, msg.program)
+        elif kind == "control_change":
+            _synth.cc(msg.channel, msg.control, msg.value)
+        elif kind == "pitchwheel":
+            _synth.pitch_bend(msg.channel, msg.pitch)
+    chunks.append(_synth.get_samples(max(1, int(tail * _rate))))
+    return numpy.concatenate(chunks).astype(numpy.int16).tobytes()
+
+
+def mix_pcm(parts: List[bytes]) -> bytes:
+    """파트별 16-bit PCM 을 더해 하나로 섞는다 (길이가 다르면 긴 쪽에 맞추고 클리핑)"""
+    import numpy
+
+    arrays = [numpy.frombuffer(p, dtype=numpy.int16) for p in parts]
+    mixed = numpy.zeros(max(len(a) for a in arrays), dtype=numpy.int32)
+    for a in arrays:
+        mixed[:len(a)] += a
+    return numpy.clip(mixed, -32768, 32767).astype(numpy.int16).tobytes()
@@ -0,0 +1,159 @@
+"""오디오 파형 피크(min/max) 계산 — 여러 해상도, NumPy 벡터 연산
+
+가장 촘촘한 단계(LEVELS[0] 샘플당 한 쌍)를 파일을 청크로 읽으며 계산하고,
+그보다 거친 단계는 그 결과를 다시 묶어 만든다. 내보내는 형식은 BBC audiowaveform 의
+.dat(v1) / JSON(v2) 과 같아서 peaks.js, wavesurfer.js 가 그대로 읽을 수 있다.
+
+    peaks = compute_peaks("song.wav")              # WAV 는 표준 라이브러리로 읽음
+    peaks = compute_peaks("song.mp3", ffmpeg=...)  # 그 밖의 형식은 ffmpeg 로 디코딩
+    save(peaks, "song.peaks.npz"); peaks = load("song.peaks.npz")
+    spp, data = select(peaks, width=800)
+    to_json(peaks.sample_rate, spp, data, bits=8)
+"""
+import struct
+import subprocess
+import wave
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+LEVELS = (256, 1024, 4096, 16384)   # 한 쌍(min, max)이 덮는 샘플 수. 앞 단계의 배수여야 한다
+DECODE_RATE = 22050                 # ffmpeg 로 디코딩할 때의 샘플레이트 (파형 표시에는 충분)
+CHUNK_PIXELS = 2048                 # 한 번에 읽는 양 = LEVELS[0] * CHUNK_PIXELS 프레임
+
+
+class Peaks(NamedTuple):
+    sample_rate: int
+    levels: Dict[int, np.ndarray]   # samples_per_pixel -> (n, 2) int16 배열 [min, max]
+
+
+def _to_int16(frames: bytes, width: int) -> np.ndarray:
+    if width == 2:
+        return np.frombuffer(frames, dtype="<i2")
+    if width == 1:   # 8비트 WAV 는 부호 없는 정수
+        return ((np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128) << 8).astype(np.int16)
+    if width == 3:   # 24비트: 상위 2바이트만 쓴다
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        return (raw[:, 1].astype(np.uint16) | (raw[:, 2].astype(np.uint16) << 8)).view(np.int16)
+    if width == 4:
+        return (np.frombuffer(frames, dtype="<i4") >> 16).astype(np.int16)
+    raise ValueError(f"지원하지 않는 샘플 크기: {width}")
+
+
+def _wav_chunks(path: str) -> Tuple[int, int, Iterator[np.ndarray]]:
+    w = wave.open(path, "rb")
+    channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+
+    def chunks():
+        with w:
+            while True:
+                frames = w.readframes(LEVELS[0] * CHUNK_PIXELS)
+                if not frames:
+                    return
+                yield _to_int16(frames, width)
+    return rate, channels, chunks()
+
+
+def _ffmpeg_chunks(path: str, ffmpeg: str) -> Tuple[int, int, Iterator[np.ndarray]]:
+    def chunks():
+        proc = subprocess.Popen([ffmpeg, "-v", "error", "-i", path, "-vn", "-ac", "1",
+                                 "-ar", str(DECODE_RATE), "-f", "s16le", "-"],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            size = LEVELS[0] * CHUNK_PIXELS * 2
+            pending = b""
+            while True:
+                data = proc.stdout.read(size)
+                if not data:
+                    break
+                data = pending + data
+                usable = len(data) - len(data) % 2
+                pending = data[usable:]
+                yield np.frombuffer(data[:usable], dtype="<i2")
+            _, err = proc.communicate()
+            if proc.returncode != 0:
+                raise RuntimeError(f"ffmpeg 디코딩 실패: {err.decode(errors='replace')[-500:]}")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+    return DECODE_RATE, 1, chunks()
+
+
+def _pixel_peaks(samples: np.ndarray, step: int) -> np.ndarray:
+    """인터리브된 샘플을 step 개씩 묶어 [min, max]. 채널은 섞지 않고 함께 훑어 포락선을 유지한다"""
+    whole = len(samples) - len(samples) % step
+    parts = []
+    if whole:
+        block = samples[:whole].reshape(-1, step)
+        parts.append(np.stack([block.min(axis=1), block.max(axis=1)], axis=1))
+    if whole < len(samples):
+        tail = samples[whole:]
+        parts.append(np.array([[tail.min(), tail.max()]], dtype=samples.dtype))
+    return np.concatenate(parts) if parts else np.empty((0, 2), dtype=np.int16)
+
+
+def _downsample(peaks: np.ndarray, factor: int) -> np.ndarray:
+    if len(peaks) == 0:
+        return peaks
+    pad = -len(peaks) % factor
+    if pad:   # 마지막 값을 반복해 채우면 min/max 가 바뀌지 않는다
+        peaks = np.concatenate([peaks, np.repeat(peaks[-1:], pad, axis=0)])
+    grouped = peaks.reshape(-1, factor, 2)
+    return np.stack([grouped[:, :, 0].min(axis=1), grouped[:, :, 1].max(axis=1)], axis=1)
+
+
+def compute_peaks(path: str, ffmpeg: Optional[str] = None) -> Peaks:
+    if path.lower().endswith(".wav"):
+        rate, channels, chunks = _wav_chunks(path)
+    elif ffmpeg:
+        rate, channels, chunks = _ffmpeg_chunks(path, ffmpeg)
+    else:
+        raise ValueError(f"WAV 가 아닌 파일은 ffmpeg 가 필요합니다: {path}")
+
+    # 청크 크기가 LEVELS[0] 의 배수라서 마지막 청크 말고는 경계에 걸치는 픽셀이 없다
+    finest = np.concatenate([_pixel_peaks(c, LEVELS[0] * channels) for c in chunks] or
+                            [np.empty((0, 2), dtype=np.int16)])
+    levels = {LEVELS[0]: finest}
+    for spp in LEVELS[1:]:
+        levels[spp] = _downsample(finest, spp // LEVELS[0])
+    return Peaks(rate, levels)
+
+
+def save(peaks: Peaks, path: str):
+    with open(path, "wb") as f:
+        np.savez(f, sample_rate=np.int32(peaks.sample_rate),
+                 **{f"spp_{spp}": data for spp, data in peaks.levels.items()})
+
+
+def load(path: str) -> Peaks:
+    with np.load(path) as z:
+        levels = {int(k[4:]): z[k] for k in z.files if k.startswith("spp_")}
+        return Peaks(int(z["sample_rate"]), dict(sorted(levels.items())))
+
+
+def select(peaks: Peaks, spp: Optional[int] = None, width: Optional[int] = None) -> Tuple[int, np.ndarray]:
+    """spp 를 주면 그 이상인 가장 촘촘한 단계, width 를 주면 width 픽셀 이상을 채우는 가장 거친 단계"""
+    available = sorted(peaks.levels)
+    if spp:
+        chosen = next((s for s in available if s >= spp), available[-1])
+    elif width:
+        chosen = next((s for s in reversed(available) if len(peaks.levels[s]) >= width), available[0])
+    else:
+        chosen = available[0]
+    return chosen, peaks.levels[chosen]
+
+
+def _scaled(data: np.ndarray, bits: int) -> np.ndarray:
+    return (data >> 8).astype(np.int8) if bits == 8 else data.astype("<i2")
+
+
+def to_dat(sample_rate: int, spp: int, data: np.ndarray, bits: int = 8) -> bytes:
+    """audiowaveform .dat v1: version, flags(1=8비트), sample_rate, samples_per_pixel, length + min/max 쌍"""
+    header = struct.pack("<iIiiI", 1, 1 if bits == 8 else 0, sample_rate, spp, len(data))
+    return header + _scaled(data, bits).tobytes()
+
+
+def to_json(sample_rate: int, spp: int, data: np.ndarray, bits: int = 8) -> dict:
+    return {"version": 2, "channels": 1, "sample_rate": sample_rate, "samples_per_pixel": spp,
+            "bits": bits, "length": len(data), "data": _scaled(data, bits).ravel().tolist()}
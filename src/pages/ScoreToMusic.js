@@ -42,12 +42,15 @@ const ScoreToMusic = () => {
 
     // 작업 상태 폴링
     const pollTaskStatus = async (taskId) => {
-        const maxAttempts = 60;
-        let attempts = 0;
+        const deadline = Date.now() + 30 * 60 * 1000;
+        let since = '';
 
-        while (attempts < maxAttempts) {
+        while (Date.now() < deadline) {
             try {
-                const response = await fetch(`http://127.0.0.1:5000/api/music/task/status?taskId=${taskId}`);
+                // long-poll: 상태가 바뀔 때까지 서버가 최대 25초 기다렸다가 응답
+                const response = await fetch(
+                    `http://127.0.0.1:5000/api/music/task/status?taskId=${taskId}&wait=25${since ? `&since=${since}` : ''}`
+                );
                 if (!response.ok) throw new Error('작업 상태 확인 실패');
 
                 const statusData = await response.json();
@@ -76,9 +79,9 @@ const ScoreToMusic = () => {
                 } else if (statusData.status === 'failed') {
                     throw new Error(statusData.error || '음악 생성 실패');
                 } else if (statusData.status === 'running' || statusData.status === 'queued') {
-                    console.log(`작업 진행중... (${attempts + 1}/${maxAttempts})`);
-                    await new Promise(resolve => setTimeout(resolve, 5000));
-                    attempts++;
+                    console.log(`작업 진행중... (${statusData.stage || statusData.status})`);
+                    if (statusData.updatedAt) since = statusData.updatedAt;
+                    else await new Promise(resolve => setTimeout(resolve, 5000));
                 } else {
                     throw new Error(`알 수 없는 작업 상태: ${statusData.status}`);
                 }
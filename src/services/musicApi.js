@@ -60,12 +60,16 @@ export async function generateAndWait(payload, onStatus, file = null) {
   const taskId = genJson.task_id || genJson.taskId || genJson.id;
   if (!taskId) throw new Error('No task id from server');
 
-  // 상태 폴링 (기존 구현과 동일 — /api/music/task/status?task_id=...) :contentReference[oaicite:6]{index=6}
+  // 상태 long-poll: 서버가 상태가 바뀔 때까지(최대 wait초) 응답을 붙잡고 있다가 돌려준다
+  let since = '';
   while (true) {
-    await sleep(1500);
-    const stRes = await fetch(`${API_BASE}/music/task/status?task_id=${encodeURIComponent(taskId)}`);
+    const stRes = await fetch(
+      `${API_BASE}/music/task/status?task_id=${encodeURIComponent(taskId)}&wait=25${since ? `&since=${since}` : ''}`
+    );
     const stJson = await stRes.json();
     onStatus?.(stJson);
+    if (stJson?.updatedAt) since = stJson.updatedAt;
+    else await sleep(1500);
 
     const st = pickStatus(stJson);
     if (!st || IN_PROGRESS.has(st)) continue;